@@ -10,10 +10,16 @@ import sys
 from typing import List
 
 from pygpm.core import __version__
-from pygpm.main_parser import create_command, parse_command
 
 
 def main(args: List[str] = sys.argv[1:]) -> None:
+    # Configuration is loaded on first import, report a broken config.ini
+    # without a traceback.
+    try:
+        from pygpm.main_parser import create_command, parse_command
+    except ValueError as error:
+        sys.exit(f"pygpm: {error}")
+
     command_name, command_args = parse_command(args)
     command = create_command(command_name)
     command.main(command_args)
@@ -0,0 +1,264 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Programmatic interface to pygpm.
+
+These functions run the same parallel engines and caches as the commands
+but return typed results instead of logging, and raise PygpmError instead
+of exiting, so they can be called from a long-running process. They are
+safe to call from several threads at once. Cached data is written back to
+disk before each call returns.
+
+    from pygpm import api
+
+    for status in api.status_all(author="BrandonPacewic"):
+        if not status.clean:
+            print(status.name, status.staged, status.unstaged)
+"""
+
+import os
+import subprocess
+import threading
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from pygpm.cache import save_caches
+from pygpm.config import CONFIG
+from pygpm.fetch import FetchResult, fetch_all, summarize_git_error
+from pygpm.git_status import read_git_status
+from pygpm.profiles import get_status_profile
+from pygpm.refs import clear_root_cache, find_repository_root
+from pygpm.registry import SORT_KEYS, Registry, is_valid_entry
+from pygpm.status import iter_status_records, make_status_record
+from pygpm.track import make_and_cache_data
+
+__all__ = [
+    "PygpmError",
+    "RepositoryInfo",
+    "RepositoryStatus",
+    "FetchResult",
+    "list_repos",
+    "status",
+    "status_all",
+    "track",
+    "fetch",
+]
+
+# Registry writes are read-modify-write of repos.json.
+TRACK_LOCK = threading.Lock()
+
+
+class PygpmError(Exception):
+    pass
+
+
+@contextmanager
+def _api_call() -> Iterator[None]:
+    """
+    Raise the errors of a call as PygpmError and save the caches it
+    touched, as Command.main does for the commands. Repository roots are
+    looked up afresh on every call, repositories may have been created,
+    moved or deleted since the last one.
+    """
+    clear_root_cache()
+
+    try:
+        yield
+    except subprocess.TimeoutExpired as error:
+        raise PygpmError(
+            f"'{' '.join(map(str, error.cmd))}' timed out after "
+            f"{error.timeout:g}s") from error
+    except subprocess.CalledProcessError as error:
+        raise PygpmError(summarize_git_error(error)) from error
+    except (OSError, ValueError) as error:
+        raise PygpmError(str(error)) from error
+    finally:
+        save_caches()
+
+
+@dataclass(frozen=True)
+class RepositoryInfo:
+    name: str
+    author: str
+    url: str
+    path: str
+
+
+@dataclass(frozen=True)
+class RepositoryStatus:
+    name: str
+    path: str
+    branch: Optional[str]
+    upstream: Optional[str]
+    ahead: int
+    behind: int
+    clean: bool
+    staged: int
+    unstaged: int
+    untracked: int
+    unmerged: int
+    # Count per kind of change, e.g. {"modified": 2, "added": 1}.
+    changes: Dict[str, int]
+    # File names per category, only when requested.
+    files: Optional[Dict[str, List[str]]] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "RepositoryStatus":
+        return cls(
+            name=record["name"],
+            path=record["path"],
+            branch=record["branch"],
+            upstream=record["upstream"],
+            ahead=record["ahead"],
+            behind=record["behind"],
+            clean=record["clean"],
+            staged=record["staged"],
+            unstaged=record["unstaged"],
+            untracked=record["untracked"],
+            unmerged=record["unmerged"],
+            changes=record.get("changes", {}),
+            files=record.get("files"),
+            error=record["error"],
+        )
+
+
+def _select(
+        author: Optional[str],
+        path_prefix: Optional[str],
+        name: Optional[str],
+        remote_host: Optional[str],
+        sort: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    if sort is not None and sort not in SORT_KEYS:
+        raise PygpmError(
+            f"sort must be one of {', '.join(SORT_KEYS)}, not '{sort}'.")
+
+    registry = Registry.load()
+
+    if registry is None:
+        return {}
+
+    names = registry.select(author, path_prefix, name, remote_host)
+    return registry.subset(registry.sort(names, sort or "name"))
+
+
+def list_repos(
+        author: Optional[str] = None,
+        path_prefix: Optional[str] = None,
+        name: Optional[str] = None,
+        remote_host: Optional[str] = None,
+        sort: Optional[str] = None) -> List[RepositoryInfo]:
+    """
+    Tracked repositories matching every given filter, sorted by 'sort'
+    (one of registry.SORT_KEYS, name by default).
+    """
+    return [
+        RepositoryInfo(repo_name, info.get("author", ""), info.get("url", ""),
+                       info["path"])
+        for repo_name, info in _select(
+            author, path_prefix, name, remote_host, sort).items()
+    ]
+
+
+def status(path: Optional[str] = None, collect_files: bool = True) -> RepositoryStatus:
+    """
+    Status of the repository containing 'path' (the current directory by
+    default), tracked or not.
+    """
+    file_limit = CONFIG.status.file_limit if collect_files else None
+
+    with _api_call():
+        root = find_repository_root(path)
+
+        if root is None:
+            raise PygpmError(f"{path or os.getcwd()} is not a git repository.")
+
+        git_status = read_git_status(
+            root, collect_files, file_limit or None,
+            get_status_profile(None, root))
+
+    return RepositoryStatus.from_record(
+        make_status_record(os.path.basename(root), root, git_status))
+
+
+def status_all(
+        author: Optional[str] = None,
+        path_prefix: Optional[str] = None,
+        name: Optional[str] = None,
+        remote_host: Optional[str] = None,
+        workers: Optional[int] = None,
+        collect_files: bool = False) -> List[RepositoryStatus]:
+    """
+    Status of every matching tracked repository, sorted by name. Entries
+    that no longer point at a git repository, and repositories whose status
+    fails, are returned with 'error' set.
+    """
+    repositories = _select(author, path_prefix, name, remote_host)
+    results = []
+    valid = {}
+
+    for repo_name, info in repositories.items():
+        if is_valid_entry(info):
+            valid[repo_name] = info
+        else:
+            results.append(RepositoryStatus(
+                repo_name, info["path"], None, None, 0, 0, False, 0, 0, 0, 0,
+                {}, error="not a git repository"))
+
+    with _api_call():
+        for record in iter_status_records(
+                valid, workers or CONFIG.status.workers, collect_files):
+            results.append(RepositoryStatus.from_record(record))
+
+    results.sort(key=lambda result: result.name)
+    return results
+
+
+def track(path: str) -> RepositoryInfo:
+    """
+    Start tracking the repository containing 'path'.
+    """
+    with _api_call():
+        root = find_repository_root(path)
+
+        if root is None:
+            raise PygpmError(f"{path} is not a git repository.")
+
+        with TRACK_LOCK:
+            data = make_and_cache_data(root)
+
+    return RepositoryInfo(data["name"], data["author"], data["url"], data["path"])
+
+
+def fetch(
+        author: Optional[str] = None,
+        path_prefix: Optional[str] = None,
+        name: Optional[str] = None,
+        remote_host: Optional[str] = None,
+        workers: Optional[int] = None,
+        per_host: Optional[int] = None,
+        prune: bool = False,
+        timeout: Optional[float] = None) -> List[FetchResult]:
+    """
+    Fetch every matching tracked repository, sorted by name. Failures are
+    returned with 'error' set rather than raised.
+    """
+    repositories = _select(author, path_prefix, name, remote_host)
+
+    with _api_call():
+        results = list(fetch_all(
+            repositories,
+            workers or CONFIG.fetch.workers,
+            per_host or CONFIG.fetch.per_host,
+            prune,
+            timeout if timeout is not None else CONFIG.fetch.timeout or None))
+
+    results.sort(key=lambda result: result.name)
+    return results
@@ -0,0 +1,177 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Run many pygpm commands in a single process.
+"""
+
+import shlex
+import sys
+import time
+
+from contextlib import nullcontext
+from dataclasses import dataclass
+from optparse import Values
+from typing import Iterator, List, TextIO
+
+from pygpm.command import Command
+from pygpm.logging import Colors, flush_logging, get_logger, setup_logging
+from pygpm.main_parser import create_command, parse_command
+from pygpm.output import format_table
+
+logger = get_logger(__name__)
+
+PROMPT = "pygpm> "
+
+
+@dataclass
+class BatchResult:
+    line: str
+    exit_code: int
+    elapsed: float
+
+
+def read_lines(stream: TextIO, interactive: bool) -> Iterator[str]:
+    while True:
+        if interactive:
+            try:
+                line = input(PROMPT)
+            except EOFError:
+                sys.stderr.write("\n")
+                return
+        else:
+            line = stream.readline()
+
+            if not line:
+                return
+
+        line = line.strip()
+
+        if interactive and line in ("exit", "quit"):
+            return
+
+        if line and not line.startswith("#"):
+            yield line
+
+
+def get_exit_code(error: SystemExit) -> int:
+    if error.code is None:
+        return 0
+
+    return error.code if isinstance(error.code, int) else 1
+
+
+def run_line(line: str, prompts: bool) -> int:
+    """
+    Run one command line, e.g. 'status -a --format ndjson', and return its
+    exit code. Without 'prompts' commands that would ask for confirmation
+    fail instead, the answer would be read from the batch input.
+    """
+    try:
+        name, args = parse_command(shlex.split(line))
+
+        if name == "batch":
+            logger.colored_critical(
+                Colors.BOLD_RED, "'pygpm batch' cannot be nested.")
+            return 1
+
+        command = create_command(name)
+        command.prompts = prompts
+        command.main(args)
+    except SystemExit as error:
+        return get_exit_code(error)
+    except ValueError as error:
+        # Also raised by shlex for unbalanced quotes.
+        logger.colored_critical(Colors.BOLD_RED, str(error))
+        return 1
+    finally:
+        flush_logging()
+
+    return 0
+
+
+class BatchCommand(Command):
+    """
+    Read pygpm commands, one per line without the leading 'pygpm', from a
+    file or stdin and run them all in this process. The configuration,
+    registry, caches and GitHub session are loaded once and shared, so each
+    command only pays for its own work. Blank lines and lines starting with
+    '#' are ignored. Reading from a terminal gives an interactive prompt.
+    Otherwise commands that ask for confirmation, such as 'clean', need
+    their --yes option.
+    """
+
+    usage = """
+      %prog [options] [<command file | ->]"""
+
+    def add_options(self) -> None:
+        self.cmd_options.add_option(
+            "-e",
+            "--exit-on-error",
+            action="store_true",
+            dest="exit_on_error",
+            default=False,
+            help="Stop at the first command that exits with an error."
+        )
+
+        self.cmd_options.add_option(
+            "--timings",
+            action="store_true",
+            dest="timings",
+            default=False,
+            help="Finish with a table of each command's exit code and run time."
+        )
+
+    def run(self, options: Values, args: list[str]) -> None:
+        if len(args) > 1:
+            self.parser.print_help()
+            sys.exit(1)
+
+        path = args[0] if args else "-"
+
+        try:
+            # stdin stays open for the rest of the process.
+            stream = (nullcontext(sys.stdin) if path == "-"
+                      else open(path, "r", encoding="utf-8"))
+        except OSError as error:
+            logger.colored_critical(Colors.BOLD_RED, str(error))
+            sys.exit(1)
+
+        interactive = path == "-" and sys.stdin.isatty()
+        results: List[BatchResult] = []
+        start = time.perf_counter()
+
+        with stream as lines:
+            for line in read_lines(lines, interactive):
+                command_start = time.perf_counter()
+                exit_code = run_line(line, interactive)
+                results.append(BatchResult(
+                    line, exit_code, time.perf_counter() - command_start))
+
+                if exit_code and options.exit_on_error:
+                    break
+
+        # Every command configures logging for itself, restore ours.
+        setup_logging(self.verbosity, options.no_color, options.show_time)
+        failed = [result for result in results if result.exit_code]
+
+        if options.timings:
+            table = format_table(
+                ["Command", "Exit", "Time"],
+                [[result.line, str(result.exit_code), f"{result.elapsed:.3f}s"]
+                 for result in results],
+                ["<", ">", ">"])
+            logger.info(table[0])
+
+            for result, line in zip(results, table[1:]):
+                if result.exit_code:
+                    logger.colored_info(Colors.RED, line)
+                else:
+                    logger.info(line)
+
+        logger.debug(
+            f"Ran {len(results)} commands in {time.perf_counter() - start:.3f}s, "
+            f"{len(failed)} failed.")
+
+        if failed:
+            sys.exit(1)
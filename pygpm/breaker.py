@@ -0,0 +1,93 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Circuit breaker for repositories that keep timing out.
+
+A repository on a dead network mount or behind a stuck lock makes every git
+command in it run into its timeout. After breaker.threshold timeouts in a
+row the repository is quarantined: fleet-wide commands skip it for
+breaker.cooldown seconds instead of paying the timeout again on every run.
+Once the cooldown passes it gets a single attempt, a success closes the
+breaker and another timeout quarantines it again straight away.
+
+Failures are kept in the 'breaker' cache, so 'pygpm clean --cache breaker'
+lifts every quarantine.
+"""
+
+import subprocess
+import time
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from pygpm.cache import get_cache
+from pygpm.config import CONFIG
+from pygpm.util import format_duration
+
+BREAKER_NAMESPACE = "breaker"
+
+
+class Quarantined(Exception):
+    def __init__(self, path: str, failures: int, retry_at: float) -> None:
+        self.path = path
+        self.failures = failures
+        self.retry_at = retry_at
+        retry_in = format_duration(max(0.0, retry_at - time.time()))
+        super().__init__(
+            f"quarantined after {failures} timeout{'s' if failures != 1 else ''}, "
+            f"retrying in {retry_in}")
+
+
+class CircuitBreaker:
+    def __init__(self) -> None:
+        self.cache = get_cache(BREAKER_NAMESPACE)
+
+    def get_state(self, path: str) -> Optional[Dict[str, Any]]:
+        return self.cache.peek(path)
+
+    def check(self, path: str) -> None:
+        """
+        Raise Quarantined if 'path' is still cooling down.
+        """
+        state = self.get_state(path)
+
+        if state is None or state["opened"] is None:
+            return
+
+        retry_at = state["opened"] + CONFIG.breaker.cooldown
+
+        if time.time() < retry_at:
+            raise Quarantined(path, state["failures"], retry_at)
+
+    def record_timeout(self, path: str, error: BaseException) -> None:
+        state = self.get_state(path) or {"failures": 0, "opened": None}
+        failures = state["failures"] + 1
+        threshold = CONFIG.breaker.threshold
+        opened = time.time() if threshold and failures >= threshold else None
+        self.cache.set(path, {"failures": failures, "opened": opened,
+                              "error": str(error)})
+
+    def record_success(self, path: str) -> None:
+        # Only touch the cache for repositories with a failure on record.
+        if self.get_state(path) is not None:
+            self.cache.pop(path)
+
+    @contextmanager
+    def guard(self, path: str) -> Iterator[None]:
+        """
+        Run the body for 'path' unless it is quarantined, counting a
+        TimeoutExpired raised from it against the repository.
+        """
+        self.check(path)
+
+        try:
+            yield
+        except subprocess.TimeoutExpired as error:
+            self.record_timeout(path, error)
+            raise
+
+        self.record_success(path)
+
+
+BREAKER = CircuitBreaker()
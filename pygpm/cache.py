@@ -0,0 +1,289 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Namespaced on-disk caches stored under CACHE_DIR.
+
+Each namespace is a single JSON file mapping a key to its value and an
+optional fingerprint, along with the namespace's running hit and miss
+totals. A lookup whose fingerprint does not match the stored one is treated
+as a miss, so per-repository entries keyed by refs.repository_fingerprint()
+invalidate themselves once HEAD moves. Entries older than cache.ttl also
+miss, and the least recently used entries are dropped on save once a
+namespace outgrows its cache.max_entries or cache.max_size budget.
+Budgets can be set per namespace in '[cache:<namespace>]' sections.
+
+Lookups alone never rewrite a cache file. When an entry was last used is
+only moved forward once it is USED_RESOLUTION out of date, and the hit and
+miss totals are written along with the next change, so read-only runs over
+a warm cache do no cache I/O beyond the initial read.
+"""
+
+import json
+import os
+import threading
+import time
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from pygpm.config import CONFIG
+from pygpm.core import CACHE_DIR
+from pygpm.metrics import CACHE_HITS, CACHE_MISSES
+from pygpm.util import (REPO_CACHE_FILE, create_dir, read_file_json,
+                        write_file_json)
+
+CACHE_VERSION = 1
+
+# Seconds by which an entry's last use may lag before a hit records it. LRU
+# eviction does not need finer recency than this.
+USED_RESOLUTION = 3600
+
+
+@dataclass
+class CacheInfo:
+    namespace: str
+    entries: int
+    size: int
+    hits: int
+    misses: int
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+
+def last_used(entry: Dict[str, Any]) -> float:
+    return entry.get("used", entry.get("time", 0))
+
+
+def entry_size(entry: Dict[str, Any]) -> int:
+    return len(json.dumps(entry))
+
+
+class Cache:
+    def __init__(self, namespace: str) -> None:
+        self.namespace = namespace
+        self.path = os.path.join(CACHE_DIR, f"{namespace}.json")
+        self.lock = threading.Lock()
+        self.entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self.dirty = False
+        # Totals read from disk plus the lookups made in this process.
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self.entries is None:
+            data = read_file_json(self.path) if os.path.isfile(self.path) else {}
+
+            if "version" in data:
+                self.entries = data.get("entries", {})
+                self.hits += data.get("hits", 0)
+                self.misses += data.get("misses", 0)
+            else:
+                # Caches written before hit totals were recorded are a
+                # plain key to entry mapping.
+                self.entries = data
+
+        return self.entries
+
+    def get(self, key: str, fingerprint: Optional[str] = None) -> Optional[Any]:
+        with self.lock:
+            entry = self._load().get(key)
+            hit = (entry is not None and entry.get("fingerprint") == fingerprint
+                   and not self._expired(entry))
+
+            if hit:
+                assert entry is not None
+                self.hits += 1
+                now = time.time()
+
+                if now - last_used(entry) >= USED_RESOLUTION:
+                    entry["used"] = now
+                    self.dirty = True
+            else:
+                self.misses += 1
+
+        if not hit:
+            CACHE_MISSES.inc(namespace=self.namespace)
+            return None
+
+        CACHE_HITS.inc(namespace=self.namespace)
+        return entry["value"]
+
+    def _expired(self, entry: Dict[str, Any], ttl: Optional[float] = None) -> bool:
+        if ttl is None:
+            ttl = CONFIG.get_cache_budget(self.namespace).ttl
+
+        return bool(ttl) and time.time() - entry.get("time", 0) > ttl
+
+    def _evict(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        budget = CONFIG.get_cache_budget(self.namespace)
+        max_entries = budget.max_entries
+        max_size = budget.max_size * 1024 * 1024
+
+        if not max_entries and not max_size:
+            return
+
+        sizes = {key: entry_size(entry) for key, entry in entries.items()}
+        total = sum(sizes.values())
+
+        for key in sorted(entries, key=lambda key: last_used(entries[key])):
+            if ((not max_entries or len(entries) <= max_entries)
+                    and (not max_size or total <= max_size)):
+                break
+
+            total -= sizes[key]
+            del entries[key]
+
+    def set(self, key: str, value: Any,
+            fingerprint: Optional[str] = None) -> None:
+        with self.lock:
+            self._load()[key] = {
+                "fingerprint": fingerprint,
+                "time": time.time(),
+                "value": value,
+            }
+            self.dirty = True
+
+    def peek(self, key: str) -> Optional[Any]:
+        """
+        Stored value of 'key' whatever its fingerprint or age, without
+        counting as a lookup. For records such as when a job last ran.
+        """
+        with self.lock:
+            entry = self._load().get(key)
+
+        return None if entry is None else entry["value"]
+
+    def pop(self, key: str) -> Optional[Any]:
+        with self.lock:
+            entry = self._load().pop(key, None)
+            self.dirty = self.dirty or entry is not None
+
+        return None if entry is None else entry["value"]
+
+    def export(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            return dict(self._load())
+
+    def merge(self, entries: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Add 'entries' (as returned by export()), keeping whichever side is
+        newer for keys present in both. Returns the number of entries taken.
+        """
+        taken = 0
+
+        with self.lock:
+            current = self._load()
+
+            for key, entry in entries.items():
+                if key not in current or current[key].get(
+                        "time", 0) < entry.get("time", 0):
+                    current[key] = entry
+                    taken += 1
+
+            self.dirty = self.dirty or taken > 0
+
+        return taken
+
+    def prune(self, older_than: Optional[float] = None,
+              dry_run: bool = False) -> int:
+        """
+        Remove expired entries and, with 'older_than' seconds, entries not
+        used for that long. With 'dry_run' nothing is removed. Returns the
+        number of entries removed.
+        """
+        now = time.time()
+
+        with self.lock:
+            entries = self._load()
+            stale = [
+                key for key, entry in entries.items()
+                if self._expired(entry)
+                or (older_than is not None and now - last_used(entry) > older_than)
+            ]
+
+            if not dry_run:
+                for key in stale:
+                    del entries[key]
+
+                self.dirty = self.dirty or bool(stale)
+
+        return len(stale)
+
+    def clear(self, dry_run: bool = False) -> int:
+        """
+        Remove every entry and reset the hit totals. Returns the number of
+        entries removed.
+        """
+        with self.lock:
+            removed = len(self._load())
+
+            if not dry_run:
+                self.entries = {}
+                self.hits = self.misses = 0
+                self.dirty = True
+
+        return removed
+
+    def info(self) -> CacheInfo:
+        with self.lock:
+            entries = self._load()
+            return CacheInfo(
+                self.namespace, len(entries),
+                sum(entry_size(entry) for entry in entries.values()),
+                self.hits, self.misses)
+
+    def save(self) -> None:
+        with self.lock:
+            if not self.dirty or self.entries is None:
+                return
+
+            self._evict(self.entries)
+            create_dir(CACHE_DIR)
+            write_file_json(self.path, {
+                "version": CACHE_VERSION,
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": self.entries,
+            })
+            self.dirty = False
+
+
+CACHES: Dict[str, Cache] = {}
+CACHES_LOCK = threading.Lock()
+
+
+def list_namespaces() -> List[str]:
+    """
+    Namespaces with a cache file on disk.
+    """
+    try:
+        names = os.listdir(CACHE_DIR)
+    except OSError:
+        return []
+
+    return sorted(name[:-len(".json")] for name in names
+                  if name.endswith(".json")
+                  and name != os.path.basename(REPO_CACHE_FILE))
+
+
+def get_cache(namespace: str) -> Cache:
+    with CACHES_LOCK:
+        if namespace not in CACHES:
+            CACHES[namespace] = Cache(namespace)
+
+        return CACHES[namespace]
+
+
+def save_caches() -> None:
+    """
+    Write every cache loaded in this process that has unsaved changes.
+    """
+    with CACHES_LOCK:
+        caches = list(CACHES.values())
+
+    for cache in caches:
+        cache.save()
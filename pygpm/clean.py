@@ -2,30 +2,91 @@
 # SPDX-License-Identifier: MIT
 
 """
-Clean all cached pygpm repository data.
+Clean cached pygpm data.
 """
 
 import logging
+import sys
 
 from optparse import Values
+from typing import List, Optional
 
+from pygpm.cache import get_cache, list_namespaces
 from pygpm.command import Command
 from pygpm.logging import Colors, get_logger
-from pygpm.util import clean_cached_data
+from pygpm.output import format_size, format_table
+from pygpm.util import clean_cached_data, parse_duration
 
 logger = get_logger(__name__)
 
 
 class CleanCommand(Command):
     """
-    Clean all tracked repository data from pygpm's cache.
+    Clean pygpm's cached data. Without options this clears the tracked
+    repository data. With --cache or --older-than only the named cache
+    namespaces are cleaned and the tracked repositories are kept.
     """
 
     usage = """
       %prog [options]"""
 
+    def add_options(self) -> None:
+        self.cmd_options.add_option(
+            "--cache",
+            action="append",
+            dest="caches",
+            default=[],
+            metavar="name",
+            help="Clean the cache namespace 'name', or 'all' for every "
+                 "namespace. Can be given multiple times."
+        )
+
+        self.cmd_options.add_option(
+            "--older-than",
+            dest="older_than",
+            default=None,
+            metavar="duration",
+            help="Only remove cache entries not used for 'duration', e.g. "
+                 "30d, 12h or 45m. Applies to every namespace unless --cache "
+                 "is given."
+        )
+
+        self.cmd_options.add_option(
+            "-n",
+            "--dry-run",
+            action="store_true",
+            dest="dry_run",
+            default=False,
+            help="Show what would be removed without removing anything."
+        )
+
+        self.cmd_options.add_option(
+            "-y",
+            "--yes",
+            action="store_true",
+            dest="yes",
+            default=False,
+            help="Clear the tracked repository data without asking."
+        )
+
     def run(self, options: Values, args: list[str]) -> None:
-        if logger.getEffectiveLevel() <= logging.INFO:
+        if options.caches or options.older_than is not None:
+            self.clean_caches(options)
+            return
+
+        if options.dry_run:
+            logger.info("Would clear all tracked repository cached data.")
+            return
+
+        if options.yes:
+            confirm = "y"
+        elif not self.prompts:
+            logger.colored_critical(
+                Colors.BOLD_RED,
+                "Cannot ask for confirmation here, pass --yes to clear the "
+                "tracked repository data.")
+            sys.exit(1)
+        elif logger.getEffectiveLevel() <= logging.INFO:
             confirm = input(
                 "This will clear all tracked repository cached data\n"
                 "Are you sure you want to proceed? (y/n) "
@@ -38,3 +99,57 @@ class CleanCommand(Command):
             logger.info("Cleaned cached repository data.")
         else:
             logger.colored_info(Colors.RED, "Aborting.")
+
+    def clean_caches(self, options: Values) -> None:
+        older_than: Optional[float] = None
+
+        if options.older_than is not None:
+            try:
+                older_than = parse_duration(options.older_than)
+            except ValueError as error:
+                logger.colored_critical(Colors.BOLD_RED, str(error))
+                sys.exit(1)
+
+        available = list_namespaces()
+        namespaces: List[str] = []
+
+        for name in options.caches or ["all"]:
+            if name == "all":
+                namespaces.extend(available)
+            elif name in available:
+                namespaces.append(name)
+            else:
+                logger.colored_critical(
+                    Colors.BOLD_RED,
+                    f"No cache named '{name}', the caches are: "
+                    f"{', '.join(available) or 'none'}.")
+                sys.exit(1)
+
+        rows = []
+        total = 0
+
+        for namespace in dict.fromkeys(namespaces):
+            cache = get_cache(namespace)
+            info = cache.info()
+
+            if older_than is None:
+                removed = cache.clear(options.dry_run)
+            else:
+                removed = cache.prune(older_than, options.dry_run)
+
+            cache.save()
+            total += removed
+            rows.append([
+                namespace, str(info.entries), format_size(info.size),
+                "-" if info.hit_rate is None else f"{info.hit_rate:.0%}",
+                str(removed),
+            ])
+
+        if rows:
+            for line in format_table(
+                    ["Cache", "Entries", "Size", "Hit rate", "Removed"], rows,
+                    ["<", ">", ">", ">", ">"]):
+                logger.info(line)
+
+        verb = "Would remove" if options.dry_run else "Removed"
+        logger.info(f"{verb} {total} cache entries.")
@@ -6,12 +6,15 @@ Base command class for all pygpm commands.
 """
 
 import logging
+import time
 
 from optparse import OptionParser, OptionGroup, Values
 from typing import List, Tuple
 
+from pygpm.cache import save_caches
 from pygpm.parser import CustomIndentedHelpFormatter, make_general_group
 from pygpm.logging import Colors, setup_logging, get_logger
+from pygpm.metrics import COMMAND_LAST_RUN, COMMAND_SECONDS, REGISTRY
 from pygpm.util import Timer
 
 logger = get_logger(__name__)
@@ -20,6 +23,9 @@ logger = get_logger(__name__)
 class Command:
     # TODO: Move usage to init?
     usage: str = ""
+    # Whether the command may ask for confirmation on stdin. Turned off by
+    # 'pygpm batch' when stdin carries the commands themselves.
+    prompts: bool = True
 
     def __init__(self, name: str, summary: str) -> None:
         self.name = name
@@ -42,6 +48,9 @@ class Command:
 
         self.add_options()
 
+        if self.cmd_options.option_list:
+            self.parser.add_option_group(self.cmd_options)
+
     def add_options(self) -> None:
         pass
 
@@ -61,7 +70,18 @@ class Command:
         if options.time_command:
             command_timer = Timer()
 
-        self.run(options, args)
+        if options.metrics_file:
+            REGISTRY.enable()
+
+        try:
+            with COMMAND_SECONDS.time(command=self.name):
+                self.run(options, args)
+        finally:
+            save_caches()
+
+            if options.metrics_file:
+                COMMAND_LAST_RUN.set(time.time(), command=self.name)
+                REGISTRY.write_textfile(options.metrics_file)
 
         if options.time_command:
             command_timer.add_tic()
@@ -3,65 +3,291 @@
 
 """
 Holds all configurable options for pygpm.
+
+config.ini is parsed and validated once, on import, into the frozen CONFIG
+object. Every option can be overridden from the environment with
+'pygpm_<SECTION>_<OPTION>', for example 'pygpm_FETCH_WORKERS=16'. Run
+'pygpm config show' to print the effective values and where they came from.
+
+'[status:<repository>]' sections hold per-repository status profiles, see
+pygpm.profiles, and '[cache:<namespace>]' sections override the [cache]
+budgets for a single cache namespace.
 """
 
 import configparser
 import os
+import shutil
 
-from typing import Any
+from dataclasses import dataclass, field, fields, replace
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
 
 from pygpm.core import CONFIG_DIR, MODULE_DIR
-from pygpm.util import create_dir, copy_file
 
-# TODO: Remove module
-# TODO: Move string to pygpm/config/default.ini
-"""
-Config values for pygpm:
-
-  status:
-    always_list_clean:
-      if 'true', 'pygpm status' will list categories even if they are empty
-      example:
-        Branch: main
-        Detected 0 files with changes not staged for commit.
-        Detected 0 untracked files.
-        Detected 0 files staged for commit.
-        Status: clean
-      vs.
-        Branch: main
-        Status: clean
-"""
-CONFIG_DICT: dict[str, dict[str, str]] = {
-    "status": {
-        "always_list_clean": "true",
-    }
-}
+ENV_PREFIX = "pygpm_"
+PROFILE_PREFIX = "status:"
+CACHE_PREFIX = "cache:"
 
+# Options read from their old location when not set in the new one.
+LEGACY_OPTIONS = {("github", "auth_token"): ("master", "auth_token")}
 
-def create_default_config() -> None:
-    create_dir(CONFIG_DIR)
-    copy_file(
-        os.path.join(MODULE_DIR, "config/default.ini"),
-        os.path.join(CONFIG_DIR, "config.ini"),
-    )
+TRUE_VALUES = ("1", "true", "yes", "on")
+FALSE_VALUES = ("0", "false", "no", "off")
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def option(default: Any, help: str, minimum: Any = None) -> Any:
+    return field(default=default, metadata={"help": help, "min": minimum})
+
+
+@dataclass(frozen=True)
+class StatusConfig:
+    always_list_clean: bool = option(
+        True, "'pygpm status' lists categories even when they are empty")
+    workers: int = option(
+        8, "repositories 'pygpm status -a' checks in parallel", 1)
+    file_limit: int = option(
+        1000, "most file names listed per category, 0 for no limit", 0)
+    timeout: float = option(
+        60.0, "seconds before a repository's status is aborted, 0 for none", 0)
+
+
+@dataclass(frozen=True)
+class FetchConfig:
+    workers: int = option(
+        8, "repositories 'pygpm fetch' and 'pygpm sync' handle in parallel", 1)
+    per_host: int = option(
+        4, "most concurrent fetches against a single remote host", 1)
+    timeout: float = option(
+        300.0, "seconds before a repository's fetch is aborted, 0 for none", 0)
+
+
+@dataclass(frozen=True)
+class StatsConfig:
+    workers: int = option(
+        8, "repositories 'pygpm stats' inspects in parallel", 1)
+
+
+@dataclass(frozen=True)
+class GrepConfig:
+    workers: int = option(
+        8, "repositories 'pygpm grep' searches in parallel", 1)
+
+
+@dataclass(frozen=True)
+class LogConfig:
+    workers: int = option(
+        8, "repositories 'pygpm log' starts reading in parallel", 1)
+    count: int = option(
+        20, "commits 'pygpm log' shows by default", 1)
+
+
+@dataclass(frozen=True)
+class MaintainConfig:
+    workers: int = option(
+        2, "repositories 'pygpm maintain' works on at once", 1)
+    niceness: int = option(
+        10, "niceness added to maintenance jobs, 0 to leave unchanged", 0)
+    ionice_class: int = option(
+        3, "ionice class of maintenance jobs (2 best-effort, 3 idle), "
+           "0 to leave unchanged", 0)
+    timeout: float = option(
+        3600.0, "seconds before a repository's maintenance is aborted, "
+                "0 for none", 0)
+
+
+@dataclass(frozen=True)
+class GitConfig:
+    timeout: float = option(
+        0.0, "seconds before other git commands are aborted, 0 for none", 0)
+
+
+@dataclass(frozen=True)
+class BreakerConfig:
+    threshold: int = option(
+        3, "timeouts in a row before a repository is quarantined, "
+           "0 to never quarantine", 0)
+    cooldown: float = option(
+        1800.0, "seconds a quarantined repository is skipped for", 0)
+
+
+@dataclass(frozen=True)
+class GitHubConfig:
+    auth_token: str = option("", "GitHub personal access token")
+    timeout: float = option(
+        30.0, "seconds before a GitHub API request is aborted, 0 for none", 0)
+
+
+@dataclass(frozen=True)
+class CacheConfig:
+    ttl: float = option(
+        604800.0, "seconds before a cache entry expires, 0 for never", 0)
+    max_size: int = option(
+        64, "size budget of each cache namespace in MiB, 0 for unlimited", 0)
+    max_entries: int = option(
+        10000, "most entries kept per cache namespace, 0 for unlimited", 0)
+
+
+@dataclass(frozen=True)
+class OutputConfig:
+    buffer_records: int = option(
+        256, "records buffered before '--format' output is written", 1)
+    log_buffer: int = option(
+        512, "log records buffered before they are written", 1)
+    log_flush_interval: float = option(
+        0.25, "most seconds a buffered log record waits to be written", 0)
 
 
+SECTIONS: Dict[str, type] = {
+    "status": StatusConfig,
+    "fetch": FetchConfig,
+    "stats": StatsConfig,
+    "grep": GrepConfig,
+    "log": LogConfig,
+    "maintain": MaintainConfig,
+    "git": GitConfig,
+    "breaker": BreakerConfig,
+    "github": GitHubConfig,
+    "cache": CacheConfig,
+    "output": OutputConfig,
+}
+
+
+@dataclass(frozen=True)
 class Config:
-    def __init__(self) -> None:
-        self.config_path = os.path.join(CONFIG_DIR, "config.ini")
+    path: str
+    status: StatusConfig
+    fetch: FetchConfig
+    stats: StatsConfig
+    grep: GrepConfig
+    log: LogConfig
+    maintain: MaintainConfig
+    git: GitConfig
+    breaker: BreakerConfig
+    github: GitHubConfig
+    cache: CacheConfig
+    output: OutputConfig
+    # (section, option) -> 'default', 'file' or 'env'
+    sources: Mapping[Tuple[str, str], str]
+    # Raw '[status:<repository>]' sections.
+    profiles: Mapping[str, Mapping[str, str]]
+    # '[cache:<namespace>]' budgets, keyed by namespace.
+    cache_budgets: Mapping[str, CacheConfig]
+
+    def get_cache_budget(self, namespace: str) -> CacheConfig:
+        return self.cache_budgets.get(namespace, self.cache)
+
+
+def get_env_name(section: str, name: str) -> str:
+    return f"{ENV_PREFIX}{section.upper()}_{name.upper()}"
+
+
+def parse_value(section: str, name: str, value: str, kind: type) -> Any:
+    value = value.strip().strip("\"'")
+
+    if kind is bool:
+        if value.lower() in TRUE_VALUES:
+            return True
+
+        if value.lower() in FALSE_VALUES:
+            return False
+
+        raise ConfigError(f"{section}.{name} must be true or false, not '{value}'.")
+
+    if kind is str:
+        return value
+
+    try:
+        return kind(value)
+    except ValueError:
+        raise ConfigError(
+            f"{section}.{name} must be {'an integer' if kind is int else 'a number'}, "
+            f"not '{value}'.") from None
+
+
+def create_default_config(config_path: str) -> None:
+    os.makedirs(os.path.dirname(config_path), exist_ok=True)
+    shutil.copyfile(os.path.join(MODULE_DIR, "config/default.ini"), config_path)
+
 
-        if not os.path.isfile(self.config_path):
-            create_default_config()
+def parse_options(
+        parser: configparser.ConfigParser,
+        section: str,
+        schema: type,
+        sources: Optional[Dict[Tuple[str, str], str]] = None) -> Dict[str, Any]:
+    """
+    Validated values of the 'schema' options set in 'section'. Environment
+    overrides are only read when 'sources' is given to record them in.
+    """
+    values = {}
 
-        self.config = configparser.ConfigParser()
-        self._load()
+    for setting in fields(schema):
+        legacy = LEGACY_OPTIONS.get((section, setting.name))
+        env_name = get_env_name(section, setting.name)
+        raw, source = None, "default"
 
-    def _load(self) -> None:
-        self.config.read_dict(CONFIG_DICT)
-        self.config.read(self.config_path)
+        if sources is not None and env_name in os.environ:
+            raw, source = os.environ[env_name], "env"
+        elif parser.has_option(section, setting.name):
+            raw, source = parser.get(section, setting.name), "file"
+        elif legacy is not None and parser.has_option(*legacy):
+            raw, source = parser.get(*legacy), "file"
 
-    def get(self, section: str, option: str) -> Any:
-        return eval(self.config.get(section, option))
+        if sources is not None:
+            sources[(section, setting.name)] = source
+
+        if raw is None:
+            continue
+
+        value = parse_value(section, setting.name, raw, setting.type)
+        minimum = setting.metadata["min"]
+
+        if minimum is not None and value < minimum:
+            raise ConfigError(
+                f"{section}.{setting.name} must be at least {minimum}, "
+                f"not {value}.")
+
+        values[setting.name] = value
+
+    return values
+
+
+def load_config(config_path: str = os.path.join(CONFIG_DIR, "config.ini")) -> Config:
+    if not os.path.isfile(config_path):
+        create_default_config(config_path)
+
+    parser = configparser.ConfigParser(interpolation=None)
+
+    try:
+        parser.read(config_path, encoding="utf-8")
+    except configparser.Error as error:
+        raise ConfigError(f"Could not parse {config_path}: {error}") from None
+
+    sources: Dict[Tuple[str, str], str] = {}
+    sections = {section: schema(**parse_options(parser, section, schema, sources))
+                for section, schema in SECTIONS.items()}
+
+    profiles = {
+        section: MappingProxyType(dict(parser[section]))
+        for section in parser.sections() if section.startswith(PROFILE_PREFIX)
+    }
+
+    cache_budgets = {
+        section[len(CACHE_PREFIX):]: replace(
+            sections["cache"], **parse_options(parser, section, CacheConfig))
+        for section in parser.sections() if section.startswith(CACHE_PREFIX)
+    }
+
+    return Config(
+        path=config_path,
+        sources=MappingProxyType(sources),
+        profiles=MappingProxyType(profiles),
+        cache_budgets=MappingProxyType(cache_budgets),
+        **sections,
+    )
 
 
-CONFIG = Config()
+CONFIG = load_config()
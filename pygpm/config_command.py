@@ -0,0 +1,88 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Inspect pygpm's configuration.
+"""
+
+import sys
+
+from dataclasses import fields
+from optparse import Values
+
+from pygpm.command import Command
+from pygpm.config import CONFIG, SECTIONS, get_env_name
+from pygpm.logging import Colors, get_logger
+from pygpm.output import create_writer, format_table
+from pygpm.parser import FORMAT
+
+logger = get_logger(__name__)
+
+CONFIG_FIELDS = ["option", "value", "source", "env", "help"]
+SECRET_OPTIONS = {("github", "auth_token")}
+
+
+def make_config_records() -> list[dict]:
+    records = []
+
+    for section in SECTIONS:
+        values = getattr(CONFIG, section)
+
+        for setting in fields(values):
+            value = getattr(values, setting.name)
+
+            if (section, setting.name) in SECRET_OPTIONS and value:
+                value = "<set>"
+
+            records.append({
+                "option": f"{section}.{setting.name}",
+                "value": value,
+                "source": CONFIG.sources[(section, setting.name)],
+                "env": get_env_name(section, setting.name),
+                "help": setting.metadata["help"],
+            })
+
+    return records
+
+
+class ConfigCommand(Command):
+    """
+    Show the effective configuration: every option with its value and
+    whether it came from the defaults, config.ini or the environment.
+    """
+
+    usage = """
+      %prog [options] show"""
+
+    def add_options(self) -> None:
+        self.cmd_options.add_option(FORMAT())
+
+    def run(self, options: Values, args: list[str]) -> None:
+        if args != ["show"]:
+            self.parser.print_help()
+            sys.exit(1)
+
+        records = make_config_records()
+
+        if options.format:
+            with create_writer(options.format, CONFIG_FIELDS) as writer:
+                for record in records:
+                    writer.write(record)
+
+            return
+
+        logger.info(f"Config file: {CONFIG.path}")
+        table = format_table(
+            ["Option", "Value", "Source", "Description"],
+            [[record["option"], str(record["value"]), record["source"],
+              record["help"]] for record in records])
+        logger.info(table[0])
+
+        for record, line in zip(records, table[1:]):
+            if record["source"] == "default":
+                logger.info(line)
+            else:
+                logger.colored_info(Colors.GREEN, line)
+
+        for section in CONFIG.profiles:
+            logger.info(f"Status profile: [{section}]")
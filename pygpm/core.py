@@ -25,6 +25,7 @@ XDG_CONFIG_DIR = os.getenv(
 
 CACHE_DIR = os.getenv("pygpm_CACHE_DIR", os.path.join(XDG_CACHE_DIR, "pygpm"))
 CONFIG_DIR = os.path.join(XDG_CONFIG_DIR, "pygpm")
+METRICS_FILE = os.getenv("pygpm_METRICS_FILE")
 MODULE_DIR = os.path.dirname(__file__)
 
 OS = platform.uname()[0]
@@ -0,0 +1,265 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Fetch remote-tracking refs for all repositories tracked by pygpm.
+"""
+
+import subprocess
+import sys
+import threading
+import time
+
+from dataclasses import dataclass
+from functools import partial
+from optparse import Values
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pygpm.breaker import BREAKER, Quarantined
+from pygpm.command import Command
+from pygpm.config import CONFIG
+from pygpm.logging import Colors, ProgressLine, get_logger
+from pygpm.parallel import imap_unordered, interleave
+from pygpm.parser import FILTER_GROUP, SCHEDULE_GROUP
+from pygpm.registry import Registry, get_remote_host
+from pygpm.schedule import Schedule
+from pygpm.util import run_command
+
+logger = get_logger(__name__)
+
+# Never let a fetch block on a credential prompt.
+FETCH_ENV = {"GIT_TERMINAL_PROMPT": "0"}
+
+
+@dataclass
+class FetchResult:
+    name: str
+    path: str
+    host: str
+    elapsed: float = 0.0
+    updated_refs: int = 0
+    error: Optional[str] = None
+    quarantined: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class HostLimiter:
+    """
+    Caps the number of concurrent operations against any one remote host.
+    """
+
+    def __init__(self, per_host: int) -> None:
+        self.per_host = per_host
+        self.semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self.lock = threading.Lock()
+
+    def get(self, host: str) -> threading.BoundedSemaphore:
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(
+                    self.per_host)
+
+            return self.semaphores[host]
+
+
+def summarize_git_error(error: subprocess.CalledProcessError) -> str:
+    stderr = error.stderr or ""
+
+    # Streamed commands capture bytes.
+    if isinstance(stderr, bytes):
+        stderr = stderr.decode("utf-8", "replace")
+
+    lines = stderr.strip().splitlines()
+
+    for line in lines:
+        if line.startswith(("fatal:", "error:")):
+            return line
+
+    return lines[-1] if lines else str(error)
+
+
+def fetch_repository(
+        path: str,
+        prune: bool = False,
+        timeout: Optional[float] = None) -> int:
+    """
+    Run 'git fetch' in 'path' and return the number of refs that changed.
+    """
+    command = ["git", "fetch", "--all", "--no-progress"]
+
+    if prune:
+        command.append("--prune")
+
+    result = run_command(command, path, timeout=timeout, env=FETCH_ENV)
+
+    # Every updated, new or pruned ref is reported on stderr as '... -> ...'.
+    return sum(1 for line in result.stderr.splitlines() if " -> " in line)
+
+
+def fetch_entry(
+        entry: Tuple[str, dict[str, Any]],
+        limiter: HostLimiter,
+        prune: bool = False,
+        timeout: Optional[float] = None) -> FetchResult:
+    name, info = entry
+    result = FetchResult(name, info["path"], get_remote_host(info.get("url")))
+
+    with limiter.get(result.host):
+        start = time.perf_counter()
+
+        try:
+            with BREAKER.guard(info["path"]):
+                result.updated_refs = fetch_repository(
+                    info["path"], prune, timeout)
+        except Quarantined as error:
+            result.error, result.quarantined = str(error), True
+        except subprocess.TimeoutExpired:
+            result.error = f"timed out after {timeout}s"
+        except subprocess.CalledProcessError as error:
+            result.error = summarize_git_error(error)
+        except OSError as error:
+            result.error = str(error)
+
+        result.elapsed = time.perf_counter() - start
+
+    return result
+
+
+def fetch_all(
+        repositories: dict[str, dict[str, Any]],
+        workers: int = 0,
+        per_host: int = 4,
+        prune: bool = False,
+        timeout: Optional[float] = None,
+        schedule: Optional[Schedule] = None) -> Iterator[FetchResult]:
+    """
+    Fetch every repository through a bounded pool, yielding a FetchResult
+    per repository in completion order. Each host's repositories are
+    started longest expected first.
+    """
+    schedule = schedule or Schedule("fetch", repositories, workers)
+    limiter = HostLimiter(per_host)
+    entries = interleave(schedule.entries,
+                         lambda entry: get_remote_host(entry[1].get("url")))
+    fetch = partial(fetch_entry, limiter=limiter, prune=prune, timeout=timeout)
+
+    for task in imap_unordered(fetch, entries, workers):
+        assert task.value is not None
+        # Only the fetch itself, not the wait for a host slot, and only
+        # fetches that went through.
+        if task.value.error is None:
+            schedule.record(task.value.path, task.value.elapsed)
+        yield task.value
+
+
+class FetchCommand(Command):
+    """
+    Fetch remote-tracking refs for every repository tracked by pygpm in
+    parallel, limiting concurrent fetches per remote host.
+    """
+
+    usage = """
+      %prog [options]"""
+
+    def add_options(self) -> None:
+        self.cmd_options.add_option(
+            "-j",
+            "--jobs",
+            type="int",
+            dest="jobs",
+            default=CONFIG.fetch.workers,
+            metavar="n",
+            help="Number of repositories to fetch in parallel."
+        )
+
+        self.cmd_options.add_option(
+            "--per-host",
+            type="int",
+            dest="per_host",
+            default=CONFIG.fetch.per_host,
+            metavar="n",
+            help="Maximum concurrent fetches against a single remote host."
+        )
+
+        self.cmd_options.add_option(
+            "--timeout",
+            type="float",
+            dest="timeout",
+            default=CONFIG.fetch.timeout,
+            metavar="seconds",
+            help="Abort a repository's fetch after the given number of seconds."
+        )
+
+        self.cmd_options.add_option(
+            "-p",
+            "--prune",
+            action="store_true",
+            dest="prune",
+            default=False,
+            help="Remove remote-tracking refs that no longer exist on the remote."
+        )
+
+        for option in FILTER_GROUP + SCHEDULE_GROUP:
+            self.cmd_options.add_option(option())
+
+    def run(self, options: Values, args: list[str]) -> None:
+        registry = Registry.load()
+
+        if registry is None:
+            logger.colored_critical(
+                Colors.BOLD_RED,
+                "pygpm found no tracked repositories.")
+            sys.exit(1)
+
+        repositories = registry.query(options)
+        start = time.perf_counter()
+        progress = ProgressLine(self.verbosity >= 0)
+        schedule = Schedule("fetch", repositories, options.jobs,
+                            options.recent_first)
+        failures: List[FetchResult] = []
+        updated = 0
+
+        for i, result in enumerate(fetch_all(
+                repositories, options.jobs, options.per_host,
+                options.prune, options.timeout or None, schedule), start=1):
+            if not result.ok:
+                failures.append(result)
+            elif result.updated_refs:
+                updated += 1
+
+            progress.clear()
+            logger.debug(
+                f"{result.name}: {result.error or f'{result.updated_refs} ref(s) updated'} "
+                f"({result.elapsed:.2f}s)")
+            progress.update(
+                f"Fetched {i}/{len(repositories)} repositories, "
+                f"{len(failures)} failed")
+
+        progress.clear()
+        logger.info(
+            f"Fetched {len(repositories)} repositories in "
+            f"{time.perf_counter() - start:.3f}s: {updated} updated, "
+            f"{len(failures)} failed.")
+
+        if options.schedule_report:
+            logger.info("\n".join(schedule.report(time.perf_counter() - start)))
+
+        if failures:
+            for quarantined, heading in ((False, "Failed to fetch:"),
+                                         (True, "Quarantined:")):
+                group = sorted((result for result in failures
+                                if result.quarantined == quarantined),
+                               key=lambda result: result.name)
+
+                if group:
+                    logger.colored_warning(Colors.RED, heading)
+
+                for result in group:
+                    logger.colored_warning(
+                        Colors.RED,
+                        f"\t{result.name} ({result.path}): {result.error}")
+
+            sys.exit(1)
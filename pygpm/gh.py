@@ -3,42 +3,113 @@
 
 """
 GitHub API integration for pygpm.
+
+Requests share one keep-alive session. Responses are cached with their ETag
+and revalidated with 'If-None-Match', so unchanged resources come back as
+304 Not Modified, which GitHub does not count against the rate limit.
 """
 
+import threading
+import time
+
 import requests
 
-from typing import Any, List
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
 
+from pygpm.cache import get_cache
 from pygpm.config import CONFIG
 from pygpm.gh_classes import Repository, PR, Issue
+from pygpm.metrics import (GITHUB_NOT_MODIFIED, GITHUB_RATE_LIMIT_WAITS,
+                           GITHUB_RATE_LIMIT_WAIT_SECONDS, GITHUB_REQUESTS)
+
+API_URL = "https://api.github.com"
+
+# Longest time to sleep waiting for the rate limit to reset before giving up
+# and surfacing the error.
+MAX_RATE_LIMIT_WAIT = 300
 
 
 def get_access_token() -> str:
-    return CONFIG.get("master", "auth_token")
+    return CONFIG.github.auth_token
 
 
 HEADERS = {
     "Accept": "application/vnd.github+json",
-    "Authorization": f"Bearer {get_access_token()}",
     "X-GitHub-Api-Version": "2022-11-28",
 }
 
+if get_access_token():
+    HEADERS["Authorization"] = f"Bearer {get_access_token()}"
+
+SESSION: Optional[requests.Session] = None
+SESSION_LOCK = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    global SESSION
+
+    with SESSION_LOCK:
+        if SESSION is None:
+            SESSION = requests.Session()
+            SESSION.headers.update(HEADERS)
+
+        return SESSION
+
+
+def is_rate_limited(response: requests.Response) -> bool:
+    return (response.status_code in (403, 429)
+            and response.headers.get("X-RateLimit-Remaining") == "0")
+
+
+def wait_for_rate_limit_reset(response: requests.Response) -> bool:
+    reset = int(response.headers.get("X-RateLimit-Reset", "0"))
+    wait = max(reset - time.time(), 0) + 1
+
+    if wait > MAX_RATE_LIMIT_WAIT:
+        return False
+
+    GITHUB_RATE_LIMIT_WAITS.inc()
+    GITHUB_RATE_LIMIT_WAIT_SECONDS.inc(wait)
+    time.sleep(wait)
+
+    return True
+
+
+def request(url: str, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+    session = get_session()
+    timeout = CONFIG.github.timeout or None
+    response = session.get(url, headers=headers, timeout=timeout)
+    GITHUB_REQUESTS.inc(code=str(response.status_code))
+
+    if is_rate_limited(response) and wait_for_rate_limit_reset(response):
+        response = session.get(url, headers=headers, timeout=timeout)
+        GITHUB_REQUESTS.inc(code=str(response.status_code))
+
+    return response
+
+
+def get_api_response(url: str) -> Any:
+    cache = get_cache("github")
+    cached = cache.get(url)
+    headers = {"If-None-Match": cached["etag"]} if cached else None
+    response = request(url, headers)
+
+    if response.status_code == 304 and cached is not None:
+        GITHUB_NOT_MODIFIED.inc()
+        return cached["body"]
 
-def get_api_response(url: str) -> List[dict[str, Any]] | dict[str, Any]:
-    response = requests.get(url, headers=HEADERS)
     response.raise_for_status()
+    body = response.json()
 
-    response_text = response.text
-    response_text = response_text.replace("false", "False")
-    response_text = response_text.replace("true", "True")
-    response_text = response_text.replace("null", "None")
-    response_dicts = eval(response_text)
+    if "ETag" in response.headers:
+        cache.set(url, {"etag": response.headers["ETag"], "body": body})
 
-    return response_dicts
+    return body
 
 
 def get_issues(owner: str, repo: str) -> List[Issue]:
-    url = f"https://api.github.com/repos/{owner}/{repo}/issues"
+    url = f"{API_URL}/repos/{owner}/{repo}/issues"
     response_dicts = get_api_response(url)
     assert isinstance(response_dicts, list)
 
@@ -46,7 +117,7 @@ def get_issues(owner: str, repo: str) -> List[Issue]:
 
 
 def get_pull_requests(owner: str, repo: str) -> List[PR]:
-    url = f"https://api.github.com/repos/{owner}/{repo}/pulls"
+    url = f"{API_URL}/repos/{owner}/{repo}/pulls"
     response_dicts = get_api_response(url)
     assert isinstance(response_dicts, list)
 
@@ -54,8 +125,30 @@ def get_pull_requests(owner: str, repo: str) -> List[PR]:
 
 
 def get_repository(owner: str, repo: str) -> Repository:
-    url = f"https://api.github.com/repos/{owner}/{repo}"
+    url = f"{API_URL}/repos/{owner}/{repo}"
     response = get_api_response(url)
     assert isinstance(response, dict)
 
     return Repository(**response)
+
+
+def get_branch_head(owner: str, repo: str, branch: str) -> Optional[str]:
+    """
+    Commit id the branch points at on GitHub, None if there is no such
+    branch.
+    """
+    url = f"{API_URL}/repos/{owner}/{repo}/git/ref/heads/{quote(branch)}"
+
+    try:
+        response = get_api_response(url)
+    except requests.HTTPError as error:
+        if error.response is not None and error.response.status_code == 404:
+            return None
+
+        raise
+
+    # A partial ref name matches a list of refs instead.
+    if not isinstance(response, dict):
+        return None
+
+    return response["object"]["sha"]
@@ -0,0 +1,290 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Long-lived 'git cat-file --batch' workers for object queries.
+
+Instead of spawning one git process per question, the pool keeps a single
+'git cat-file --batch' (and '--batch-check') process open per repository and
+multiplexes queries over its stdin/stdout. Workers left idle for longer than
+the idle timeout are shut down by a background reaper.
+
+A query that gets no answer within git.timeout kills the worker's process
+group and raises TimeoutExpired, which callers running under BREAKER.guard
+count against the repository like any other git timeout.
+"""
+
+import atexit
+import os
+import select
+import subprocess
+import threading
+import time
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from pygpm.config import CONFIG
+from pygpm.core import OS
+from pygpm.metrics import GIT_BATCH_QUERIES, GIT_SUBPROCESSES
+from pygpm.util import finish_command, kill_process_group, start_command
+
+READ_SIZE = 64 * 1024
+
+
+@dataclass
+class GitObject:
+    oid: str
+    type: str
+    size: int
+    content: Optional[bytes] = None
+
+
+@dataclass
+class Commit:
+    oid: str
+    tree: str
+    parents: List[str]
+    author: str
+    author_time: int
+    committer: str
+    commit_time: int
+    message: str
+
+    @property
+    def summary(self) -> str:
+        return self.message.split("\n", 1)[0]
+
+
+def parse_signature(value: str) -> Tuple[str, int]:
+    # 'Name <email> 1700000000 +0000'
+    identity, timestamp, _ = value.rsplit(" ", 2)
+    return identity, int(timestamp)
+
+
+def parse_commit(obj: GitObject) -> Commit:
+    assert obj.content is not None
+    header, _, message = obj.content.decode(
+        "utf-8", "replace").partition("\n\n")
+    tree, author, committer = "", ("", 0), ("", 0)
+    parents = []
+
+    for line in header.split("\n"):
+        key, _, value = line.partition(" ")
+
+        if key == "tree":
+            tree = value
+        elif key == "parent":
+            parents.append(value)
+        elif key == "author":
+            author = parse_signature(value)
+        elif key == "committer":
+            committer = parse_signature(value)
+
+    return Commit(obj.oid, tree, parents, author[0], author[1],
+                  committer[0], committer[1], message)
+
+
+class CatFileWorker:
+    def __init__(self, path: str, check_only: bool = False) -> None:
+        self.path = path
+        self.check_only = check_only
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        # Output read from the pipe but not consumed yet.
+        self.buffer = bytearray()
+        self.deadline: Optional[float] = None
+        self.process = self._spawn()
+
+    def _spawn(self) -> subprocess.Popen:
+        GIT_SUBPROCESSES.inc(subcommand="cat-file")
+        mode = "--batch-check" if self.check_only else "--batch"
+        self.buffer.clear()
+
+        # In its own process group and known to kill_running_commands(),
+        # like every other git command pygpm runs.
+        return start_command(
+            ["git", "cat-file", mode], self.path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0)
+
+    def _fill(self) -> None:
+        assert self.process.stdout is not None
+        stdout = self.process.stdout.fileno()
+
+        # Never block on a read past the deadline, git may be stuck in I/O
+        # that no signal can interrupt.
+        if self.deadline is not None and not select.select(
+                [stdout], [], [], max(0.0, self.deadline - time.monotonic()))[0]:
+            kill_process_group(self.process)
+            raise subprocess.TimeoutExpired(self.process.args, CONFIG.git.timeout)
+
+        chunk = os.read(stdout, READ_SIZE)
+
+        if not chunk:
+            raise BrokenPipeError(f"git cat-file exited in {self.path}")
+
+        self.buffer += chunk
+
+    def _readline(self) -> bytes:
+        start = 0
+
+        while (end := self.buffer.find(b"\n", start)) < 0:
+            start = len(self.buffer)
+            self._fill()
+
+        line = bytes(self.buffer[:end + 1])
+        del self.buffer[:end + 1]
+        return line
+
+    def _read(self, size: int) -> bytes:
+        while len(self.buffer) < size:
+            self._fill()
+
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def _query(self, name: str) -> Optional[GitObject]:
+        assert self.process.stdin is not None
+        # Pipes cannot be waited on with a timeout on Windows.
+        timeout = CONFIG.git.timeout if OS != "Windows" else 0
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.process.stdin.write(name.encode("utf-8") + b"\n")
+        self.process.stdin.flush()
+        fields = self._readline().decode("utf-8", "replace").split()
+
+        # '<name> missing' and '<name> ambiguous'
+        if len(fields) != 3:
+            return None
+
+        obj = GitObject(fields[0], fields[1], int(fields[2]))
+
+        if not self.check_only:
+            # The content is followed by a newline.
+            obj.content = self._read(obj.size + 1)[:-1]
+
+        return obj
+
+    def query(self, name: str) -> Optional[GitObject]:
+        if "\n" in name:
+            raise ValueError("object names cannot contain newlines")
+
+        GIT_BATCH_QUERIES.inc(mode="check" if self.check_only else "batch")
+
+        with self.lock:
+            self.last_used = time.monotonic()
+
+            try:
+                return self._query(name)
+            except (OSError, ValueError):
+                # The worker died underneath us, restart it once.
+                self.close()
+                self.process = self._spawn()
+                return self._query(name)
+
+    def close(self) -> None:
+        if self.process.poll() is not None:
+            finish_command(self.process)
+            return
+
+        try:
+            assert self.process.stdin is not None
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            kill_process_group(self.process)
+
+        finish_command(self.process)
+
+
+class CatFilePool:
+    """
+    One 'git cat-file' worker per repository and mode, shared by every
+    thread in the process.
+    """
+
+    def __init__(self, idle_timeout: float = 30.0) -> None:
+        self.idle_timeout = idle_timeout
+        self.workers: Dict[Tuple[str, bool], CatFileWorker] = {}
+        self.lock = threading.Lock()
+        self.reaper: Optional[threading.Thread] = None
+
+    def get(self, path: str, check_only: bool = False) -> CatFileWorker:
+        key = (path, check_only)
+
+        with self.lock:
+            worker = self.workers.get(key)
+
+            if worker is None:
+                worker = self.workers[key] = CatFileWorker(path, check_only)
+                self._start_reaper()
+
+            # Handing a worker out counts as use, so the reaper cannot close
+            # it between get() and the query.
+            worker.last_used = time.monotonic()
+            return worker
+
+    def query(self, path: str, name: str) -> Optional[GitObject]:
+        """
+        Type, size and content of the object 'name' (any revision or
+        '<rev>:<path>' expression) in the repository at 'path'.
+        """
+        return self.get(path).query(name)
+
+    def check(self, path: str, name: str) -> Optional[GitObject]:
+        """
+        Like query() without reading the content.
+        """
+        return self.get(path, check_only=True).query(name)
+
+    def resolve(self, path: str, name: str) -> Optional[str]:
+        obj = self.check(path, name)
+        return obj.oid if obj is not None else None
+
+    def read_commit(self, path: str, rev: str = "HEAD") -> Optional[Commit]:
+        obj = self.query(path, f"{rev}^{{commit}}")
+        return parse_commit(obj) if obj is not None else None
+
+    def _start_reaper(self) -> None:
+        if self.reaper is not None and self.reaper.is_alive():
+            return
+
+        self.reaper = threading.Thread(
+            target=self._reap, name="pygpm-cat-file-reaper", daemon=True)
+        self.reaper.start()
+
+    def _reap(self) -> None:
+        while True:
+            time.sleep(self.idle_timeout / 2)
+            now = time.monotonic()
+
+            with self.lock:
+                idle = [key for key, worker in self.workers.items()
+                        if now - worker.last_used >= self.idle_timeout
+                        and not worker.lock.locked()]
+                workers = [self.workers.pop(key) for key in idle]
+                finished = not self.workers
+
+                if finished:
+                    self.reaper = None
+
+            for worker in workers:
+                worker.close()
+
+            if finished:
+                return
+
+    def close(self) -> None:
+        with self.lock:
+            workers = list(self.workers.values())
+            self.workers.clear()
+
+        for worker in workers:
+            worker.close()
+
+
+POOL = CatFilePool()
+atexit.register(POOL.close)
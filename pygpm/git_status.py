@@ -0,0 +1,180 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Streaming parser for 'git status --porcelain=v2 --branch -z'.
+
+Records are consumed from the pipe one at a time. Counts are always exact,
+while file lists are only kept when requested and are capped, so very large
+working trees can be summarized in constant memory.
+"""
+
+import os
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from pygpm.profiles import DEFAULT_PROFILE, StatusProfile
+from pygpm.util import stream_command
+
+STATUS_ARGS = ["status", "--porcelain=v2", "--branch", "-z"]
+
+# Buckets every entry is counted in. An entry with both index and worktree
+# changes (e.g. 'MM') counts as both staged and unstaged.
+CATEGORIES = ["staged", "unstaged", "untracked", "unmerged", "ignored"]
+
+# Kind of change for each index/worktree status letter.
+CHANGE_KINDS: Dict[str, str] = {
+    "M": "modified",
+    "T": "type-changed",
+    "A": "added",
+    "D": "deleted",
+    "R": "renamed",
+    "C": "copied",
+}
+
+# XY codes git reports for unmerged entries.
+CONFLICT_KINDS: Dict[str, str] = {
+    "DD": "both-deleted",
+    "AU": "added-by-us",
+    "UD": "deleted-by-them",
+    "UA": "added-by-them",
+    "DU": "deleted-by-us",
+    "AA": "both-added",
+    "UU": "both-modified",
+}
+
+
+@dataclass
+class GitStatus:
+    branch: Optional[str] = None
+    oid: Optional[str] = None
+    upstream: Optional[str] = None
+    ahead: int = 0
+    behind: int = 0
+    counts: Dict[str, int] = field(
+        default_factory=lambda: dict.fromkeys(CATEGORIES, 0))
+    kinds: Dict[str, int] = field(default_factory=dict)
+    files: Optional[Dict[str, List[str]]] = None
+
+    @property
+    def detached(self) -> bool:
+        return self.branch is None
+
+    @property
+    def clean(self) -> bool:
+        return not any(self.counts[category]
+                       for category in CATEGORIES if category != "ignored")
+
+
+class StatusParser:
+    """
+    Incremental parser fed one NUL delimited porcelain v2 record at a time.
+    """
+
+    def __init__(
+            self,
+            collect_files: bool = False,
+            file_limit: Optional[int] = None) -> None:
+        self.status = GitStatus()
+        self.file_limit = file_limit
+        self.pending_rename: Optional[List[str]] = None
+
+        if collect_files:
+            self.status.files = {category: [] for category in CATEGORIES}
+
+    def add_file(self, category: str, path: str) -> None:
+        self.status.counts[category] += 1
+
+        if self.status.files is None:
+            return
+
+        files = self.status.files[category]
+
+        if self.file_limit is None or len(files) < self.file_limit:
+            files.append(path)
+
+    def add_kind(self, kind: str) -> None:
+        self.status.kinds[kind] = self.status.kinds.get(kind, 0) + 1
+
+    def feed(self, record: str) -> None:
+        if self.pending_rename is not None:
+            # The record after a rename/copy entry is its original path.
+            fields, self.pending_rename = self.pending_rename, None
+            self.parse_changed(fields, f"{record} -> {fields[-1]}")
+            return
+
+        if not record:
+            return
+
+        kind = record[0]
+
+        if kind == "#":
+            self.parse_header(record)
+        elif kind == "1":
+            self.parse_changed(record.split(" ", 8))
+        elif kind == "2":
+            self.pending_rename = record.split(" ", 9)
+        elif kind == "u":
+            self.parse_unmerged(record.split(" ", 10))
+        elif kind == "?":
+            self.add_file("untracked", record[2:])
+        elif kind == "!":
+            self.add_file("ignored", record[2:])
+
+    def parse_header(self, record: str) -> None:
+        _, key, value = record.split(" ", 2)
+
+        if key == "branch.oid":
+            self.status.oid = None if value == "(initial)" else value
+        elif key == "branch.head":
+            self.status.branch = None if value == "(detached)" else value
+        elif key == "branch.upstream":
+            self.status.upstream = value
+        elif key == "branch.ab":
+            ahead, behind = value.split(" ")
+            self.status.ahead = int(ahead)
+            self.status.behind = -int(behind)
+
+    def parse_changed(
+            self, fields: List[str], path: Optional[str] = None) -> None:
+        xy, path = fields[1], path or fields[-1]
+        index_status, worktree_status = xy[0], xy[1]
+
+        if index_status != ".":
+            self.add_file("staged", path)
+            self.add_kind(CHANGE_KINDS.get(index_status, index_status))
+
+        if worktree_status != ".":
+            self.add_file("unstaged", path)
+
+            if worktree_status != index_status:
+                self.add_kind(CHANGE_KINDS.get(
+                    worktree_status, worktree_status))
+
+    def parse_unmerged(self, fields: List[str]) -> None:
+        xy, path = fields[1], fields[-1]
+        self.add_file("unmerged", path)
+        self.add_kind(CONFLICT_KINDS.get(xy, "conflict"))
+
+    def feed_all(self, records: Iterable[str]) -> GitStatus:
+        for record in records:
+            self.feed(record)
+
+        return self.status
+
+
+def read_git_status(
+        command_dir: str = os.getcwd(),
+        collect_files: bool = False,
+        file_limit: Optional[int] = None,
+        profile: StatusProfile = DEFAULT_PROFILE,
+        timeout: Optional[float] = None) -> GitStatus:
+    parser = StatusParser(collect_files, file_limit)
+    command = ["git", *profile.git_config_args(),
+               *STATUS_ARGS, *profile.status_args()]
+    records = stream_command(command, command_dir, separator=b"\0",
+                             timeout=timeout)
+
+    return parser.feed_all(
+        record.decode("utf-8", "surrogateescape") for record in records)
@@ -0,0 +1,394 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Search every repository tracked by pygpm with 'git grep'.
+
+Repositories are searched through a bounded pool and matches are handed to
+the output as soon as they are read from git, a pipe read at a time, so the
+first results show up while the slow repositories are still being searched.
+Once --limit matches have been printed the remaining searches are stopped
+and the git processes they started killed.
+"""
+
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from contextlib import nullcontext
+from dataclasses import dataclass
+from functools import partial
+from optparse import Values
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from pygpm.breaker import BREAKER, Quarantined
+from pygpm.command import Command
+from pygpm.config import CONFIG
+from pygpm.fetch import summarize_git_error
+from pygpm.logging import Colors, get_logger
+from pygpm.output import create_writer
+from pygpm.parallel import imap_unordered
+from pygpm.parser import FILTER_GROUP, FORMAT
+from pygpm.registry import Registry, is_valid_entry
+from pygpm.schedule import Schedule
+from pygpm.util import CommandGroup, stream_command_batches
+
+logger = get_logger(__name__)
+
+GREP_FIELDS = ["name", "path", "file", "line", "text"]
+
+# How often a worker blocked on a full queue checks whether to stop.
+PUT_INTERVAL = 0.1
+
+
+@dataclass
+class GrepMatch:
+    name: str
+    path: str
+    file: str
+    line: Optional[int] = None
+    text: str = ""
+
+
+@dataclass
+class GrepResult:
+    name: str
+    path: str
+    matches: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+    quarantined: bool = False
+
+
+def build_grep_command(
+        pattern: str,
+        pathspecs: List[str],
+        options: Values) -> List[str]:
+    # -z keeps file names with ':' in them unambiguous, -I skips binaries.
+    command = ["git", "grep", "--no-color", "-I", "-z",
+               "-l" if options.files_with_matches else "-n"]
+
+    for flag, enabled in (("-i", options.ignore_case),
+                          ("-w", options.word_regexp),
+                          ("-F", options.fixed_strings),
+                          ("-E", options.extended_regexp)):
+        if enabled:
+            command.append(flag)
+
+    return command + ["-e", pattern, "--", *pathspecs]
+
+
+def parse_match(name: str, path: str, record: bytes, files_only: bool) -> GrepMatch:
+    if files_only:
+        return GrepMatch(name, path, record.decode("utf-8", "replace"))
+
+    file, line, text = record.decode("utf-8", "replace").split("\0", 2)
+    return GrepMatch(name, path, file, int(line), text)
+
+
+def put(items: "queue.Queue[Any]", item: Any, stop: threading.Event) -> bool:
+    """
+    Put 'item' on the bounded queue unless the search is stopped first.
+    """
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=PUT_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+
+    return False
+
+
+def grep_repository(
+        entry: Tuple[str, dict[str, Any]],
+        command: List[str],
+        files_only: bool,
+        max_count: int,
+        items: "queue.Queue[Union[List[GrepMatch], GrepResult]]",
+        stop: threading.Event,
+        group: CommandGroup) -> GrepResult:
+    name, info = entry
+    result = GrepResult(name, info["path"])
+    start = time.perf_counter()
+
+    if stop.is_set():
+        return result
+
+    try:
+        with BREAKER.guard(info["path"]):
+            batches = stream_command_batches(
+                command, info["path"], separator=b"\0" if files_only else b"\n",
+                group=group)
+
+            try:
+                for records in batches:
+                    matches = [parse_match(name, info["path"], record, files_only)
+                               for record in records if record]
+
+                    if max_count:
+                        matches = matches[:max_count - result.matches]
+
+                    if matches and not put(items, matches, stop):
+                        break
+
+                    result.matches += len(matches)
+
+                    if result.matches == max_count:
+                        break
+            finally:
+                # Kills git if the search ended early.
+                batches.close()
+    except Quarantined as error:
+        result.error, result.quarantined = str(error), True
+    except subprocess.TimeoutExpired as error:
+        result.error = f"timed out after {error.timeout:g}s"
+    except subprocess.CalledProcessError as error:
+        # 'git grep' exits with 1 when nothing matched.
+        if error.returncode != 1:
+            result.error = summarize_git_error(error)
+    except OSError as error:
+        result.error = str(error)
+
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+class GrepCommand(Command):
+    """
+    Run 'git grep' in every repository tracked by pygpm and print the
+    matches, prefixed with the repository name, as they are found. Extra
+    arguments after the pattern are passed to git as pathspecs.
+    """
+
+    usage = """
+      %prog [options] <pattern> [<pathspec>...]"""
+
+    def add_options(self) -> None:
+        self.cmd_options.add_option(
+            "-i",
+            "--ignore-case",
+            action="store_true",
+            dest="ignore_case",
+            default=False,
+            help="Ignore case differences between the pattern and the files."
+        )
+
+        self.cmd_options.add_option(
+            "-w",
+            "--word-regexp",
+            action="store_true",
+            dest="word_regexp",
+            default=False,
+            help="Only match the pattern at word boundaries."
+        )
+
+        self.cmd_options.add_option(
+            "-F",
+            "--fixed-strings",
+            action="store_true",
+            dest="fixed_strings",
+            default=False,
+            help="Treat the pattern as a literal string."
+        )
+
+        self.cmd_options.add_option(
+            "-E",
+            "--extended-regexp",
+            action="store_true",
+            dest="extended_regexp",
+            default=False,
+            help="Treat the pattern as an extended regular expression."
+        )
+
+        self.cmd_options.add_option(
+            "-l",
+            "--files-with-matches",
+            action="store_true",
+            dest="files_with_matches",
+            default=False,
+            help="Only print the names of files that match."
+        )
+
+        self.cmd_options.add_option(
+            "-m",
+            "--max-count",
+            type="int",
+            dest="max_count",
+            default=0,
+            metavar="n",
+            help="Print at most n matches from each repository."
+        )
+
+        self.cmd_options.add_option(
+            "--limit",
+            type="int",
+            dest="limit",
+            default=0,
+            metavar="n",
+            help="Stop searching once n matches have been printed in total."
+        )
+
+        self.cmd_options.add_option(
+            "--sorted",
+            action="store_true",
+            dest="sorted",
+            default=False,
+            help="Print matches grouped by repository in name order. Each "
+                 "repository is still printed as soon as the ones before it "
+                 "are done."
+        )
+
+        self.cmd_options.add_option(
+            "-j",
+            "--jobs",
+            type="int",
+            dest="jobs",
+            default=CONFIG.grep.workers,
+            metavar="n",
+            help="Number of repositories to search in parallel."
+        )
+
+        self.cmd_options.add_option(FORMAT())
+
+        for option in FILTER_GROUP:
+            self.cmd_options.add_option(option())
+
+    def run(self, options: Values, args: list[str]) -> None:
+        if not args:
+            self.parser.print_help()
+            sys.exit(1)
+
+        registry = Registry.load()
+
+        if registry is None:
+            logger.colored_critical(
+                Colors.BOLD_RED,
+                "pygpm found no tracked repositories.")
+            sys.exit(1)
+
+        repositories = {name: info for name, info in registry.query(options).items()
+                        if is_valid_entry(info)}
+        start = time.perf_counter()
+        items: "queue.Queue[Union[List[GrepMatch], GrepResult]]" = queue.Queue(
+            CONFIG.output.buffer_records)
+        stop = threading.Event()
+        group = CommandGroup()
+        schedule = Schedule("grep", repositories, options.jobs)
+        search = partial(
+            grep_repository,
+            command=build_grep_command(args[0], args[1:], options),
+            files_only=options.files_with_matches,
+            max_count=options.max_count,
+            items=items,
+            stop=stop,
+            group=group)
+
+        def drive() -> None:
+            for task in imap_unordered(search, schedule.entries, options.jobs):
+                result = task.value or GrepResult(
+                    task.item[0], task.item[1]["path"], error=str(task.error))
+
+                # Searches cut short by --limit would skew the history.
+                if stop.is_set() or not put(items, result, stop):
+                    return
+
+                if result.error is None:
+                    schedule.record(result.path, result.elapsed)
+
+        driver = threading.Thread(target=drive, name="pygpm-grep", daemon=True)
+        driver.start()
+
+        try:
+            results, printed = self.print_matches(options, items, repositories)
+        finally:
+            # Past --limit, or interrupted: end the searches still running,
+            # and only those.
+            stop.set()
+            group.kill()
+            driver.join()
+
+        failures = sorted((result for result in results if result.error),
+                          key=lambda result: result.name)
+        logger.debug(
+            f"Printed {printed} matches from {len(results)} repositories in "
+            f"{time.perf_counter() - start:.3f}s.")
+
+        if failures and not options.format:
+            logger.colored_warning(Colors.RED, "Failed to search:")
+
+            for result in failures:
+                logger.colored_warning(
+                    Colors.RED, f"\t{result.name} ({result.path}): {result.error}")
+
+        # Like grep, exit with 1 when nothing matched.
+        if failures or not printed:
+            sys.exit(1)
+
+    def print_matches(
+            self,
+            options: Values,
+            items: "queue.Queue[Union[List[GrepMatch], GrepResult]]",
+            repositories: Dict[str, Dict[str, Any]]) -> Tuple[List[GrepResult], int]:
+        """
+        Print matches from the queue until every repository is done or
+        --limit is reached. Returns the finished repositories and the
+        number of matches printed.
+        """
+        order = sorted(repositories)
+        current = 0
+        held: Dict[str, List[GrepMatch]] = {name: [] for name in order}
+        results: List[GrepResult] = []
+        done = set()
+        printed = 0
+
+        writer = create_writer(options.format, GREP_FIELDS) if options.format else None
+
+        with writer or nullcontext():
+            def emit(matches: List[GrepMatch]) -> bool:
+                nonlocal printed
+
+                if options.limit:
+                    matches = matches[:options.limit - printed]
+
+                if writer is not None:
+                    for match in matches:
+                        writer.write(vars(match))
+                elif options.files_with_matches and matches:
+                    logger.info("\n".join(
+                        f"{match.name}/{match.file}" for match in matches))
+                elif matches:
+                    logger.info("\n".join(
+                        f"{match.name}/{match.file}:{match.line}:{match.text}"
+                        for match in matches))
+
+                printed += len(matches)
+                return not options.limit or printed < options.limit
+
+            while len(results) < len(repositories):
+                item = items.get()
+
+                if isinstance(item, list):
+                    if options.sorted and item[0].name != order[current]:
+                        held[item[0].name].extend(item)
+                    elif not emit(item):
+                        break
+
+                    continue
+
+                results.append(item)
+                done.add(item.name)
+
+                if not options.sorted:
+                    continue
+
+                # Release the repositories now at the front of the order.
+                while current < len(order) and order[current] in done:
+                    current += 1
+
+                    if current < len(order) and not emit(held.pop(order[current])):
+                        return results, printed
+
+        return results, printed
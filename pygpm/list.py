@@ -8,13 +8,18 @@ List out the directory of all tracked git repositories.
 import sys
 
 from optparse import Values
+from typing import Any
 
 from pygpm.command import Command
 from pygpm.logging import Colors, get_logger
-from pygpm.util import get_repository_cached_data
+from pygpm.output import create_writer
+from pygpm.parser import FILTER_GROUP, FORMAT
+from pygpm.registry import Registry
 
 logger = get_logger(__name__)
 
+LIST_FIELDS = ["name", "author", "url", "path"]
+
 
 class ListCommand(Command):
     """
@@ -33,18 +38,42 @@ class ListCommand(Command):
             help="Simply display the total number of tracked repositories."
         )
 
+        self.cmd_options.add_option(FORMAT())
+
+        for option in FILTER_GROUP:
+            self.cmd_options.add_option(option())
+
     def run(self, options: Values, args: list[str]) -> None:
-        data = get_repository_cached_data()
+        registry = Registry.load()
 
-        if data is None:
+        if registry is None:
             logger.colored_critical(
                 Colors.BOLD_RED,
                 "pygpm found no tracked repositories.")
             sys.exit(1)
 
-        if options.count:
+        data = registry.query(options)
+
+        if options.format:
+            if options.count:
+                with create_writer(options.format, ["count"]) as writer:
+                    writer.write({"count": len(data)})
+            else:
+                with create_writer(options.format, LIST_FIELDS) as writer:
+                    for name, info in data.items():
+                        writer.write(make_list_record(name, info))
+        elif options.count:
             logger.info(
                 f"There are currently {len(data)} repositories tracked by pygpm.")
         else:
             for name, info in data.items():
                 logger.info(f"{name}: {info['path']}")
+
+
+def make_list_record(name: str, info: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "name": name,
+        "author": info.get("author"),
+        "url": info.get("url"),
+        "path": info.get("path"),
+    }
@@ -0,0 +1,299 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Show one timeline of the most recent commits across tracked repositories.
+
+'git log --max-count=n' runs in every repository through the worker pool
+and its output, at most n commits, is read in full before the process is
+closed, so open pipes stay bounded by the pool size. The per-repository
+lists, each newest first, are then merged by commit time with a heap, so
+printing the newest n commits never reads a full history.
+"""
+
+import heapq
+import subprocess
+import sys
+import time
+
+from datetime import datetime
+from itertools import islice
+from optparse import Option, Values
+from typing import Iterator, List, Optional
+
+from dataclasses import dataclass
+
+from pygpm.breaker import BREAKER, Quarantined
+from pygpm.command import Command
+from pygpm.config import CONFIG
+from pygpm.fetch import summarize_git_error
+from pygpm.logging import Colors, get_logger
+from pygpm.output import create_writer, format_table
+from pygpm.parallel import imap_unordered
+from pygpm.parser import AUTHOR, FILTER_GROUP, FORMAT, SORT
+from pygpm.refs import get_git_dir, list_refs, read_ref
+from pygpm.registry import Registry, is_valid_entry
+from pygpm.util import parse_duration, stream_command_batches
+
+logger = get_logger(__name__)
+
+# Fields are split by the unit separator, commits by NUL ('-z').
+LOG_FORMAT = "%ct%x1f%H%x1f%an%x1f%ae%x1f%s"
+LOG_FIELDS = ["time", "name", "path", "commit", "author", "email", "subject"]
+SHORT_OID = 7
+
+
+@dataclass
+class LogEntry:
+    time: int
+    name: str
+    path: str
+    commit: str
+    author: str
+    email: str
+    subject: str
+
+
+class RepositoryLog:
+    """
+    The newest commits of one repository, newest first. Errors are kept in
+    'error'.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            path: str,
+            command: List[str],
+            all_branches: bool = False) -> None:
+        self.name = name
+        self.path = path
+        self.command = command
+        self.all_branches = all_branches
+        self.entries: List[LogEntry] = []
+        self.error: Optional[str] = None
+
+    def parse(self, record: bytes) -> LogEntry:
+        timestamp, commit, author, email, subject = record.decode(
+            "utf-8", "replace").split("\x1f", 4)
+        return LogEntry(int(timestamp), self.name, self.path, commit, author,
+                        email, subject)
+
+    def read(self) -> "RepositoryLog":
+        """
+        Run git and read its output to the end. Runs on the pool, so only
+        -j git processes are ever open at once, however many repositories
+        are tracked.
+        """
+        git_dir = get_git_dir(self.path)
+
+        # 'git log' fails on a branch without commits, there is just nothing
+        # to show.
+        if git_dir is not None and not has_commits(git_dir, self.all_branches):
+            return self
+
+        try:
+            with BREAKER.guard(self.path):
+                for batch in stream_command_batches(
+                        self.command, self.path, separator=b"\0"):
+                    self.entries.extend(
+                        self.parse(record) for record in batch if record)
+        except Quarantined as error:
+            self.error = str(error)
+        except subprocess.TimeoutExpired as error:
+            self.error = f"timed out after {error.timeout:g}s"
+        except subprocess.CalledProcessError as error:
+            self.error = summarize_git_error(error)
+        except (OSError, ValueError) as error:
+            self.error = str(error)
+
+        return self
+
+    def __iter__(self) -> Iterator[LogEntry]:
+        return iter(self.entries)
+
+
+def has_commits(git_dir: str, all_branches: bool) -> bool:
+    if all_branches:
+        return bool(list_refs(git_dir))
+
+    return read_ref(git_dir, "HEAD") is not None
+
+
+def build_log_command(options: Values) -> List[str]:
+    # No repository can contribute more than the whole timeline.
+    command = ["git", "log", "-z", f"--format={LOG_FORMAT}",
+               f"--max-count={options.count}"]
+
+    if options.all:
+        command.append("--branches")
+
+    if options.since is not None:
+        try:
+            seconds = int(parse_duration(options.since))
+            command.append(f"--since={seconds} seconds ago")
+        except ValueError:
+            # Anything else, e.g. '2026-10-01' or 'last monday', is up to git.
+            command.append(f"--since={options.since}")
+
+    if options.commit_author is not None:
+        command.append(f"--author={options.commit_author}")
+
+    if options.grep is not None:
+        command += ["-i", f"--grep={options.grep}"]
+
+    return command
+
+
+def merge_logs(logs: List[RepositoryLog], count: int) -> Iterator[LogEntry]:
+    """
+    The 'count' newest commits of all 'logs' combined, newest first.
+    """
+    return islice(heapq.merge(*logs, key=lambda entry: entry.time,
+                              reverse=True), count)
+
+
+def format_time(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
+
+
+class LogCommand(Command):
+    """
+    Show the most recent commits of every repository tracked by pygpm as a
+    single timeline, newest first.
+    """
+
+    usage = """
+      %prog [options]"""
+
+    def add_options(self) -> None:
+        self.cmd_options.add_option(
+            "-n",
+            "--max-count",
+            type="int",
+            dest="count",
+            default=CONFIG.log.count,
+            metavar="n",
+            help="Number of commits to show."
+        )
+
+        self.cmd_options.add_option(
+            "--since",
+            dest="since",
+            default=None,
+            metavar="date",
+            help="Only show commits newer than 'date', e.g. 7d, 12h, "
+                 "2026-10-01 or 'last monday'."
+        )
+
+        self.cmd_options.add_option(
+            "--author",
+            dest="commit_author",
+            default=None,
+            metavar="pattern",
+            help="Only show commits whose author matches the pattern."
+        )
+
+        self.cmd_options.add_option(
+            "--grep",
+            dest="grep",
+            default=None,
+            metavar="pattern",
+            help="Only show commits whose message matches the pattern, "
+                 "ignoring case."
+        )
+
+        self.cmd_options.add_option(
+            "--all",
+            action="store_true",
+            dest="all",
+            default=False,
+            help="Include every local branch, not just the checked out one."
+        )
+
+        self.cmd_options.add_option(
+            "-j",
+            "--jobs",
+            type="int",
+            dest="jobs",
+            default=CONFIG.log.workers,
+            metavar="n",
+            help="Number of repositories to start reading in parallel."
+        )
+
+        self.cmd_options.add_option(FORMAT())
+
+        # '--author' filters commits here, the repository owner filter
+        # moves to '--owner'. Output is in time order, so no '--sort'.
+        self.cmd_options.add_option(Option(
+            "--owner",
+            dest="author",
+            metavar="author",
+            default=None,
+            help="Only include repositories owned by the given author."
+        ))
+
+        for option in FILTER_GROUP:
+            if option not in (AUTHOR, SORT):
+                self.cmd_options.add_option(option())
+
+    def run(self, options: Values, args: list[str]) -> None:
+        if options.count < 1:
+            logger.colored_critical(
+                Colors.BOLD_RED, "--max-count must be at least 1.")
+            sys.exit(1)
+
+        registry = Registry.load()
+
+        if registry is None:
+            logger.colored_critical(
+                Colors.BOLD_RED,
+                "pygpm found no tracked repositories.")
+            sys.exit(1)
+
+        names = registry.select(options.author, options.path_prefix,
+                                options.name, options.remote_host)
+        command = build_log_command(options)
+        logs = [RepositoryLog(name, info["path"], command, options.all)
+                for name, info in registry.subset(sorted(names)).items()
+                if is_valid_entry(info)]
+        start = time.perf_counter()
+
+        for task in imap_unordered(RepositoryLog.read, logs, options.jobs):
+            if task.error is not None:
+                task.item.error = str(task.error)
+
+        if options.format:
+            with create_writer(options.format, LOG_FIELDS) as writer:
+                for entry in merge_logs(logs, options.count):
+                    writer.write(vars(entry))
+        else:
+            self.print_timeline(list(merge_logs(logs, options.count)))
+
+        failures = sorted((log for log in logs if log.error),
+                          key=lambda log: log.name)
+        logger.debug(
+            f"Merged {len(logs)} repositories in "
+            f"{time.perf_counter() - start:.3f}s.")
+
+        if failures and not options.format:
+            logger.colored_warning(Colors.RED, "Failed to read:")
+
+            for log in failures:
+                logger.colored_warning(
+                    Colors.RED, f"\t{log.name} ({log.path}): {log.error}")
+
+        if failures:
+            sys.exit(1)
+
+    def print_timeline(self, entries: List[LogEntry]) -> None:
+        if not entries:
+            logger.info("No matching commits.")
+            return
+
+        rows = [[format_time(entry.time), entry.name, entry.commit[:SHORT_OID],
+                 entry.author, entry.subject] for entry in entries]
+
+        for line in format_table(
+                ["Date", "Repository", "Commit", "Author", "Subject"], rows):
+            logger.info(line)
@@ -7,9 +7,11 @@ Customized logging for pygpm.
 
 import logging
 import logging.config
+import sys
+import time
 
 from enum import Enum
-from typing import Any, cast
+from typing import Any, List, Optional, TextIO, cast
 
 Colors = Enum("Colors", ["GREEN", "RED", "BOLD_RED", "YELLOW", "END"])
 
@@ -30,13 +32,11 @@ class ColoredLogger(logging.Logger):
             msg: str,
             *args: Any,
             **kwargs: Any) -> None:
-        color_code = COLOR_CODES[color]
-        color_end = COLOR_CODES[Colors.END]
-        self.log(
-            verbosity,
-            f"{color_code}{msg}{color_end}",
-            *args,
-            **kwargs)
+        # The color travels on the record so the formatter never has to
+        # sniff it back out of the rendered message.
+        extra = kwargs.pop("extra", None) or {}
+        extra["color"] = color
+        self.log(verbosity, msg, *args, extra=extra, **kwargs)
 
     def colored_debug(
             self,
@@ -84,42 +84,88 @@ class ColoredFormatter(logging.Formatter):
 
     def format(self, record: logging.LogRecord) -> str:
         formatted = super().format(record)
-        prefix = ""
+        color: Optional[Colors] = getattr(record, "color", None)
 
-        # TODO: Improve performance by making a custom implementation of
-        # logging.logRecord
-        message_color = None
+        if color is None or self.no_color:
+            if not self.add_timestamp:
+                return formatted
 
-        for color in Colors:
-            color_str = COLOR_CODES[color]
+            prefix = f"{self.format_time(record)} "
+            return "".join([prefix + line for line in formatted.splitlines(True)])
 
-            if formatted.startswith(color_str):
-                message_color = color_str
-                break
-
-        if self.no_color and message_color is not None:
-            formatted = formatted[len(message_color):]
+        color_code = COLOR_CODES[color]
+        color_end = COLOR_CODES[Colors.END]
 
-        if self.add_timestamp:
-            if message_color is not None and not self.no_color:
-                prefix = f"{COLOR_CODES[Colors.END]}{self.format_time(record)}{message_color} "
-            else:
-                prefix = f"{self.format_time(record)} "
+        if not self.add_timestamp:
+            return f"{color_code}{formatted}{color_end}"
 
-        formatted = "".join(
-            [prefix + line for line in formatted.splitlines(True)])
-        return formatted
+        prefix = f"{self.format_time(record)} {color_code}"
+        return "\n".join(
+            [f"{prefix}{line}{color_end}" for line in formatted.split("\n")])
 
     def format_time(self, record: logging.LogRecord) -> str:
         time = super().formatTime(record)
         return time.split(" ")[1][:-4]
 
 
+class BufferedStreamHandler(logging.StreamHandler):
+    """
+    Stream handler that writes records out in blocks instead of flushing the
+    stream after every line.
+
+    Buffered records are written once 'capacity' records are pending, once
+    'flush_interval' seconds have passed since the last write, when a record
+    at or above 'flush_level' arrives, or when the handler is flushed or
+    closed (logging does this at interpreter exit).
+    """
+
+    def __init__(
+            self,
+            stream: Optional[TextIO] = None,
+            capacity: int = 512,
+            flush_interval: float = 0.25,
+            flush_level: int = logging.WARNING) -> None:
+        super().__init__(stream)
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.buffer: List[str] = []
+        self.last_flush = time.monotonic()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.buffer.append(self.format(record) + self.terminator)
+        except Exception:  # pylint: disable=broad-except
+            self.handleError(record)
+            return
+
+        if (len(self.buffer) >= self.capacity
+                or record.levelno >= self.flush_level
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self) -> None:
+        self.acquire()
+
+        try:
+            if self.buffer:
+                self.stream.write("".join(self.buffer))
+                self.buffer.clear()
+
+            super().flush()
+            self.last_flush = time.monotonic()
+        finally:
+            self.release()
+
+
 # TODO: Add a logging file
 def setup_logging(
         verbosity: int = logging.NOTSET,
         no_color: bool = False,
         add_timestamp: bool = False) -> None:
+    # Imported here so importing pygpm does not load config.ini.
+    from pygpm.config import CONFIG
+
     if verbosity >= 1:
         level_number = logging.DEBUG
     elif verbosity == -1:
@@ -133,6 +179,12 @@ def setup_logging(
 
     level = logging.getLevelName(level_number)
 
+    # None of pygpm's formats use thread or process information, so skip
+    # collecting it for every record.
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
     log_streams = {
         "stdout": "ext://sys.stdout",
     }
@@ -152,8 +204,10 @@ def setup_logging(
             "default": {
                 "level": level,
                 "formatter": "colored",
-                "class": "logging.StreamHandler",
+                "class": "pygpm.logging.BufferedStreamHandler",
                 "stream": log_streams["stdout"],
+                "capacity": CONFIG.output.log_buffer,
+                "flush_interval": CONFIG.output.log_flush_interval,
             },
         },
         "loggers": {
@@ -168,6 +222,40 @@ def setup_logging(
     logging.config.dictConfig(logging_config)
 
 
+class ProgressLine:
+    """
+    Single, self-overwriting progress line on stderr. Does nothing unless
+    stderr is a terminal, so piped and cron output stays clean.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled and sys.stderr.isatty()
+        self.width = 0
+
+    def update(self, text: str) -> None:
+        if not self.enabled:
+            return
+
+        flush_logging()
+        padding = " " * max(self.width - len(text), 0)
+        sys.stderr.write(f"\r{text}{padding}")
+        sys.stderr.flush()
+        self.width = len(text)
+
+    def clear(self) -> None:
+        if not self.enabled or not self.width:
+            return
+
+        sys.stderr.write(f"\r{' ' * self.width}\r")
+        sys.stderr.flush()
+        self.width = 0
+
+
+def flush_logging() -> None:
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+
+
 def init_logging() -> None:
     logging.setLoggerClass(ColoredLogger)
 
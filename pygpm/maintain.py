@@ -0,0 +1,373 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Run git's housekeeping across all repositories tracked by pygpm.
+
+Repositories are surveyed first by counting their loose objects and packs
+straight from .git/objects, then maintained most in need first under a
+reduced CPU and I/O priority, so a run from cron stays out of the way of
+foreground work. When each repository was last maintained is kept in the
+'maintain' cache.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from dataclasses import dataclass
+from functools import partial
+from optparse import Values
+from typing import Any, List, Optional, Tuple
+
+from pygpm.cache import get_cache
+from pygpm.command import Command
+from pygpm.config import CONFIG
+from pygpm.fetch import summarize_git_error
+from pygpm.logging import Colors, ProgressLine, get_logger
+from pygpm.output import format_table
+from pygpm.parallel import imap_unordered
+from pygpm.parser import FILTER_GROUP
+from pygpm.refs import get_common_dir, get_git_dir
+from pygpm.registry import Registry
+from pygpm.util import format_duration, parse_duration, run_command
+
+logger = get_logger(__name__)
+
+# git's own defaults for gc.auto and gc.autoPackLimit.
+GC_AUTO_LOOSE = 6700
+GC_AUTO_PACKS = 50
+
+TASKS = ["maintenance", "gc", "commit-graph"]
+IONICE_CLASSES = [0, 2, 3]
+
+
+@dataclass
+class MaintainResult:
+    name: str
+    path: str
+    loose: int = 0
+    packs: int = 0
+    last_run: Optional[float] = None
+    elapsed: float = 0.0
+    skipped: bool = False
+    error: Optional[str] = None
+
+    @property
+    def priority(self) -> float:
+        # How close the repository is to git's own repack thresholds.
+        return max(self.loose / GC_AUTO_LOOSE, self.packs / GC_AUTO_PACKS)
+
+
+def count_objects(git_dir: str) -> Tuple[int, int]:
+    """
+    Number of loose objects and packs in a repository.
+    """
+    objects_dir = os.path.join(get_common_dir(git_dir), "objects")
+    loose = 0
+
+    try:
+        with os.scandir(objects_dir) as entries:
+            for entry in entries:
+                # Loose objects live in the two hex digit fan-out directories.
+                if len(entry.name) == 2 and entry.is_dir():
+                    loose += len(os.listdir(entry.path))
+    except OSError:
+        pass
+
+    try:
+        packs = sum(1 for name in os.listdir(os.path.join(objects_dir, "pack"))
+                    if name.endswith(".pack"))
+    except OSError:
+        packs = 0
+
+    return loose, packs
+
+
+def survey_entry(entry: Tuple[str, dict[str, Any]]) -> MaintainResult:
+    name, info = entry
+    result = MaintainResult(name, info["path"])
+    git_dir = get_git_dir(info["path"])
+
+    if git_dir is None:
+        result.error = "not a git repository"
+    else:
+        result.loose, result.packs = count_objects(git_dir)
+
+    last_run = get_cache("maintain").peek(info["path"])
+
+    if last_run is not None:
+        result.last_run = last_run["time"]
+
+    return result
+
+
+def get_task_command(task: str, force: bool) -> List[str]:
+    if task == "maintenance":
+        return ["git", "maintenance", "run"] + ([] if force else ["--auto"])
+
+    if task == "gc":
+        return ["git", "gc", "--quiet"] + ([] if force else ["--auto"])
+
+    return ["git", "commit-graph", "write", "--reachable", "--changed-paths"]
+
+
+def get_priority_prefix(niceness: int, ionice_class: int) -> List[str]:
+    """
+    Wrapper lowering the CPU and I/O priority of a command, where the
+    system has the tools for it.
+    """
+    prefix = []
+
+    if niceness and shutil.which("nice"):
+        prefix += ["nice", "-n", str(niceness)]
+
+    if ionice_class and shutil.which("ionice"):
+        prefix += ["ionice", "-c", str(ionice_class)]
+
+    return prefix
+
+
+def maintain_repository(
+        result: MaintainResult,
+        commands: List[List[str]],
+        timeout: Optional[float] = None) -> MaintainResult:
+    start = time.perf_counter()
+
+    try:
+        for command in commands:
+            run_command(command, result.path, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        result.error = f"timed out after {timeout}s"
+    except subprocess.CalledProcessError as error:
+        result.error = summarize_git_error(error)
+    except OSError as error:
+        result.error = str(error)
+
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def format_age(timestamp: Optional[float], now: float) -> str:
+    if timestamp is None:
+        return "never"
+
+    age = max(0.0, now - timestamp)
+    return "just now" if age < 60 else f"{format_duration(age)} ago"
+
+
+class MaintainCommand(Command):
+    """
+    Run 'git maintenance run --auto' in every repository tracked by pygpm,
+    the ones with the most loose objects and packs first. Jobs run niced
+    and with idle I/O priority by default so the command can be run from
+    cron without slowing down foreground work.
+    """
+
+    usage = """
+      %prog [options]"""
+
+    def add_options(self) -> None:
+        self.cmd_options.add_option(
+            "-j",
+            "--jobs",
+            type="int",
+            dest="jobs",
+            default=CONFIG.maintain.workers,
+            metavar="n",
+            help="Number of repositories to maintain at once."
+        )
+
+        self.cmd_options.add_option(
+            "-t",
+            "--task",
+            type="choice",
+            choices=TASKS,
+            action="append",
+            dest="tasks",
+            default=[],
+            metavar="task",
+            help=f"Housekeeping to run ({'|'.join(TASKS)}), maintenance by "
+                 "default. Can be given multiple times."
+        )
+
+        self.cmd_options.add_option(
+            "-f",
+            "--force",
+            action="store_true",
+            dest="force",
+            default=False,
+            help="Run the tasks even where git's thresholds say they are "
+                 "not needed yet."
+        )
+
+        self.cmd_options.add_option(
+            "--min-interval",
+            dest="min_interval",
+            default=None,
+            metavar="duration",
+            help="Skip repositories maintained within 'duration', e.g. 12h "
+                 "or 7d."
+        )
+
+        self.cmd_options.add_option(
+            "--nice",
+            type="int",
+            dest="niceness",
+            default=CONFIG.maintain.niceness,
+            metavar="n",
+            help="Niceness added to the maintenance jobs, 0 to leave unchanged."
+        )
+
+        self.cmd_options.add_option(
+            "--ionice",
+            type="choice",
+            choices=[str(value) for value in IONICE_CLASSES],
+            dest="ionice_class",
+            default=str(CONFIG.maintain.ionice_class),
+            metavar="class",
+            help="I/O scheduling class of the maintenance jobs, 3 for idle, "
+                 "2 for best-effort or 0 to leave unchanged."
+        )
+
+        self.cmd_options.add_option(
+            "--timeout",
+            type="float",
+            dest="timeout",
+            default=CONFIG.maintain.timeout,
+            metavar="seconds",
+            help="Abort a repository's maintenance after the given number of "
+                 "seconds."
+        )
+
+        self.cmd_options.add_option(
+            "-n",
+            "--dry-run",
+            action="store_true",
+            dest="dry_run",
+            default=False,
+            help="Show the order repositories would be maintained in without "
+                 "running anything."
+        )
+
+        for option in FILTER_GROUP:
+            self.cmd_options.add_option(option())
+
+    def run(self, options: Values, args: list[str]) -> None:
+        min_interval: Optional[float] = None
+
+        if options.min_interval is not None:
+            try:
+                min_interval = parse_duration(options.min_interval)
+            except ValueError as error:
+                logger.colored_critical(Colors.BOLD_RED, str(error))
+                sys.exit(1)
+
+        if int(options.ionice_class) not in IONICE_CLASSES:
+            logger.colored_critical(
+                Colors.BOLD_RED,
+                f"maintain.ionice_class must be one of "
+                f"{', '.join(map(str, IONICE_CLASSES))}.")
+            sys.exit(1)
+
+        registry = Registry.load()
+
+        if registry is None:
+            logger.colored_critical(
+                Colors.BOLD_RED,
+                "pygpm found no tracked repositories.")
+            sys.exit(1)
+
+        repositories = registry.query(options)
+        now = time.time()
+        results = [task.value for task in imap_unordered(
+            survey_entry, repositories.items(), CONFIG.status.workers)
+            if task.value is not None]
+
+        for result in results:
+            if (min_interval is not None and result.last_run is not None
+                    and now - result.last_run < min_interval):
+                result.skipped = True
+
+        # Most in need first, then the longest since their last run.
+        results.sort(key=lambda result: (
+            -result.priority, result.last_run or 0, result.name))
+        queue = [result for result in results
+                 if not result.skipped and result.error is None]
+
+        if options.dry_run:
+            self.print_table(results, now, planned=True)
+            return
+
+        prefix = get_priority_prefix(options.niceness, int(options.ionice_class))
+        commands = [prefix + get_task_command(task, options.force)
+                    for task in dict.fromkeys(options.tasks or ["maintenance"])]
+        maintain = partial(maintain_repository, commands=commands,
+                           timeout=options.timeout or None)
+        cache = get_cache("maintain")
+        progress = ProgressLine(self.verbosity >= 0)
+        start = time.perf_counter()
+        done = 0
+
+        logger.debug(f"Running {' && '.join(' '.join(c) for c in commands)}")
+
+        # The pool starts items in queue order, so the priority holds.
+        for task in imap_unordered(maintain, queue, options.jobs):
+            result = task.item
+
+            if task.error is not None:
+                result.error = str(task.error)
+            elif result.error is None:
+                cache.set(result.path, {
+                    "time": time.time(),
+                    "elapsed": result.elapsed,
+                    "loose": result.loose,
+                    "packs": result.packs,
+                })
+
+            done += 1
+            progress.update(f"Maintained {done}/{len(queue)} repositories")
+
+        progress.clear()
+        cache.save()
+        self.print_table(results, now)
+
+        failures = [result for result in results if result.error is not None]
+        logger.info(
+            f"Maintained {len(queue)} repositories in "
+            f"{time.perf_counter() - start:.3f}s: "
+            f"{sum(result.skipped for result in results)} skipped, "
+            f"{len(failures)} failed.")
+
+        if failures:
+            sys.exit(1)
+
+    def print_table(self, results: List[MaintainResult], now: float,
+                    planned: bool = False) -> None:
+        rows = []
+
+        for result in results:
+            if result.error is not None:
+                outcome = result.error
+            elif result.skipped:
+                outcome = "skipped"
+            elif planned:
+                outcome = "queued"
+            else:
+                outcome = f"{result.elapsed:.2f}s"
+
+            rows.append([result.name, str(result.loose), str(result.packs),
+                         format_age(result.last_run, now), outcome])
+
+        table = format_table(
+            ["Repository", "Loose", "Packs", "Last run", "Result"], rows,
+            ["<", ">", ">", "<", "<"])
+        logger.info(table[0])
+
+        for result, line in zip(results, table[1:]):
+            if result.error is not None:
+                logger.colored_info(Colors.RED, line)
+            else:
+                logger.info(line)
@@ -0,0 +1,289 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Opt-in Prometheus metrics collected over a single pygpm command run.
+
+Metrics are only recorded once the registry is enabled (see the
+'--metrics-file' general option) and are written out in the Prometheus text
+exposition format, suitable for the node_exporter textfile collector.
+"""
+
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+
+    pairs = [f'{name}="{escape_label_value(value)}"'
+             for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+
+    if float(value).is_integer():
+        return str(int(value))
+
+    return repr(float(value))
+
+
+class Metric:
+    type_name: str = ""
+
+    def __init__(
+            self,
+            registry: "MetricsRegistry",
+            name: str,
+            help: str,
+            labelnames: Sequence[str] = ()) -> None:
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(
+            self,
+            registry: "MetricsRegistry",
+            name: str,
+            help: str,
+            labelnames: Sequence[str] = ()) -> None:
+        super().__init__(registry, name, help, labelnames)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if not self.registry.enabled:
+            return
+
+        key = self._label_values(labels)
+
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                labels = format_labels(self.labelnames, key)
+                lines.append(f"{self.name}{labels} {format_value(value)}")
+
+        return lines
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        if not self.registry.enabled:
+            return
+
+        key = self._label_values(labels)
+
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(
+            self,
+            registry: "MetricsRegistry",
+            name: str,
+            help: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self.counts: Dict[LabelValues, List[int]] = {}
+        self.sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not self.registry.enabled:
+            return
+
+        key = self._label_values(labels)
+
+        with self.lock:
+            counts = self.counts.setdefault(key, [0] * len(self.buckets))
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+
+            self.sums[key] = self.sums.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        bucket_names = self.labelnames + ("le",)
+
+        with self.lock:
+            for key, counts in sorted(self.counts.items()):
+                for bound, count in zip(self.buckets, counts):
+                    labels = format_labels(
+                        bucket_names, key + (format_value(bound),))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+
+                labels = format_labels(self.labelnames, key)
+                lines.append(
+                    f"{self.name}_sum{labels} {format_value(self.sums[key])}")
+                lines.append(f"{self.name}_count{labels} {counts[-1]}")
+
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.metrics: List[Metric] = []
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def counter(self, name: str, help: str,
+                labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(self, name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str,
+              labelnames: Sequence[str] = ()) -> Gauge:
+        metric = Gauge(self, name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(
+            self,
+            name: str,
+            help: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(self, name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        for metric in self.metrics:
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        # Write then rename so the textfile collector never scrapes a
+        # partially written file.
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(self.render())
+
+        os.replace(tmp_path, path)
+
+
+REGISTRY = MetricsRegistry()
+
+COMMAND_SECONDS = REGISTRY.histogram(
+    "pygpm_command_duration_seconds",
+    "Wall time of a pygpm command run.",
+    ["command"])
+
+COMMAND_LAST_RUN = REGISTRY.gauge(
+    "pygpm_command_last_run_timestamp_seconds",
+    "Unix time at which the pygpm command run finished.",
+    ["command"])
+
+GIT_SUBPROCESSES = REGISTRY.counter(
+    "pygpm_git_subprocesses_total",
+    "Number of git subprocesses spawned, by git subcommand.",
+    ["subcommand"])
+
+GIT_SUBPROCESS_SECONDS = REGISTRY.histogram(
+    "pygpm_git_subprocess_duration_seconds",
+    "Wall time of git subprocesses, by git subcommand.",
+    ["subcommand"])
+
+GIT_BATCH_QUERIES = REGISTRY.counter(
+    "pygpm_git_batch_queries_total",
+    "Number of object queries answered by long-lived git cat-file workers.",
+    ["mode"])
+
+STATUS_SECONDS = REGISTRY.histogram(
+    "pygpm_repository_status_duration_seconds",
+    "Latency of collecting the status of a single repository.")
+
+STATUS_LAST_SECONDS = REGISTRY.gauge(
+    "pygpm_repository_status_last_duration_seconds",
+    "Latency of the most recent status collection, per repository.",
+    ["repository"])
+
+CACHE_HITS = REGISTRY.counter(
+    "pygpm_cache_hits_total",
+    "Number of cache lookups answered from a cache, by namespace.",
+    ["namespace"])
+
+CACHE_MISSES = REGISTRY.counter(
+    "pygpm_cache_misses_total",
+    "Number of cache lookups that missed, by namespace.",
+    ["namespace"])
+
+GITHUB_REQUESTS = REGISTRY.counter(
+    "pygpm_github_requests_total",
+    "Number of GitHub API requests, by HTTP status code.",
+    ["code"])
+
+GITHUB_NOT_MODIFIED = REGISTRY.counter(
+    "pygpm_github_not_modified_total",
+    "Number of GitHub API requests answered with 304 Not Modified.")
+
+GITHUB_RATE_LIMIT_WAITS = REGISTRY.counter(
+    "pygpm_github_rate_limit_waits_total",
+    "Number of times pygpm waited for the GitHub rate limit to reset.")
+
+GITHUB_RATE_LIMIT_WAIT_SECONDS = REGISTRY.counter(
+    "pygpm_github_rate_limit_wait_seconds_total",
+    "Total time spent waiting for the GitHub rate limit to reset.")
@@ -0,0 +1,193 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Machine-readable output writers for pygpm commands.
+
+Records are serialized straight to a buffered stdout writer and never pass
+through logging, so the output carries no colors or timestamps and is cheap
+to produce for large registries.
+"""
+
+import json
+import sys
+
+from typing import Any, List, Optional, Sequence, TextIO
+
+from pygpm.config import CONFIG
+
+SIZE_UNITS = ["B", "KiB", "MiB", "GiB", "TiB"]
+
+FORMATS = ["json", "ndjson", "tsv"]
+
+
+class RecordWriter:
+    def __init__(
+            self,
+            fields: Sequence[str],
+            stream: Optional[TextIO] = None,
+            capacity: int = 256) -> None:
+        self.fields = list(fields)
+        self.stream = stream if stream is not None else sys.stdout
+        self.capacity = capacity
+        self.buffer: List[str] = []
+        self.count = 0
+
+    def serialize(self, record: dict[str, Any]) -> str:
+        raise NotImplementedError
+
+    def header(self) -> Optional[str]:
+        return None
+
+    def footer(self) -> Optional[str]:
+        return None
+
+    def write(self, record: dict[str, Any]) -> None:
+        if self.count == 0:
+            header = self.header()
+
+            if header is not None:
+                self.buffer.append(header)
+
+        self.buffer.append(self.serialize(record))
+        self.count += 1
+
+        if len(self.buffer) >= self.capacity:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.stream.write("".join(self.buffer))
+            self.buffer.clear()
+
+        self.stream.flush()
+
+    def close(self) -> None:
+        if self.count == 0:
+            header = self.header()
+
+            if header is not None:
+                self.buffer.append(header)
+
+        footer = self.footer()
+
+        if footer is not None:
+            self.buffer.append(footer)
+
+        self.flush()
+
+    def __enter__(self) -> "RecordWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class JsonWriter(RecordWriter):
+    """
+    Writes a single JSON array, streamed one element at a time.
+    """
+
+    def header(self) -> str:
+        return "["
+
+    def footer(self) -> str:
+        return "\n]\n" if self.count else "]\n"
+
+    def serialize(self, record: dict[str, Any]) -> str:
+        separator = "\n" if self.count == 0 else ",\n"
+        return separator + json.dumps(record, separators=(",", ":"))
+
+
+class NdjsonWriter(RecordWriter):
+    """
+    Writes one JSON object per line.
+    """
+
+    def serialize(self, record: dict[str, Any]) -> str:
+        return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+class TsvWriter(RecordWriter):
+    """
+    Writes a header row followed by one tab separated row per record.
+    Only scalar fields listed in 'fields' are written.
+    """
+
+    def header(self) -> str:
+        return "\t".join(self.fields) + "\n"
+
+    def serialize(self, record: dict[str, Any]) -> str:
+        return "\t".join([tsv_value(record.get(field))
+                          for field in self.fields]) + "\n"
+
+
+def tsv_value(value: Any) -> str:
+    if value is None:
+        return ""
+
+    if isinstance(value, bool):
+        return "true" if value else "false"
+
+    if isinstance(value, (list, dict)):
+        value = json.dumps(value, separators=(",", ":"))
+
+    return str(value).replace("\\", "\\\\").replace(
+        "\t", "\\t").replace("\n", "\\n")
+
+
+def format_table(
+        headers: Sequence[str],
+        rows: Sequence[Sequence[str]],
+        align: Optional[Sequence[str]] = None,
+        separator: str = "  ") -> List[str]:
+    """
+    Render 'rows' as aligned text columns, header line first. Column widths
+    are found in a single pass over the rows. 'align' holds '<' or '>' per
+    column and defaults to left aligned.
+    """
+    widths = [len(header) for header in headers]
+
+    for row in rows:
+        for i, cell in enumerate(row):
+            if len(cell) > widths[i]:
+                widths[i] = len(cell)
+
+    alignments = align or ["<"] * len(headers)
+
+    def render(cells: Sequence[str]) -> str:
+        return separator.join([
+            cell.rjust(width) if alignment == ">" else cell.ljust(width)
+            for cell, width, alignment in zip(cells, widths, alignments)
+        ]).rstrip()
+
+    return [render(headers)] + [render(row) for row in rows]
+
+
+def format_size(size: Optional[int]) -> str:
+    if size is None:
+        return "-"
+
+    value = float(size)
+
+    for unit in SIZE_UNITS:
+        if value < 1024 or unit == SIZE_UNITS[-1]:
+            break
+
+        value /= 1024
+
+    return f"{int(value)} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+
+
+WRITERS: dict[str, type[RecordWriter]] = {
+    "json": JsonWriter,
+    "ndjson": NdjsonWriter,
+    "tsv": TsvWriter,
+}
+
+
+def create_writer(
+        format: str,
+        fields: Sequence[str],
+        stream: Optional[TextIO] = None) -> RecordWriter:
+    return WRITERS[format](fields, stream, CONFIG.output.buffer_records)
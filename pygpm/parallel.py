@@ -0,0 +1,103 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Bounded worker pool helpers shared by the fleet-wide pygpm commands.
+"""
+
+import os
+
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import (Callable, Deque, Dict, Generic, Hashable, Iterable,
+                    Iterator, List, Optional, TypeVar)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+# Python 3.10 does not allow a generic NamedTuple.
+@dataclass(frozen=True)
+class TaskResult(Generic[T, R]):
+    item: T
+    value: Optional[R]
+    error: Optional[BaseException]
+
+
+def default_workers() -> int:
+    return min(32, (os.cpu_count() or 1) * 2)
+
+
+def interleave(items: Iterable[T], key: Callable[[T], Hashable]) -> List[T]:
+    """
+    Reorder 'items' round-robin across the groups given by 'key', so that
+    items sharing a group (e.g. a remote host) are spread through the queue
+    instead of all waiting on the same per-group limit at once.
+    """
+    groups: "OrderedDict[Hashable, Deque[T]]" = OrderedDict()
+
+    for item in items:
+        groups.setdefault(key(item), deque()).append(item)
+
+    ordered = []
+
+    while groups:
+        for group_key in list(groups):
+            group = groups[group_key]
+            ordered.append(group.popleft())
+
+            if not group:
+                del groups[group_key]
+
+    return ordered
+
+
+def imap_unordered(
+        func: Callable[[T], R],
+        items: Iterable[T],
+        workers: int = 0) -> Iterator[TaskResult[T, R]]:
+    """
+    Run 'func' over 'items' on a thread pool and yield results in completion
+    order. At most 'workers' items are in flight at any time, so memory is
+    bounded by the pool size rather than by the number of items. Closing the
+    iterator early cancels everything that has not started yet.
+    """
+    workers = workers if workers > 0 else default_workers()
+    items_iter = iter(items)
+    pending: Dict[Future[R], T] = {}
+
+    def submit_next(executor: ThreadPoolExecutor) -> bool:
+        try:
+            item = next(items_iter)
+        except StopIteration:
+            return False
+
+        pending[executor.submit(func, item)] = item
+        return True
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for _ in range(workers):
+                if not submit_next(executor):
+                    break
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    item = pending.pop(future)
+                    error = future.exception()
+                    value = None if error is not None else future.result()
+                    yield TaskResult(item, value, error)
+                    submit_next(executor)
+        except KeyboardInterrupt:
+            # Workers' commands run in their own process groups, which the
+            # terminal's Ctrl-C does not reach.
+            from pygpm.util import kill_running_commands
+            kill_running_commands()
+            raise
+        finally:
+            for future in pending:
+                future.cancel()
+
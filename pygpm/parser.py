@@ -13,7 +13,9 @@ from functools import partial
 from optparse import IndentedHelpFormatter, Option, OptionGroup, OptionParser
 from typing import Any, Callable, List
 
-from pygpm.core import __version__
+from pygpm.core import METRICS_FILE, __version__
+from pygpm.output import FORMATS
+from pygpm.registry import SORT_KEYS
 
 # General options
 VERSION: Callable[..., Option] = partial(
@@ -72,13 +74,115 @@ TIME_COMMAND: Callable[..., Option] = partial(
     help="Adds a timer onto the selected command and displays the total command runtime."
 )
 
+METRICS_FILE_OPTION: Callable[..., Option] = partial(
+    Option,
+    "--metrics-file",
+    dest="metrics_file",
+    metavar="path",
+    default=METRICS_FILE,
+    help="Write Prometheus metrics for the command run to the given file."
+)
+
 GENERAL_GROUP: List[Callable[..., Option]] = [
     VERSION,
     VERBOSE,
     QUIET,
     NO_COLOR,
     SHOW_TIME,
-    TIME_COMMAND
+    TIME_COMMAND,
+    METRICS_FILE_OPTION,
+]
+
+
+# Shared command options
+FORMAT: Callable[..., Option] = partial(
+    Option,
+    "--format",
+    dest="format",
+    type="choice",
+    choices=FORMATS,
+    metavar="format",
+    default=None,
+    help=f"Write machine-readable output instead of log lines ({'|'.join(FORMATS)})."
+)
+
+AUTHOR: Callable[..., Option] = partial(
+    Option,
+    "--author",
+    dest="author",
+    metavar="author",
+    default=None,
+    help="Only include repositories owned by the given author."
+)
+
+PATH_PREFIX: Callable[..., Option] = partial(
+    Option,
+    "--path-prefix",
+    dest="path_prefix",
+    metavar="path",
+    default=None,
+    help="Only include repositories located under the given directory."
+)
+
+NAME: Callable[..., Option] = partial(
+    Option,
+    "--name",
+    dest="name",
+    metavar="glob",
+    default=None,
+    help="Only include repositories whose name matches the given glob."
+)
+
+REMOTE_HOST: Callable[..., Option] = partial(
+    Option,
+    "--remote-host",
+    dest="remote_host",
+    metavar="host",
+    default=None,
+    help="Only include repositories whose origin is on the given host "
+         "('local' for file and path remotes)."
+)
+
+SORT: Callable[..., Option] = partial(
+    Option,
+    "--sort",
+    dest="sort",
+    type="choice",
+    choices=SORT_KEYS,
+    metavar="key",
+    default=None,
+    help=f"Order repositories by the given key ({'|'.join(SORT_KEYS)})."
+)
+
+FILTER_GROUP: List[Callable[..., Option]] = [
+    AUTHOR,
+    PATH_PREFIX,
+    NAME,
+    REMOTE_HOST,
+    SORT,
+]
+
+RECENT_FIRST: Callable[..., Option] = partial(
+    Option,
+    "--recent-first",
+    dest="recent_first",
+    action="store_true",
+    default=False,
+    help="Start repositories with activity in the last day before the rest."
+)
+
+SCHEDULE_REPORT: Callable[..., Option] = partial(
+    Option,
+    "--schedule-report",
+    dest="schedule_report",
+    action="store_true",
+    default=False,
+    help="Finish with the predicted and actual wall time of the run."
+)
+
+SCHEDULE_GROUP: List[Callable[..., Option]] = [
+    RECENT_FIRST,
+    SCHEDULE_REPORT,
 ]
 
 
@@ -109,7 +213,7 @@ COMMANDS_DICT: dict[str, CommandInfo] = {
     "clean": CommandInfo(
         "pygpm.clean",
         "CleanCommand",
-        "Clean all data related to tracked repositories."
+        "Clean tracked repository data or cached data."
     ),
     "help": CommandInfo(
         "pygpm.help",
@@ -121,6 +225,67 @@ COMMANDS_DICT: dict[str, CommandInfo] = {
         "ListCommand",
         "List out the directory of all tracked git repositories."
     ),
+    "fetch": CommandInfo(
+        "pygpm.fetch",
+        "FetchCommand",
+        "Fetch remote-tracking refs for all tracked repositories in parallel."
+    ),
+    "sync": CommandInfo(
+        "pygpm.sync",
+        "SyncCommand",
+        "Fetch all tracked repositories and fast-forward the ones that are "
+        "safely behind."
+    ),
+    "stats": CommandInfo(
+        "pygpm.stats",
+        "StatsCommand",
+        "Show activity and size stats for all tracked repositories."
+    ),
+    "grep": CommandInfo(
+        "pygpm.grep",
+        "GrepCommand",
+        "Search all tracked repositories with 'git grep' in parallel."
+    ),
+    "log": CommandInfo(
+        "pygpm.log",
+        "LogCommand",
+        "Show the most recent commits across all tracked repositories."
+    ),
+    "maintain": CommandInfo(
+        "pygpm.maintain",
+        "MaintainCommand",
+        "Run git housekeeping across all tracked repositories at low priority."
+    ),
+    "prune": CommandInfo(
+        "pygpm.prune",
+        "PruneCommand",
+        "Remove or update stale tracked repository entries."
+    ),
+    "doctor": CommandInfo(
+        "pygpm.prune",
+        "DoctorCommand",
+        "Check all tracked repository entries and report problems."
+    ),
+    "config": CommandInfo(
+        "pygpm.config_command",
+        "ConfigCommand",
+        "Show the effective pygpm configuration."
+    ),
+    "export": CommandInfo(
+        "pygpm.snapshot",
+        "ExportCommand",
+        "Export tracked repositories and cached data to a snapshot."
+    ),
+    "import": CommandInfo(
+        "pygpm.snapshot",
+        "ImportCommand",
+        "Import tracked repositories and cached data from a snapshot."
+    ),
+    "batch": CommandInfo(
+        "pygpm.batch",
+        "BatchCommand",
+        "Run many pygpm commands, read from a file or stdin, in one process."
+    ),
 }
 
 
@@ -0,0 +1,174 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Per-repository 'git status' strategy profiles.
+
+A profile is configured with a '[status:<repository name or path>]' section
+in config.ini, for example:
+
+  [status:monorepo]
+  untracked_files = no
+  ignore_submodules = all
+  untracked_cache = True
+  fsmonitor = True
+
+untracked_cache and fsmonitor are passed to git with '-c' for pygpm's own
+status calls only, the repository's git config is never modified.
+"""
+
+import os
+import statistics
+import subprocess
+import time
+
+from dataclasses import dataclass
+from itertools import product
+from typing import List, Optional
+
+from pygpm.config import CONFIG, PROFILE_PREFIX, ConfigError, parse_value
+
+# Ordered from least to most information reported.
+UNTRACKED_FILES_MODES = ["no", "normal", "all"]
+IGNORE_SUBMODULES_MODES = ["all", "dirty", "untracked", "none"]
+
+
+@dataclass(frozen=True)
+class StatusProfile:
+    untracked_files: str = "normal"
+    ignore_submodules: str = "none"
+    untracked_cache: bool = False
+    fsmonitor: bool = False
+
+    def git_config_args(self) -> List[str]:
+        args = []
+
+        if self.untracked_cache:
+            args += ["-c", "core.untrackedCache=true"]
+
+        if self.fsmonitor:
+            args += ["-c", "core.fsmonitor=true"]
+
+        return args
+
+    def status_args(self) -> List[str]:
+        args = []
+
+        if self.untracked_files != "normal":
+            args.append(f"--untracked-files={self.untracked_files}")
+
+        if self.ignore_submodules != "none":
+            args.append(f"--ignore-submodules={self.ignore_submodules}")
+
+        return args
+
+    def covers(self, other: "StatusProfile") -> bool:
+        """
+        True if this profile reports at least as much as 'other'.
+        """
+        return (
+            UNTRACKED_FILES_MODES.index(self.untracked_files)
+            >= UNTRACKED_FILES_MODES.index(other.untracked_files)
+            and IGNORE_SUBMODULES_MODES.index(self.ignore_submodules)
+            >= IGNORE_SUBMODULES_MODES.index(other.ignore_submodules))
+
+    def to_config(self, section: str) -> str:
+        return "\n".join([
+            f"[{section}]",
+            f"untracked_files = {self.untracked_files}",
+            f"ignore_submodules = {self.ignore_submodules}",
+            f"untracked_cache = {self.untracked_cache}",
+            f"fsmonitor = {self.fsmonitor}",
+        ])
+
+
+DEFAULT_PROFILE = StatusProfile()
+
+
+def get_profile_section(name: Optional[str], path: str) -> str:
+    for key in (path, name):
+        if key and f"{PROFILE_PREFIX}{key}" in CONFIG.profiles:
+            return f"{PROFILE_PREFIX}{key}"
+
+    return f"{PROFILE_PREFIX}{name or os.path.basename(path)}"
+
+
+def get_status_profile(name: Optional[str], path: str) -> StatusProfile:
+    section = get_profile_section(name, path)
+
+    if section not in CONFIG.profiles:
+        return DEFAULT_PROFILE
+
+    config = CONFIG.profiles[section]
+    untracked_files = config.get("untracked_files", "normal").strip("\"'")
+    ignore_submodules = config.get("ignore_submodules", "none").strip("\"'")
+
+    if untracked_files not in UNTRACKED_FILES_MODES:
+        raise ConfigError(
+            f"[{section}] untracked_files must be one of "
+            f"{', '.join(UNTRACKED_FILES_MODES)}, not '{untracked_files}'.")
+
+    if ignore_submodules not in IGNORE_SUBMODULES_MODES:
+        raise ConfigError(
+            f"[{section}] ignore_submodules must be one of "
+            f"{', '.join(IGNORE_SUBMODULES_MODES)}, not '{ignore_submodules}'.")
+
+    return StatusProfile(
+        untracked_files=untracked_files,
+        ignore_submodules=ignore_submodules,
+        untracked_cache=parse_value(
+            section, "untracked_cache", config.get("untracked_cache", "false"), bool),
+        fsmonitor=parse_value(
+            section, "fsmonitor", config.get("fsmonitor", "false"), bool),
+    )
+
+
+def fsmonitor_supported(path: str) -> bool:
+    result = subprocess.run(
+        ["git", "fsmonitor--daemon", "status"],
+        cwd=path, capture_output=True, check=False)
+
+    # 0 and 1 are "watching" and "not watching", unsupported platforms exit
+    # with 128 and older gits do not know the subcommand at all.
+    return result.returncode in (0, 1) and b"not a git command" not in result.stderr
+
+
+def candidate_profiles(path: str, current: StatusProfile) -> List[StatusProfile]:
+    """
+    Every profile that reports at least as much information as 'current'.
+    Submodule modes are only tried when the repository has submodules.
+    """
+    has_submodules = os.path.isfile(os.path.join(path, ".gitmodules"))
+    submodule_modes = IGNORE_SUBMODULES_MODES if has_submodules else ["none"]
+    fsmonitor_modes = [False, True] if fsmonitor_supported(path) else [False]
+    candidates = []
+
+    for untracked_files, ignore_submodules, untracked_cache, fsmonitor in product(
+            UNTRACKED_FILES_MODES, submodule_modes, [False, True], fsmonitor_modes):
+        profile = StatusProfile(
+            untracked_files, ignore_submodules, untracked_cache, fsmonitor)
+
+        if profile.covers(current):
+            candidates.append(profile)
+
+    return candidates
+
+
+def time_profile(path: str, profile: StatusProfile, runs: int = 3) -> float:
+    """
+    Median wall time of 'git status' under 'profile'. One untimed warm-up
+    run fills the untracked cache and fsmonitor state first.
+    """
+    command = ["git", *profile.git_config_args(), "status",
+               "--porcelain=v2", "-z", *profile.status_args()]
+    timings = []
+
+    for i in range(runs + 1):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=path, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=True)
+
+        if i:
+            timings.append(time.perf_counter() - start)
+
+    return statistics.median(timings)
@@ -0,0 +1,243 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Validate tracked repositories and prune stale registry entries.
+"""
+
+import os
+import sys
+import time
+
+from dataclasses import dataclass, field
+from optparse import Values
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pygpm.command import Command
+from pygpm.config import CONFIG
+from pygpm.logging import Colors, ProgressLine, get_logger
+from pygpm.output import format_table
+from pygpm.parallel import imap_unordered
+from pygpm.refs import get_git_dir, get_remote_url
+from pygpm.track import get_url_author
+from pygpm.util import (get_repository_cached_data,
+                        write_repository_cached_data)
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class EntryCheck:
+    name: str
+    path: str
+    problem: Optional[str] = None
+    # 'remove', 'update' or 'keep', None if the entry is fine.
+    action: Optional[str] = None
+    changes: Dict[str, str] = field(default_factory=dict)
+
+
+def normalize_url(url: Optional[str]) -> str:
+    url = (url or "").rstrip("/")
+    return url[:-len(".git")] if url.endswith(".git") else url
+
+
+def check_entry(entry: Tuple[str, dict[str, Any]]) -> EntryCheck:
+    name, info = entry
+    path = info["path"]
+    check = EntryCheck(name, path)
+
+    if not os.path.isdir(path):
+        check.problem, check.action = "path does not exist", "remove"
+        return check
+
+    git_dir = get_git_dir(path)
+
+    if git_dir is None:
+        check.problem, check.action = "not a git repository", "remove"
+        return check
+
+    url = get_remote_url(git_dir)
+
+    if url is None:
+        check.problem, check.action = "no 'origin' remote", "keep"
+    elif normalize_url(url) != normalize_url(info.get("url")):
+        check.problem = f"remote changed to {url}"
+        check.action = "update"
+        check.changes = {"url": url, "author": get_url_author(url)}
+
+    return check
+
+
+def find_repositories(roots: List[str]) -> Iterator[str]:
+    """
+    Paths of git repositories below 'roots', not descending into
+    repositories or hidden directories.
+    """
+    for root in roots:
+        for directory, dirnames, filenames in os.walk(os.path.abspath(root)):
+            if ".git" in dirnames or ".git" in filenames:
+                dirnames.clear()
+                yield directory
+                continue
+
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+
+
+def resolve_moved(checks: List[EntryCheck], entries: dict[str, dict[str, Any]],
+                  roots: List[str]) -> None:
+    """
+    Point removed entries at a repository below 'roots' with the same
+    remote URL, if there is one.
+    """
+    missing = {normalize_url(entries[check.name].get("url")): check
+               for check in checks if check.action == "remove"}
+
+    if not missing:
+        return
+
+    for path in find_repositories(roots):
+        git_dir = get_git_dir(path)
+        check = missing.pop(normalize_url(
+            get_remote_url(git_dir) if git_dir else None), None)
+
+        if check is not None:
+            check.problem = f"{check.problem}, moved to {path}"
+            check.action = "update"
+            check.changes = {"path": path}
+
+        if not missing:
+            return
+
+
+def check_all(entries: dict[str, dict[str, Any]],
+              workers: int = 0,
+              roots: Optional[List[str]] = None,
+              show_progress: bool = False) -> List[EntryCheck]:
+    progress = ProgressLine(show_progress)
+    checks: List[EntryCheck] = []
+
+    for task in imap_unordered(check_entry, entries.items(), workers):
+        assert task.value is not None
+        checks.append(task.value)
+        progress.update(f"Checked {len(checks)}/{len(entries)} entries")
+
+    progress.clear()
+
+    if roots:
+        resolve_moved(checks, entries, roots)
+
+    checks.sort(key=lambda check: check.name)
+    return checks
+
+
+class PruneCommand(Command):
+    """
+    Check every tracked repository concurrently and remove entries whose
+    checkout no longer exists or is no longer a git repository. Entries
+    whose remote changed are updated, as are moved checkouts found below a
+    '--search' directory. The registry is rewritten once at the end.
+    """
+
+    usage = """
+      %prog [options]"""
+
+    dry_run = False
+
+    def add_options(self) -> None:
+        self.cmd_options.add_option(
+            "-j",
+            "--jobs",
+            type="int",
+            dest="jobs",
+            default=CONFIG.status.workers,
+            metavar="n",
+            help="Number of entries to check in parallel."
+        )
+
+        self.cmd_options.add_option(
+            "-s",
+            "--search",
+            action="append",
+            dest="search",
+            default=[],
+            metavar="path",
+            help="Look for moved checkouts below the given directory. "
+                 "Can be given multiple times."
+        )
+
+        if not self.dry_run:
+            self.cmd_options.add_option(
+                "-n",
+                "--dry-run",
+                action="store_true",
+                dest="dry_run",
+                default=False,
+                help="Report what would change without writing the registry."
+            )
+
+    def run(self, options: Values, args: list[str]) -> None:
+        entries = get_repository_cached_data()
+
+        if entries is None:
+            logger.colored_critical(
+                Colors.BOLD_RED,
+                "pygpm found no tracked repositories.")
+            sys.exit(1)
+
+        start = time.perf_counter()
+        checks = [check for check in check_all(
+            entries, options.jobs, options.search, self.verbosity >= 0)
+            if check.problem]
+        dry_run = self.dry_run or options.dry_run
+
+        if not checks:
+            logger.colored_info(
+                Colors.GREEN,
+                f"All {len(entries)} tracked repositories are valid "
+                f"({time.perf_counter() - start:.3f}s).")
+            return
+
+        rows = [[check.name, check.path, check.problem or "",
+                 check.action if dry_run or check.action == "keep"
+                 else f"{check.action}d"] for check in checks]
+        table = format_table(["Repository", "Path", "Problem", "Action"], rows)
+        logger.info(table[0])
+
+        for check, line in zip(checks, table[1:]):
+            color = Colors.RED if check.action == "remove" else Colors.YELLOW
+            logger.colored_info(color, line)
+
+        removed = sum(check.action == "remove" for check in checks)
+        updated = sum(check.action == "update" for check in checks)
+
+        if dry_run:
+            logger.info(
+                f"{len(checks)} of {len(entries)} entries need attention: "
+                f"{removed} to remove, {updated} to update.")
+
+            if self.dry_run:
+                logger.info("Run 'pygpm prune' to apply these changes.")
+
+            sys.exit(1)
+
+        for check in checks:
+            if check.action == "remove":
+                del entries[check.name]
+            elif check.action == "update":
+                entries[check.name].update(check.changes)
+
+        write_repository_cached_data(entries)
+        logger.info(
+            f"Pruned the registry in {time.perf_counter() - start:.3f}s: "
+            f"{removed} removed, {updated} updated, "
+            f"{len(entries)} remaining.")
+
+
+class DoctorCommand(PruneCommand):
+    """
+    Check every tracked repository concurrently and report entries that
+    are missing, no longer git repositories or whose remote changed.
+    Nothing is modified, exits with 1 if any problems were found.
+    """
+
+    dry_run = True
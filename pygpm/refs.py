@@ -0,0 +1,209 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Read git refs and repository metadata directly from a repository's .git
+directory, without spawning git.
+"""
+
+import configparser
+import hashlib
+import os
+
+from typing import Dict, List, Optional
+
+PACKED_REFS = "packed-refs"
+
+# Directory -> top-level path of the repository containing it (None if
+# outside any repository), filled in by find_repository_root(). Lives as long
+# as a command, long-running callers clear it with clear_root_cache().
+ROOT_CACHE: Dict[str, Optional[str]] = {}
+
+
+def get_git_dir(path: str) -> Optional[str]:
+    dot_git = os.path.join(path, ".git")
+
+    if os.path.isdir(dot_git):
+        return dot_git
+
+    # Worktrees and submodules use a '.git' file pointing at the real one.
+    try:
+        with open(dot_git, "r", encoding="utf-8") as file:
+            content = file.readline().strip()
+    except OSError:
+        return None
+
+    if not content.startswith("gitdir:"):
+        return None
+
+    git_dir = content[len("gitdir:"):].strip()
+    return os.path.normpath(os.path.join(path, git_dir))
+
+
+def clear_root_cache() -> None:
+    ROOT_CACHE.clear()
+
+
+def find_repository_root(directory: Optional[str] = None) -> Optional[str]:
+    """
+    Top-level path of the repository containing 'directory' (the current
+    directory by default), or None. Checks each ancestor for a '.git'
+    directory or 'gitdir:' file with a single stat and remembers the answer
+    for every directory visited, so repeated lookups below the same
+    ancestors are free. Honours GIT_DIR and GIT_WORK_TREE like git does.
+    """
+    directory = os.path.abspath(directory or os.getcwd())
+
+    if os.environ.get("GIT_DIR"):
+        return os.path.abspath(os.environ.get("GIT_WORK_TREE") or directory)
+
+    visited: List[str] = []
+    root: Optional[str] = None
+
+    while True:
+        if directory in ROOT_CACHE:
+            root = ROOT_CACHE[directory]
+            break
+
+        visited.append(directory)
+
+        if get_git_dir(directory) is not None:
+            root = directory
+            break
+
+        parent = os.path.dirname(directory)
+
+        if parent == directory:
+            break
+
+        directory = parent
+
+    for path in visited:
+        ROOT_CACHE[path] = root
+
+    return root
+
+
+def get_common_dir(git_dir: str) -> str:
+    """
+    Directory holding the shared refs, differs from 'git_dir' for linked
+    worktrees.
+    """
+    try:
+        with open(os.path.join(git_dir, "commondir"), "r", encoding="utf-8") as file:
+            return os.path.normpath(os.path.join(git_dir, file.read().strip()))
+    except OSError:
+        return git_dir
+
+
+def read_packed_refs(common_dir: str) -> Dict[str, str]:
+    refs: Dict[str, str] = {}
+
+    try:
+        with open(os.path.join(common_dir, PACKED_REFS), "r", encoding="utf-8") as file:
+            for line in file:
+                if line.startswith(("#", "^")):
+                    continue
+
+                oid, _, ref = line.strip().partition(" ")
+
+                if ref:
+                    refs[ref] = oid
+    except OSError:
+        pass
+
+    return refs
+
+
+def read_ref(git_dir: str, ref: str, depth: int = 5) -> Optional[str]:
+    """
+    Object id 'ref' (e.g. 'HEAD' or 'refs/heads/main') points at, following
+    symbolic refs. None if the ref does not exist.
+    """
+    if depth == 0:
+        return None
+
+    # Per-worktree refs live in the worktree's git dir, everything else in
+    # the common dir.
+    base = git_dir if ref == "HEAD" else get_common_dir(git_dir)
+
+    try:
+        with open(os.path.join(base, ref), "r", encoding="utf-8") as file:
+            content = file.read().strip()
+    except OSError:
+        return read_packed_refs(get_common_dir(git_dir)).get(ref)
+
+    if content.startswith("ref:"):
+        return read_ref(git_dir, content[len("ref:"):].strip(), depth - 1)
+
+    return content or None
+
+
+def read_symbolic_ref(git_dir: str, ref: str = "HEAD") -> Optional[str]:
+    """
+    Target of a symbolic ref, e.g. 'refs/heads/main' for HEAD. None when
+    detached or missing.
+    """
+    base = git_dir if ref == "HEAD" else get_common_dir(git_dir)
+
+    try:
+        with open(os.path.join(base, ref), "r", encoding="utf-8") as file:
+            content = file.read().strip()
+    except OSError:
+        return None
+
+    return content[len("ref:"):].strip() if content.startswith("ref:") else None
+
+
+def list_refs(git_dir: str, prefix: str = "refs/heads/") -> Dict[str, str]:
+    """
+    All refs under 'prefix', loose refs overriding packed ones.
+    """
+    common_dir = get_common_dir(git_dir)
+    refs = {ref: oid for ref, oid in read_packed_refs(common_dir).items()
+            if ref.startswith(prefix)}
+    root = os.path.join(common_dir, prefix)
+
+    for directory, _, files in os.walk(root):
+        for name in files:
+            ref_path = os.path.join(directory, name)
+            ref = os.path.relpath(ref_path, common_dir).replace(os.sep, "/")
+
+            try:
+                with open(ref_path, "r", encoding="utf-8") as file:
+                    refs[ref] = file.read().strip()
+            except OSError:
+                pass
+
+    return refs
+
+
+def get_remote_url(git_dir: str, remote: str = "origin") -> Optional[str]:
+    config = configparser.ConfigParser(strict=False, interpolation=None)
+
+    try:
+        config.read(os.path.join(get_common_dir(git_dir), "config"),
+                    encoding="utf-8")
+        return config.get(f'remote "{remote}"', "url")
+    except (configparser.Error, UnicodeDecodeError):
+        return None
+
+
+def repository_fingerprint(path: str) -> Optional[str]:
+    """
+    Content based fingerprint of a repository's HEAD, used to key
+    per-repository caches. None if 'path' is not a git repository.
+
+    Only the checked out branch and commit go in, so every clone of the same
+    commit on the same branch gets the same fingerprint on any machine. The
+    index is left out on purpose: it records stat data of the checkout
+    (inode, device, timestamps) and so differs between clones.
+    """
+    git_dir = get_git_dir(path)
+
+    if git_dir is None:
+        return None
+
+    parts = [read_symbolic_ref(git_dir) or "", read_ref(git_dir, "HEAD") or ""]
+
+    return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
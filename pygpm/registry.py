@@ -0,0 +1,231 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Indexed view over the tracked repository registry.
+"""
+
+import bisect
+import fnmatch
+import os
+
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from pygpm.refs import get_git_dir
+from pygpm.util import get_repository_cached_data
+
+SORT_KEYS = ["name", "path", "author", "last-used"]
+GLOB_CHARS = "*?["
+
+
+def get_remote_host(url: Optional[str]) -> str:
+    """
+    Host part of a git remote URL. Local paths and file:// remotes report
+    'local'.
+    """
+    if not url:
+        return ""
+
+    if "://" in url:
+        parsed = urlparse(url)
+        return parsed.hostname or "local"
+
+    # scp-like syntax: [user@]host:path
+    if ":" in url and not url.startswith("/"):
+        host = url.split(":", 1)[0]
+        return host.split("@")[-1]
+
+    return "local"
+
+
+def get_remote_repository(url: Optional[str]) -> Optional[Tuple[str, str]]:
+    """
+    (owner, repository) of a remote URL such as 'git@github.com:owner/repo.git'
+    or 'https://github.com/owner/repo'. None for local remotes.
+    """
+    if not url or get_remote_host(url) in ("", "local"):
+        return None
+
+    path = urlparse(url).path if "://" in url else url.split(":", 1)[1]
+    parts = [part for part in path.split("/") if part]
+
+    if len(parts) < 2:
+        return None
+
+    repository = parts[-1]
+
+    if repository.endswith(".git"):
+        repository = repository[:-len(".git")]
+
+    return parts[-2], repository
+
+
+def get_last_used(path: str) -> float:
+    """
+    Best effort time the repository was last worked in, taken from the
+    modification time of its HEAD and index.
+    """
+    last_used = 0.0
+
+    for name in ("HEAD", "index"):
+        try:
+            last_used = max(last_used, os.stat(
+                os.path.join(path, ".git", name)).st_mtime)
+        except OSError:
+            pass
+
+    return last_used
+
+
+def is_valid_entry(info: Dict[str, Any]) -> bool:
+    """
+    Cheap check that an entry still points at a git repository, without
+    spawning git.
+    """
+    return get_git_dir(info["path"]) is not None
+
+
+class Registry:
+    """
+    The registry indexed by author, remote host, path and name so filters
+    only touch the matching entries.
+    """
+
+    def __init__(self, data: Dict[str, Dict[str, Any]]) -> None:
+        self.entries = data
+        self.by_author: Dict[str, List[str]] = {}
+        self.by_host: Dict[str, List[str]] = {}
+        self.paths: List[str] = []
+        self.path_names: List[str] = []
+        self.names = sorted(data)
+
+        for name, info in data.items():
+            self.by_author.setdefault(
+                str(info.get("author", "")).lower(), []).append(name)
+            self.by_host.setdefault(
+                get_remote_host(info.get("url")).lower(), []).append(name)
+
+        for path, name in sorted(
+                (os.path.normpath(info["path"]), name)
+                for name, info in data.items()):
+            self.paths.append(path)
+            self.path_names.append(name)
+
+    @classmethod
+    def load(cls) -> Optional["Registry"]:
+        data = get_repository_cached_data()
+        return cls(data) if data is not None else None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def match_path_prefix(self, prefix: str) -> Set[str]:
+        prefix = os.path.normpath(os.path.abspath(prefix))
+        directory_prefix = prefix.rstrip(os.sep) + os.sep
+        matches = set()
+        i = bisect.bisect_left(self.paths, prefix)
+
+        while i < len(self.paths) and self.paths[i].startswith(prefix):
+            path = self.paths[i]
+
+            if path == prefix or path.startswith(directory_prefix):
+                matches.add(self.path_names[i])
+
+            i += 1
+
+        return matches
+
+    def find_name(self, path: str) -> Optional[str]:
+        """
+        Name the repository at 'path' is tracked under, if any.
+        """
+        path = os.path.normpath(os.path.abspath(path))
+        i = bisect.bisect_left(self.paths, path)
+
+        if i < len(self.paths) and self.paths[i] == path:
+            return self.path_names[i]
+
+        return None
+
+    def match_name(self, pattern: str) -> Set[str]:
+        # Only the literal prefix of the glob can use the sorted index, the
+        # rest of the pattern is checked against that range.
+        literal = pattern
+
+        for i, char in enumerate(pattern):
+            if char in GLOB_CHARS:
+                literal = pattern[:i]
+                break
+
+        matches = set()
+        i = bisect.bisect_left(self.names, literal)
+
+        while i < len(self.names) and self.names[i].startswith(literal):
+            if fnmatch.fnmatchcase(self.names[i], pattern):
+                matches.add(self.names[i])
+
+            i += 1
+
+        return matches
+
+    def select(
+            self,
+            author: Optional[str] = None,
+            path_prefix: Optional[str] = None,
+            name: Optional[str] = None,
+            remote_host: Optional[str] = None) -> Set[str]:
+        candidates: List[Set[str]] = []
+
+        if author is not None:
+            candidates.append(set(self.by_author.get(author.lower(), [])))
+
+        if remote_host is not None:
+            candidates.append(set(self.by_host.get(remote_host.lower(), [])))
+
+        if path_prefix is not None:
+            candidates.append(self.match_path_prefix(path_prefix))
+
+        if name is not None:
+            candidates.append(self.match_name(name))
+
+        if not candidates:
+            return set(self.entries)
+
+        candidates.sort(key=len)
+        return candidates[0].intersection(*candidates[1:])
+
+    def sort(self, names: Iterable[str], key: str = "name") -> List[str]:
+        if key == "path":
+            return sorted(names, key=lambda name: self.entries[name]["path"])
+
+        if key == "author":
+            return sorted(names, key=lambda name: (
+                str(self.entries[name].get("author", "")).lower(), name))
+
+        if key == "last-used":
+            return sorted(names, key=lambda name: (
+                -get_last_used(self.entries[name]["path"]), name))
+
+        return sorted(names)
+
+    def subset(self, names: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        return {name: self.entries[name] for name in names}
+
+    def query(self, options: Any) -> Dict[str, Dict[str, Any]]:
+        """
+        Entries matching the shared filter options, in '--sort' order if one
+        was given and registry order otherwise.
+        """
+        names = self.select(
+            author=options.author,
+            path_prefix=options.path_prefix,
+            name=options.name,
+            remote_host=options.remote_host,
+        )
+
+        if options.sort:
+            return self.subset(self.sort(names, options.sort))
+
+        return {name: info for name, info in self.entries.items()
+                if name in names}
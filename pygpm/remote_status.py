@@ -0,0 +1,138 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Compare local branch tips with their GitHub branch heads without fetching.
+
+Local tips are read straight from the refs in .git and remote heads come
+from the GitHub API through conditional requests, so checking an unchanged
+fleet costs one 304 response per repository and no object transfer.
+"""
+
+import subprocess
+
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+from pygpm.breaker import BREAKER, Quarantined
+from pygpm.git_batch import POOL
+from pygpm.parallel import imap_unordered
+from pygpm.refs import get_git_dir, read_ref, read_symbolic_ref
+from pygpm.registry import get_remote_host, get_remote_repository
+from pygpm.util import run_command
+
+GITHUB_HOST = "github.com"
+REMOTE_STATES = ["up to date", "ahead", "behind", "stale", "diverged",
+                 "skipped", "failed"]
+REMOTE_FIELDS = ["name", "path", "branch", "local", "remote", "state", "detail"]
+
+# (owner, repository, branch) -> commit id of the branch on GitHub
+BranchHeadLookup = Callable[[str, str, str], Optional[str]]
+
+
+@dataclass
+class RemoteStatus:
+    name: str
+    path: str
+    branch: Optional[str] = None
+    local: Optional[str] = None
+    remote: Optional[str] = None
+    state: str = "up to date"
+    detail: str = ""
+
+
+def is_ancestor(path: str, ancestor: str, descendant: str) -> bool:
+    try:
+        run_command(["git", "merge-base", "--is-ancestor", ancestor, descendant],
+                    path)
+    except subprocess.CalledProcessError as error:
+        if error.returncode == 1:
+            return False
+
+        raise
+
+    return True
+
+
+def compare_tips(path: str, local: Optional[str], remote: str) -> str:
+    if local == remote:
+        return "up to date"
+
+    # The remote head is not in the object store, so a fetch would bring in
+    # commits nobody here has seen yet.
+    if local is None or POOL.check(path, remote) is None:
+        return "stale"
+
+    if is_ancestor(path, remote, local):
+        return "ahead"
+
+    if is_ancestor(path, local, remote):
+        return "behind"
+
+    return "diverged"
+
+
+def check_remote(
+        entry: Tuple[str, dict[str, Any]],
+        get_branch_head: BranchHeadLookup) -> RemoteStatus:
+    name, info = entry
+    result = RemoteStatus(name, info["path"])
+    git_dir = get_git_dir(info["path"])
+    url = info.get("url")
+    remote = get_remote_repository(url) if get_remote_host(url) == GITHUB_HOST else None
+
+    if git_dir is None:
+        result.state, result.detail = "skipped", "not a git repository"
+        return result
+
+    if remote is None:
+        result.state, result.detail = "skipped", "not hosted on GitHub"
+        return result
+
+    ref = read_symbolic_ref(git_dir)
+
+    if ref is None or not ref.startswith("refs/heads/"):
+        result.state, result.detail = "skipped", "detached HEAD"
+        return result
+
+    result.branch = ref[len("refs/heads/"):]
+    result.local = read_ref(git_dir, ref)
+
+    try:
+        result.remote = get_branch_head(*remote, result.branch)
+
+        if result.remote is None:
+            result.state = "skipped"
+            result.detail = f"no branch '{result.branch}' on GitHub"
+        else:
+            with BREAKER.guard(info["path"]):
+                result.state = compare_tips(
+                    info["path"], result.local, result.remote)
+    except Quarantined as error:
+        result.state, result.detail = "skipped", str(error)
+    except subprocess.TimeoutExpired as error:
+        result.state = "failed"
+        result.detail = f"timed out after {error.timeout:g}s"
+    except subprocess.CalledProcessError as error:
+        result.state, result.detail = "failed", (error.stderr or str(error)).strip()
+    except OSError as error:
+        # Includes the requests exceptions.
+        result.state, result.detail = "failed", str(error)
+
+    return result
+
+
+def iter_remote_status(
+        repositories: dict[str, dict[str, Any]],
+        get_branch_head: BranchHeadLookup,
+        workers: int = 0) -> Iterator[RemoteStatus]:
+    check = partial(check_remote, get_branch_head=get_branch_head)
+
+    for task in imap_unordered(check, repositories.items(), workers):
+        if task.error is not None:
+            yield RemoteStatus(task.item[0], task.item[1]["path"],
+                               state="failed", detail=str(task.error))
+        else:
+            assert task.value is not None
+            yield task.value
@@ -0,0 +1,164 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+History-aware ordering of fleet-wide work.
+
+How long every repository took for an operation is kept in the 'durations'
+cache as a moving average. The next run starts the repositories expected to
+take longest first, so a slow monorepo never starts last and holds up the
+whole run while the rest of the pool sits idle. Repositories without a
+history are expected to take the median of the ones with one. Only runs
+that succeed are recorded: a failed or quarantined run returns early and
+would make a troublesome repository look fast.
+"""
+
+import heapq
+import os
+import statistics
+import time
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from pygpm.cache import get_cache
+from pygpm.parallel import default_workers
+from pygpm.refs import get_git_dir
+
+R = TypeVar("R")
+Entry = Tuple[str, Dict[str, Any]]
+
+DURATIONS_NAMESPACE = "durations"
+# Weight of the latest run in the moving average.
+SMOOTHING = 0.3
+# Repositories whose HEAD or index changed this recently count as active.
+RECENT_WINDOW = 86400
+
+
+def get_duration_key(operation: str, path: str) -> str:
+    return f"{operation}:{path}"
+
+
+def is_recently_active(path: str, now: Optional[float] = None) -> bool:
+    git_dir = get_git_dir(path)
+
+    if git_dir is None:
+        return False
+
+    now = now if now is not None else time.time()
+
+    for name in ("index", os.path.join("logs", "HEAD")):
+        try:
+            if now - os.stat(os.path.join(git_dir, name)).st_mtime < RECENT_WINDOW:
+                return True
+        except OSError:
+            continue
+
+    return False
+
+
+def simulate_makespan(durations: Iterable[float], workers: int) -> float:
+    """
+    Wall time of running 'durations' in the given order on a pool of
+    'workers', each job going to the first worker to become free.
+    """
+    finish = [0.0] * max(1, workers)
+
+    for duration in durations:
+        heapq.heapreplace(finish, finish[0] + duration)
+
+    return max(finish)
+
+
+class Schedule:
+    """
+    Order in which to run 'operation' over 'repositories', longest expected
+    first. With 'recent_first', recently active repositories go ahead of
+    the rest so their results arrive first.
+    """
+
+    def __init__(
+            self,
+            operation: str,
+            repositories: Dict[str, Dict[str, Any]],
+            workers: int = 0,
+            recent_first: bool = False) -> None:
+        self.operation = operation
+        self.workers = workers if workers > 0 else default_workers()
+        self.cache = get_cache(DURATIONS_NAMESPACE)
+        self.registry_order: List[Entry] = list(repositories.items())
+        self.expected: Dict[str, float] = {}
+        self.unknown = 0
+
+        known = {}
+
+        for _, info in self.registry_order:
+            history = self.cache.peek(get_duration_key(operation, info["path"]))
+
+            if history is not None:
+                known[info["path"]] = history["mean"]
+
+        fallback = statistics.median(known.values()) if known else 0.0
+
+        for _, info in self.registry_order:
+            if info["path"] not in known:
+                self.unknown += 1
+
+            self.expected[info["path"]] = known.get(info["path"], fallback)
+
+        now = time.time()
+        active = ({info["path"] for _, info in self.registry_order
+                   if is_recently_active(info["path"], now)}
+                  if recent_first else set())
+
+        self.entries: List[Entry] = sorted(
+            self.registry_order,
+            key=lambda entry: (entry[1]["path"] not in active,
+                               -self.expected[entry[1]["path"]]))
+
+    def record(self, path: str, seconds: float) -> None:
+        key = get_duration_key(self.operation, path)
+        history = self.cache.peek(key)
+        mean = seconds if history is None else (
+            SMOOTHING * seconds + (1 - SMOOTHING) * history["mean"])
+        runs = 1 if history is None else history["runs"] + 1
+        self.cache.set(key, {"mean": mean, "last": seconds, "runs": runs})
+
+    def timed(
+            self,
+            func: Callable[[Entry], R],
+            succeeded: Optional[Callable[[R], bool]] = None) -> Callable[[Entry], R]:
+        """
+        Wrap 'func' to record how long each repository took. Runs that raise,
+        or whose value 'succeeded' rejects, are not recorded.
+        """
+        def run(entry: Entry) -> R:
+            start = time.perf_counter()
+            value = func(entry)
+
+            if succeeded is None or succeeded(value):
+                self.record(entry[1]["path"], time.perf_counter() - start)
+
+            return value
+
+        return run
+
+    def predicted_makespan(self, entries: Optional[List[Entry]] = None) -> float:
+        entries = self.entries if entries is None else entries
+        return simulate_makespan(
+            (self.expected[info["path"]] for _, info in entries), self.workers)
+
+    def report(self, actual: float) -> List[str]:
+        lines = [
+            f"Schedule for {len(self.entries)} repositories on "
+            f"{self.workers} workers:",
+            f"\tPredicted makespan: {self.predicted_makespan():.3f}s "
+            f"(registry order: {self.predicted_makespan(self.registry_order):.3f}s)",
+            f"\tActual makespan:    {actual:.3f}s",
+        ]
+
+        if self.unknown:
+            lines.append(
+                f"\t{self.unknown} repositories had no {self.operation} history "
+                "and were predicted from the median.")
+
+        return lines
@@ -0,0 +1,373 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Export and import the registry and caches as a portable snapshot.
+
+A snapshot is gzip compressed JSON lines. The first line is a header, every
+following line is either a registry entry or a cache entry:
+
+  {"format": "pygpm-snapshot", "version": 1, "created": ..., "pygpm": ...}
+  {"type": "repository", "name": "...", "info": {...}}
+  {"type": "cache", "namespace": "stats", "key": "...", "entry": {...}}
+
+Per-repository cache entries carry the fingerprint of the HEAD they were
+computed for, so on import they are only used for repositories checked out
+at the same commit locally and everything else is recomputed on the next
+run. Entries without a fingerprint, such as quarantines or when a
+repository was last maintained, describe this machine rather than the
+repository and are never exported. Cached GitHub responses of the exported
+repositories are included as well, they are revalidated against GitHub
+whenever they are used.
+"""
+
+import gzip
+import json
+import os
+import sys
+import time
+
+from dataclasses import dataclass
+from optparse import Values
+from typing import IO, Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from pygpm.cache import get_cache, list_namespaces
+from pygpm.command import Command
+from pygpm.config import CONFIG
+from pygpm.core import __version__
+from pygpm.logging import Colors, get_logger
+from pygpm.parallel import imap_unordered
+from pygpm.parser import FILTER_GROUP
+from pygpm.refs import repository_fingerprint
+from pygpm.registry import Registry, get_remote_repository, is_valid_entry
+from pygpm.util import get_repository_cached_data, write_repository_cached_data
+
+logger = get_logger(__name__)
+
+SNAPSHOT_FORMAT = "pygpm-snapshot"
+SNAPSHOT_VERSION = 1
+
+# Caches keyed by GitHub API URL rather than by path. Their entries are sent
+# back with If-None-Match on every use, so they hold on any machine.
+REMOTE_NAMESPACES = ["github"]
+
+
+class SnapshotError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class PathRewrite:
+    old: str
+    new: str
+
+    @classmethod
+    def parse(cls, value: str) -> "PathRewrite":
+        old, separator, new = value.partition("=")
+
+        if not separator or not old or not new:
+            raise SnapshotError(f"Expected OLD=NEW, not '{value}'.")
+
+        return cls(os.path.normpath(old), os.path.normpath(new))
+
+    def apply(self, path: str) -> str:
+        if path == self.old or path.startswith(self.old.rstrip(os.sep) + os.sep):
+            return self.new + path[len(self.old):]
+
+        return path
+
+
+def rewrite_path(path: str, rewrites: List[PathRewrite]) -> str:
+    # The first matching prefix wins.
+    for rewrite in rewrites:
+        rewritten = rewrite.apply(path)
+
+        if rewritten != path:
+            return rewritten
+
+    return path
+
+
+def open_snapshot(path: str, mode: str) -> IO[bytes]:
+    if path == "-":
+        stream = sys.stdin.buffer if mode == "rb" else sys.stdout.buffer
+        return gzip.GzipFile(fileobj=stream, mode=mode)
+
+    return gzip.open(path, mode)
+
+
+def is_portable(entry: Dict[str, Any]) -> bool:
+    # Only a fingerprint lets the importing side tell whether the entry
+    # still holds for its copy of the repository.
+    return entry.get("fingerprint") is not None
+
+
+def get_remote_names(repositories: Dict[str, Dict[str, Any]]) -> Set[str]:
+    names = set()
+
+    for info in repositories.values():
+        remote = get_remote_repository(info.get("url"))
+
+        if remote is not None:
+            names.add("/".join(remote).lower())
+
+    return names
+
+
+def get_api_repository(url: str) -> Optional[str]:
+    # 'https://api.github.com/repos/<owner>/<repo>/...' -> '<owner>/<repo>'
+    _, separator, rest = url.partition("/repos/")
+    return "/".join(rest.split("/")[:2]).lower() if separator else None
+
+
+def write_snapshot(
+        path: str,
+        repositories: Dict[str, Dict[str, Any]],
+        namespaces: List[str]) -> Tuple[int, int]:
+    """
+    Write 'repositories' and the entries of the cache 'namespaces' that
+    belong to them: fingerprinted entries keyed by their path and GitHub
+    responses for their remote. Returns the number of repository and cache
+    lines.
+    """
+    paths = {info["path"] for info in repositories.values()}
+    remotes = get_remote_names(repositories)
+    cache_lines = 0
+
+    with open_snapshot(path, "wb") as file:
+        def write(record: Dict[str, Any]) -> None:
+            file.write(json.dumps(record, separators=(",", ":")).encode("utf-8"))
+            file.write(b"\n")
+
+        write({"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION,
+               "created": time.time(), "pygpm": __version__})
+
+        for name, info in repositories.items():
+            write({"type": "repository", "name": name, "info": info})
+
+        for namespace in namespaces:
+            for key, entry in get_cache(namespace).export().items():
+                if namespace in REMOTE_NAMESPACES:
+                    exported = get_api_repository(key) in remotes
+                else:
+                    # Per-repository caches are keyed by path.
+                    exported = key in paths and is_portable(entry)
+
+                if exported:
+                    write({"type": "cache", "namespace": namespace,
+                           "key": key, "entry": entry})
+                    cache_lines += 1
+
+    return len(repositories), cache_lines
+
+
+def read_snapshot(path: str) -> Iterator[Dict[str, Any]]:
+    with open_snapshot(path, "rb") as file:
+        header: Optional[Dict[str, Any]] = None
+
+        try:
+            for line in file:
+                record = json.loads(line)
+
+                if header is None:
+                    header = record
+
+                    if record.get("format") != SNAPSHOT_FORMAT:
+                        raise SnapshotError(f"{path} is not a pygpm snapshot.")
+
+                    if record.get("version", 0) > SNAPSHOT_VERSION:
+                        raise SnapshotError(
+                            f"{path} is a version {record['version']} snapshot, "
+                            f"this pygpm reads up to version {SNAPSHOT_VERSION}.")
+
+                    continue
+
+                yield record
+        except (OSError, EOFError, json.JSONDecodeError) as error:
+            raise SnapshotError(f"Could not read {path}: {error}") from None
+
+
+def verify_entry(entry: Tuple[str, Dict[str, Any]]) -> Optional[str]:
+    """
+    Local fingerprint of an imported repository, None if it is not
+    present on this machine.
+    """
+    _, info = entry
+    return repository_fingerprint(info["path"]) if is_valid_entry(info) else None
+
+
+class ExportCommand(Command):
+    """
+    Write the tracked repositories and their cached data to a compressed
+    snapshot that other machines can warm-start from with 'pygpm import'.
+    """
+
+    usage = """
+      %prog [options] <snapshot file | ->"""
+
+    def add_options(self) -> None:
+        self.cmd_options.add_option(
+            "--no-cache",
+            action="store_true",
+            dest="no_cache",
+            default=False,
+            help="Only export the registry, not the cached data."
+        )
+
+        for option in FILTER_GROUP:
+            self.cmd_options.add_option(option())
+
+    def run(self, options: Values, args: list[str]) -> None:
+        if len(args) != 1:
+            self.parser.print_help()
+            sys.exit(1)
+
+        registry = Registry.load()
+
+        if registry is None:
+            logger.colored_critical(
+                Colors.BOLD_RED,
+                "pygpm found no tracked repositories.")
+            sys.exit(1)
+
+        namespaces = [] if options.no_cache else list_namespaces()
+        repositories, cache_lines = write_snapshot(
+            args[0], registry.query(options), namespaces)
+
+        summary = (f"Exported {repositories} repositories and {cache_lines} "
+                   f"cache entries to {'stdout' if args[0] == '-' else args[0]}.")
+
+        if args[0] == "-":
+            # Kept off stdout, which carries the snapshot itself.
+            sys.stderr.write(summary + "\n")
+        else:
+            logger.info(summary)
+
+
+class ImportCommand(Command):
+    """
+    Load a snapshot written by 'pygpm export'. Repositories are added to the
+    registry and cached data is merged, keeping whichever side is newer.
+    Only repositories present on this machine are imported, and cached data
+    is only used where the repository is unchanged from the snapshot.
+    """
+
+    usage = """
+      %prog [options] <snapshot file | ->"""
+
+    def add_options(self) -> None:
+        self.cmd_options.add_option(
+            "-r",
+            "--rewrite",
+            action="append",
+            dest="rewrite",
+            default=[],
+            metavar="old=new",
+            help="Replace the path prefix 'old' with 'new'. Can be given "
+                 "multiple times, the first matching prefix wins."
+        )
+
+        self.cmd_options.add_option(
+            "--replace",
+            action="store_true",
+            dest="replace",
+            default=False,
+            help="Replace the registry instead of merging into it."
+        )
+
+        self.cmd_options.add_option(
+            "-j",
+            "--jobs",
+            type="int",
+            dest="jobs",
+            default=CONFIG.status.workers,
+            metavar="n",
+            help="Number of repositories to verify in parallel."
+        )
+
+    def run(self, options: Values, args: list[str]) -> None:
+        if len(args) != 1:
+            self.parser.print_help()
+            sys.exit(1)
+
+        try:
+            rewrites = [PathRewrite.parse(value) for value in options.rewrite]
+            repositories: Dict[str, Dict[str, Any]] = {}
+            caches: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+            for record in read_snapshot(args[0]):
+                if record.get("type") == "repository":
+                    info = dict(record["info"])
+                    info["path"] = rewrite_path(info["path"], rewrites)
+                    repositories[record["name"]] = info
+                elif record.get("type") == "cache":
+                    key = record["key"]
+
+                    if record["namespace"] not in REMOTE_NAMESPACES:
+                        key = rewrite_path(key, rewrites)
+
+                    caches.setdefault(record["namespace"], {})[key] = record["entry"]
+        except (OSError, SnapshotError) as error:
+            logger.colored_critical(Colors.BOLD_RED, str(error))
+            sys.exit(1)
+
+        # Check every repository once, locally and in parallel. Missing
+        # checkouts are left out, the rest only need recomputing where the
+        # fingerprint differs from the snapshot.
+        fingerprints: Dict[str, str] = {}
+        missing: List[str] = []
+
+        for task in imap_unordered(verify_entry, repositories.items(), options.jobs):
+            name = task.item[0]
+
+            if task.value is None:
+                missing.append(name)
+            else:
+                fingerprints[task.item[1]["path"]] = task.value
+
+        for name in missing:
+            del repositories[name]
+
+        registry = {} if options.replace else (get_repository_cached_data() or {})
+        registry.update(repositories)
+        write_repository_cached_data(registry)
+
+        current = stale = remote = 0
+
+        for namespace, entries in caches.items():
+            if namespace in REMOTE_NAMESPACES:
+                cache = get_cache(namespace)
+                remote += cache.merge(entries)
+                cache.save()
+                continue
+
+            # Snapshots from before export skipped them may still hold
+            # machine-local entries, e.g. last maintenance runs.
+            entries = {key: entry for key, entry in entries.items()
+                       if key in fingerprints and is_portable(entry)}
+
+            if not entries:
+                continue
+
+            cache = get_cache(namespace)
+            cache.merge(entries)
+            cache.save()
+
+            for key, entry in entries.items():
+                # Cached fingerprints may carry a suffix, e.g. the stats
+                # default branch tip.
+                if str(entry.get("fingerprint")).startswith(fingerprints[key]):
+                    current += 1
+                else:
+                    stale += 1
+
+        logger.info(
+            f"Imported {len(repositories)} repositories and {remote} GitHub "
+            f"responses, {current} cache entries are current and {stale} "
+            f"will be recomputed.")
+
+        if missing:
+            logger.colored_warning(
+                Colors.YELLOW,
+                f"Skipped {len(missing)} repositories not present on this "
+                f"machine: {', '.join(sorted(missing))}")
@@ -0,0 +1,345 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Activity and size overview of all repositories tracked by pygpm.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from functools import partial
+from optparse import Values
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pygpm.breaker import BREAKER, Quarantined
+from pygpm.cache import get_cache
+from pygpm.command import Command
+from pygpm.config import CONFIG
+from pygpm.git_batch import POOL
+from pygpm.logging import Colors, ProgressLine, get_logger
+from pygpm.output import create_writer, format_size, format_table
+from pygpm.parallel import imap_unordered
+from pygpm.parser import FILTER_GROUP, FORMAT, SCHEDULE_GROUP
+from pygpm.refs import (get_git_dir, list_refs, read_ref, read_symbolic_ref,
+                        repository_fingerprint)
+from pygpm.registry import Registry, get_remote_host, get_remote_repository
+from pygpm.schedule import Schedule
+from pygpm.util import run_command
+
+logger = get_logger(__name__)
+
+STATS_FIELDS = [
+    "name",
+    "path",
+    "last_commit",
+    "commits",
+    "branches",
+    "git_size",
+    "worktree_size",
+    "remote_size",
+    "error",
+]
+
+
+@dataclass
+class RepositoryStats:
+    name: str
+    path: str
+    last_commit: Optional[int] = None
+    commits: Optional[int] = None
+    branches: Optional[int] = None
+    git_size: Optional[int] = None
+    worktree_size: Optional[int] = None
+    remote_size: Optional[int] = None
+    error: Optional[str] = None
+
+
+def directory_size(path: str, exclude: Tuple[str, ...] = ()) -> int:
+    """
+    Total size in bytes of the regular files below 'path'. Walks with an
+    explicit stack of os.scandir calls and never follows symlinks. Top level
+    entries named in 'exclude' are skipped.
+    """
+    total = 0
+    stack = [path]
+
+    while stack:
+        directory = stack.pop()
+
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if directory == path and entry.name in exclude:
+                        continue
+
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+
+    return total
+
+
+def get_default_branch(git_dir: str) -> str:
+    """
+    The remote's default branch as recorded by clone in origin/HEAD, falling
+    back to the local HEAD.
+    """
+    return read_symbolic_ref(git_dir, "refs/remotes/origin/HEAD") or "HEAD"
+
+
+def compute_stats(path: str, branch: str) -> Dict[str, Any]:
+    # Both from the default branch, whatever is checked out.
+    commit = POOL.read_commit(path, branch)
+    commits = 0
+
+    if commit is not None:
+        commits = int(run_command(
+            ["git", "rev-list", "--count", branch], path).stdout.strip() or 0)
+
+    return {
+        "last_commit": commit.commit_time if commit is not None else None,
+        "commits": commits,
+    }
+
+
+def collect_stats(
+        entry: Tuple[str, dict[str, Any]],
+        refresh: bool = False) -> RepositoryStats:
+    """
+    Stats of a single repository. The commit history is cached keyed by
+    the repository fingerprint and the default branch tip. Branch count and
+    the sizes on disk change without either moving (new files, gc, repacks),
+    so they are always read fresh.
+    """
+    name, info = entry
+    path = info["path"]
+    stats = RepositoryStats(name, path)
+    git_dir = get_git_dir(path)
+
+    if git_dir is None:
+        stats.error = "not a git repository"
+        return stats
+
+    cache = get_cache("stats")
+    branch = get_default_branch(git_dir)
+    fingerprint = f"{repository_fingerprint(path)}:{read_ref(git_dir, branch)}"
+    cached = None if refresh else cache.get(path, fingerprint)
+
+    try:
+        if cached is None:
+            with BREAKER.guard(path):
+                cached = compute_stats(path, branch)
+
+            cache.set(path, cached, fingerprint)
+
+        stats.branches = len(list_refs(git_dir, "refs/heads/"))
+    except Quarantined as error:
+        stats.error = str(error)
+        return stats
+    except subprocess.TimeoutExpired as error:
+        stats.error = f"timed out after {error.timeout:g}s"
+        return stats
+    except subprocess.CalledProcessError as error:
+        stats.error = (error.stderr or "").strip() or str(error)
+        return stats
+    except OSError as error:
+        stats.error = str(error)
+        return stats
+
+    for key, value in cached.items():
+        setattr(stats, key, value)
+
+    stats.git_size = directory_size(git_dir)
+    stats.worktree_size = directory_size(path, exclude=(".git",))
+    return stats
+
+
+def get_remote_size_lookup() -> Optional[Callable[[str, str], int]]:
+    """
+    Returns a function giving the size in bytes of a GitHub repository, or
+    None if the GitHub integration is unavailable.
+    """
+    try:
+        from pygpm import gh
+    except Exception as error:
+        logger.colored_warning(
+            Colors.YELLOW,
+            f"GitHub integration unavailable, not showing remote sizes ({error}).")
+        return None
+
+    # The API reports sizes in KiB.
+    return lambda owner, repo: gh.get_repository(owner, repo).size * 1024
+
+
+def add_remote_sizes(
+        results: List[RepositoryStats],
+        repositories: Dict[str, dict[str, Any]],
+        workers: int = 0) -> None:
+    lookup = get_remote_size_lookup()
+
+    if lookup is None:
+        return
+
+    def remote_size(stats: RepositoryStats) -> Optional[int]:
+        url = repositories[stats.name].get("url")
+
+        if get_remote_host(url) != "github.com":
+            return None
+
+        remote = get_remote_repository(url)
+        return lookup(*remote) if remote is not None else None
+
+    for task in imap_unordered(remote_size, results, workers):
+        if task.error is not None:
+            logger.debug(f"{task.item.name}: {task.error}")
+            continue
+
+        task.item.remote_size = task.value
+
+
+def format_date(timestamp: Optional[int]) -> str:
+    if timestamp is None:
+        return "-"
+
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
+
+
+class StatsCommand(Command):
+    """
+    Show the last commit date, default branch commit count, local branch
+    count and on-disk sizes of every repository tracked by pygpm.
+    Commit history is cached until HEAD or the default branch moves.
+    """
+
+    usage = """
+      %prog [options]"""
+
+    def add_options(self) -> None:
+        self.cmd_options.add_option(
+            "-j",
+            "--jobs",
+            type="int",
+            dest="jobs",
+            default=CONFIG.stats.workers,
+            metavar="n",
+            help="Number of repositories to inspect in parallel."
+        )
+
+        self.cmd_options.add_option(
+            "-r",
+            "--remote",
+            action="store_true",
+            dest="remote",
+            default=False,
+            help="Also show the size GitHub reports for each repository."
+        )
+
+        self.cmd_options.add_option(
+            "--refresh",
+            action="store_true",
+            dest="refresh",
+            default=False,
+            help="Ignore cached stats and recompute everything."
+        )
+
+        self.cmd_options.add_option(FORMAT())
+
+        for option in FILTER_GROUP + SCHEDULE_GROUP:
+            self.cmd_options.add_option(option())
+
+    def run(self, options: Values, args: list[str]) -> None:
+        registry = Registry.load()
+
+        if registry is None:
+            logger.colored_critical(
+                Colors.BOLD_RED,
+                "pygpm found no tracked repositories.")
+            sys.exit(1)
+
+        repositories = registry.query(options)
+        start = time.perf_counter()
+        progress = ProgressLine(self.verbosity >= 0 and not options.format)
+        schedule = Schedule("stats", repositories, options.jobs,
+                            options.recent_first)
+        collect = schedule.timed(partial(collect_stats, refresh=options.refresh),
+                                 lambda stats: stats.error is None)
+        results: List[RepositoryStats] = []
+
+        for task in imap_unordered(collect, schedule.entries, options.jobs):
+            assert task.value is not None
+            results.append(task.value)
+            progress.update(
+                f"Inspected {len(results)}/{len(repositories)} repositories")
+
+        progress.clear()
+        get_cache("stats").save()
+        schedule_report = schedule.report(time.perf_counter() - start)
+
+        if options.remote:
+            add_remote_sizes(results, repositories, options.jobs)
+
+        order = {name: i for i, name in enumerate(
+            repositories if options.sort else sorted(repositories))}
+        results.sort(key=lambda stats: order[stats.name])
+
+        if options.format:
+            with create_writer(options.format, STATS_FIELDS) as writer:
+                for stats in results:
+                    writer.write(asdict(stats))
+
+            if options.schedule_report:
+                # Kept off stdout so the records stay machine-readable.
+                sys.stderr.write("\n".join(schedule_report) + "\n")
+
+            return
+
+        headers = ["Repository", "Last commit", "Commits", "Branches",
+                   ".git", "Worktree"]
+        align = ["<", "<", ">", ">", ">", ">"]
+
+        if options.remote:
+            headers.append("Remote")
+            align.append(">")
+
+        inspected = [stats for stats in results if stats.error is None]
+        failures = [stats for stats in results if stats.error is not None]
+        rows = []
+
+        for stats in inspected:
+            row = [stats.name, format_date(stats.last_commit),
+                   str(stats.commits), str(stats.branches),
+                   format_size(stats.git_size),
+                   format_size(stats.worktree_size)]
+
+            if options.remote:
+                row.append(format_size(stats.remote_size))
+
+            rows.append(row)
+
+        for line in format_table(headers, rows, align):
+            logger.info(line)
+
+        logger.info(
+            f"Inspected {len(results)} repositories in "
+            f"{time.perf_counter() - start:.3f}s.")
+
+        if options.schedule_report:
+            logger.info("\n".join(schedule_report))
+
+        if failures:
+            logger.colored_warning(Colors.RED, "Failed to inspect:")
+
+            for stats in failures:
+                logger.colored_warning(
+                    Colors.RED, f"\t{stats.name} ({stats.path}): {stats.error}")
@@ -8,17 +8,80 @@ by pygpm.
 
 import sys
 import os
+import subprocess
+import time
 
+from dataclasses import asdict
+from functools import partial
 from optparse import Values
-from typing import Any
+from typing import Any, Iterator, List, Optional, Tuple
 
+from pygpm.breaker import BREAKER, Quarantined
 from pygpm.config import CONFIG
 from pygpm.command import Command
-from pygpm.util import read_command, is_git_repository, get_repository_cached_data
-from pygpm.logging import Colors, get_logger
+from pygpm.git_status import GitStatus, read_git_status
+from pygpm.refs import find_repository_root, get_git_dir, get_remote_url
+from pygpm.remote_status import REMOTE_FIELDS, REMOTE_STATES, iter_remote_status
+from pygpm.logging import Colors, flush_logging, get_logger
+from pygpm.metrics import STATUS_LAST_SECONDS, STATUS_SECONDS
+from pygpm.output import create_writer, format_table
+from pygpm.parallel import imap_unordered
+from pygpm.parser import FILTER_GROUP, FORMAT, SCHEDULE_GROUP
+from pygpm.profiles import (candidate_profiles, get_profile_section,
+                            get_status_profile, time_profile)
+from pygpm.registry import Registry, is_valid_entry
+from pygpm.schedule import Schedule
 
 logger = get_logger(__name__)
 
+RECORD_CATEGORIES = ["staged", "unstaged", "untracked", "unmerged"]
+SHORT_OID = 7
+
+REMOTE_STATE_COLORS = {
+    "up to date": Colors.GREEN,
+    "ahead": Colors.GREEN,
+    "behind": Colors.YELLOW,
+    "stale": Colors.YELLOW,
+    "diverged": Colors.YELLOW,
+    "failed": Colors.RED,
+}
+STATUS_FIELDS = ["name", "path", "branch", "upstream", "ahead", "behind",
+                 "clean", *RECORD_CATEGORIES, "error"]
+
+
+class StatusTotals:
+    """
+    Fleet-wide counters updated one status record at a time.
+    """
+
+    def __init__(self) -> None:
+        self.counts = {"clean": 0, "changed": 0, "failed": 0, "quarantined": 0}
+        self.changes = {category: 0 for category in RECORD_CATEGORIES}
+        self.ahead = 0
+        self.behind = 0
+
+    def add(self, record: dict[str, Any]) -> str:
+        category = status_category(record)
+        self.counts[category] += 1
+
+        if category not in ("failed", "quarantined"):
+            for change in RECORD_CATEGORIES:
+                self.changes[change] += record[change]
+
+            self.ahead += record["ahead"] or 0
+            self.behind += record["behind"] or 0
+
+        return category
+
+    def summary(self, elapsed: float) -> str:
+        quarantined = self.counts["quarantined"]
+        return (
+            f"Checked {sum(self.counts.values())} repositories in "
+            f"{elapsed:.3f}s: {self.counts['clean']} clean, "
+            f"{self.counts['changed']} with changes, "
+            f"{self.counts['failed']} failed"
+            + (f", {quarantined} quarantined." if quarantined else "."))
+
 
 class StatusCommand(Command):
     """
@@ -47,92 +110,513 @@ class StatusCommand(Command):
             help="Show a condensed version of 'pygpm status --list-all'."
         )
 
+        self.cmd_options.add_option(
+            "--sorted",
+            action="store_true",
+            dest="sorted",
+            default=False,
+            help="Buffer '--list-all' results and output them sorted by "
+                 "name instead of as each repository completes."
+        )
+
+        self.cmd_options.add_option(
+            "-j",
+            "--jobs",
+            type="int",
+            dest="jobs",
+            default=CONFIG.status.workers,
+            metavar="n",
+            help="Number of repositories to check in parallel."
+        )
+
+        self.cmd_options.add_option(
+            "--benchmark-profiles",
+            action="store_true",
+            dest="benchmark_profiles",
+            default=False,
+            help="Time 'git status' under every status profile for the given "
+                 "repositories (default: the current one) and recommend the "
+                 "fastest that reports as much as the configured profile."
+        )
+
+        self.cmd_options.add_option(
+            "-r",
+            "--remote",
+            action="store_true",
+            dest="remote",
+            default=False,
+            help="Compare branch tips with their GitHub branch heads instead "
+                 "of checking the working tree. Nothing is fetched."
+        )
+
+        self.cmd_options.add_option(FORMAT())
+
+        for option in FILTER_GROUP + SCHEDULE_GROUP:
+            self.cmd_options.add_option(option())
+
     # TODO: Fix branching?
     def run(self, options: Values, args: list[str]) -> None:
-        if is_git_repository() and not options.list_all and not options.compact_all:
-            tokens = parse_git_status()
-            assert "on-branch" in tokens
+        if options.benchmark_profiles:
+            self.benchmark_profiles(args or [os.getcwd()])
+            return
 
-            logger.info(f"Branch: {tokens['on-branch']}")
+        root = find_repository_root()
+        single = root is not None and not options.list_all and not options.compact_all
 
-            suggested_actions = False
-            list_clean = CONFIG.get("status", "always_list_clean") == "true"
+        if single and options.remote:
+            assert root is not None
+            git_dir = get_git_dir(root)
+            self.remote_status(options, {os.path.basename(root): {
+                "path": root,
+                "url": get_remote_url(git_dir) if git_dir is not None else None,
+            }})
+            return
 
-            if tokens["untracked-files"]:
-                suggested_actions = True
-                logger.info(
-                    f"Detected {len(tokens['untracked-files'])} untracked file(s):")
-                tokens["untracked-files"].append("")
-                logger.colored_info(Colors.RED, "\n".join(
-                    [f"\t{token}" for token in tokens["untracked-files"]]))
-            elif list_clean:
-                logger.info("No untracked files detected.")
-
-            if tokens["untracked-changes"]:
-                suggested_actions = True
-                logger.info(
-                    f"Detected {len(tokens['untracked-changes'])} file(s) "
-                    "with changes not staged for commit:")
-                tokens["untracked-changes"].append("")
-                logger.colored_info(Colors.YELLOW, "\n".join(
-                    [f"\t{token}" for token in tokens["untracked-changes"]]))
-            elif list_clean:
-                logger.info("No untracked changes detected.")
-
-            if tokens["tracked-changes"]:
-                suggested_actions = True
-                logger.info(
-                    f"Detected {len(tokens['tracked-changes'])} file(s) "
-                    "staged for commit:")
-                tokens["tracked-changes"].append("")
-                logger.colored_info(Colors.GREEN, "\n".join(
-                    [f"\t{token}" for token in tokens["tracked-changes"]]))
-            elif list_clean:
-                logger.info("No staged changes detected.")
-
-            if suggested_actions:
-                logger.colored_info(Colors.YELLOW, "Status: Actions Suggested")
-            else:
-                logger.colored_info(Colors.GREEN, "Status: Clean")
+        if single:
+            assert root is not None
+            file_limit = CONFIG.status.file_limit
+            name = get_tracked_name(root)
+            profile = get_status_profile(name, root)
+            status = read_git_status(
+                collect_files=True, file_limit=file_limit or None,
+                profile=profile)
+
+            if options.format:
+                with create_writer(options.format, STATUS_FIELDS) as writer:
+                    writer.write(make_status_record(
+                        name or os.path.basename(root), root, status))
+
+                return
 
+            log_status(status)
             return
 
-        repositories = get_repository_cached_data()
+        registry = Registry.load()
 
-        if repositories is None:
+        if registry is None:
             logger.colored_critical(
                 Colors.BOLD_RED,
                 "pygpm found no tracked repositories.")
             sys.exit(1)
 
-        repository_status_tokens: dict[str, dict[str, Any]] = {}
+        # Filters are resolved against the registry indexes first so git
+        # only runs in the matching repositories.
+        repositories = registry.query(options)
+
+        if not repositories:
+            logger.colored_critical(
+                Colors.BOLD_RED,
+                "No tracked repositories match the given filters.")
+            sys.exit(1)
+
+        # Stale entries would only fail in git, skip them up front.
+        invalid = [name for name, info in repositories.items()
+                   if not is_valid_entry(info)]
+
+        for name in invalid:
+            del repositories[name]
+
+        if invalid and not options.format:
+            logger.colored_warning(
+                Colors.YELLOW,
+                f"Skipping {len(invalid)} invalid tracked "
+                f"repositor{'y' if len(invalid) == 1 else 'ies'} "
+                f"({', '.join(sorted(invalid))}), run 'pygpm doctor' for details.")
+
+        if options.remote:
+            self.remote_status(options, repositories)
+            return
+
+        self.list_all(options, repositories)
+
+    def remote_status(
+            self,
+            options: Values,
+            repositories: dict[str, dict[str, Any]]) -> None:
+        try:
+            from pygpm.gh import get_branch_head
+        except Exception as error:
+            logger.colored_critical(
+                Colors.BOLD_RED, f"GitHub integration unavailable ({error}).")
+            sys.exit(1)
+
+        start = time.perf_counter()
+        results = sorted(
+            iter_remote_status(repositories, get_branch_head, options.jobs),
+            key=lambda result: result.name)
+
+        if options.format:
+            with create_writer(options.format, REMOTE_FIELDS) as writer:
+                for result in results:
+                    writer.write(asdict(result))
+
+            return
+
+        rows = [[result.name, result.branch or "-",
+                 (result.local or "-")[:SHORT_OID], (result.remote or "-")[:SHORT_OID],
+                 f"{result.state} ({result.detail})" if result.detail else result.state]
+                for result in results]
+        table = format_table(
+            ["Repository", "Branch", "Local", "GitHub", "State"], rows)
+        logger.info(table[0])
+
+        for result, line in zip(results, table[1:]):
+            if result.state in REMOTE_STATE_COLORS:
+                logger.colored_info(REMOTE_STATE_COLORS[result.state], line)
+            else:
+                logger.info(line)
+
+        counts = {state: 0 for state in REMOTE_STATES}
+
+        for result in results:
+            counts[result.state] += 1
+
+        logger.info(
+            f"Checked {len(results)} repositories against GitHub in "
+            f"{time.perf_counter() - start:.3f}s: " + ", ".join(
+                f"{count} {state}" for state, count in counts.items() if count) + ".")
+
+    def benchmark_profiles(self, paths: List[str]) -> None:
+        for path in paths:
+            path = os.path.abspath(path)
+
+            if not os.path.isdir(path):
+                logger.colored_critical(
+                    Colors.BOLD_RED, f"{path} is not a valid directory.")
+                sys.exit(1)
+
+            root = find_repository_root(path)
+
+            if root is None:
+                logger.colored_critical(
+                    Colors.BOLD_RED, f"{path} is not a valid git repository.")
+                sys.exit(1)
+
+            path = root
+            name = get_tracked_name(path)
+
+            current = get_status_profile(name, path)
+            timings = sorted(
+                [(time_profile(path, profile), profile)
+                 for profile in candidate_profiles(path, current)],
+                key=lambda timing: timing[0])
+            current_time = time_profile(path, current)
+
+            logger.info(f"Status profiles for {path}:")
+
+            for elapsed, profile in timings:
+                logger.info(
+                    f"\t{elapsed * 1000:9.1f}ms  "
+                    f"untracked_files={profile.untracked_files} "
+                    f"ignore_submodules={profile.ignore_submodules} "
+                    f"untracked_cache={profile.untracked_cache} "
+                    f"fsmonitor={profile.fsmonitor}")
+
+            best_time, best = timings[0]
+
+            # Ignore wins that are within run to run noise.
+            if best == current or best_time >= current_time * 0.9:
+                logger.colored_info(
+                    Colors.GREEN,
+                    f"The configured profile is already the fastest "
+                    f"({current_time * 1000:.1f}ms).")
+                continue
+
+            logger.colored_info(
+                Colors.GREEN,
+                f"Recommended profile ({current_time * 1000:.1f}ms -> "
+                f"{best_time * 1000:.1f}ms), add to {CONFIG.path}:")
+            logger.info(best.to_config(get_profile_section(name, path)))
+
+    def list_all(
+            self,
+            options: Values,
+            repositories: dict[str, dict[str, Any]]) -> None:
+        start = time.perf_counter()
+        collect_files = options.format in ("json", "ndjson")
+        schedule = Schedule("status", repositories, options.jobs,
+                            options.recent_first)
+        records = iter_status_records(
+            repositories, options.jobs, collect_files, schedule)
+
+        if options.sort or options.sorted:
+            # 'repositories' is already in '--sort' order.
+            ordered_names = repositories if options.sort else sorted(repositories)
+            order = {name: i for i, name in enumerate(ordered_names)}
+            records = iter(sorted(records, key=lambda record: order[record["name"]]))
+
+        totals = StatusTotals()
+
+        if options.format:
+            with create_writer(options.format, STATUS_FIELDS) as writer:
+                for record in records:
+                    totals.add(record)
+                    writer.write(record)
+
+            self.report_schedule(options, schedule, start)
+            return
+
+        if options.compact_all:
+            self.compact_all(records, totals, start)
+            self.report_schedule(options, schedule, start)
+            return
+
+        for record in records:
+            category = totals.add(record)
+            author = repositories[record["name"]].get("author")
+
+            if category in ("failed", "quarantined"):
+                logger.colored_info(
+                    Colors.RED,
+                    f"{record['name']} - Author {author}: "
+                    f"{describe_problem(record)}")
+            elif category == "clean":
+                logger.colored_info(
+                    Colors.GREEN,
+                    f"{record['name']} [{record['branch']}] - Author {author}: Clean")
+            else:
+                logger.colored_info(
+                    Colors.YELLOW,
+                    f"{record['name']} [{record['branch']}] - Author {author}: "
+                    f"{record['staged']} staged, {record['unstaged']} unstaged, "
+                    f"{record['untracked']} untracked")
+
+            if not (options.sort or options.sorted):
+                flush_logging()
+
+        logger.info(totals.summary(time.perf_counter() - start))
+        self.report_schedule(options, schedule, start)
+
+    def report_schedule(
+            self, options: Values, schedule: Schedule, start: float) -> None:
+        if not options.schedule_report:
+            return
+
+        lines = schedule.report(time.perf_counter() - start)
+
+        if options.format:
+            # Kept off stdout so the records stay machine-readable.
+            sys.stderr.write("\n".join(lines) + "\n")
+        else:
+            logger.info("\n".join(lines))
+
+    def compact_all(
+            self,
+            records: Iterator[dict[str, Any]],
+            totals: StatusTotals,
+            start: float) -> None:
+        # Only the rendered cells are kept per repository, file lists are
+        # never collected and the totals are updated as records arrive.
+        rows: List[List[str]] = []
+        categories: List[str] = []
+        failures: List[dict[str, Any]] = []
+
+        for record in records:
+            category = totals.add(record)
+
+            if category in ("failed", "quarantined"):
+                failures.append(record)
+                continue
+
+            categories.append(category)
+            rows.append([
+                record["name"],
+                record["branch"] or "(detached)",
+                f"+{record['ahead']}/-{record['behind']}" if record["upstream"] else "-",
+                str(record["staged"]),
+                str(record["unstaged"]),
+                str(record["untracked"]),
+            ])
+
+        table = format_table(
+            ["Repository", "Branch", "Ahead/Behind", "Staged", "Unstaged",
+             "Untracked"],
+            rows, ["<", "<", ">", ">", ">", ">"])
+        logger.info(table[0])
+
+        for category, line in zip(categories, table[1:]):
+            logger.colored_info(
+                Colors.GREEN if category == "clean" else Colors.YELLOW, line)
+
+        logger.info(totals.summary(time.perf_counter() - start))
+        logger.info(
+            f"Totals: {totals.changes['staged']} staged, "
+            f"{totals.changes['unstaged']} unstaged, "
+            f"{totals.changes['untracked']} untracked, "
+            f"{totals.changes['unmerged']} unmerged file(s); "
+            f"{totals.ahead} commit(s) ahead and {totals.behind} behind upstream.")
+
+        for record in failures:
+            logger.colored_info(
+                Colors.RED,
+                f"{record['name']}: {describe_problem(record)}")
+
+
+def get_tracked_name(path: str) -> Optional[str]:
+    """
+    Registry name of the repository at 'path', so '[status:<name>]'
+    profiles also apply outside 'status -a'.
+    """
+    registry = Registry.load()
+    return registry.find_name(path) if registry is not None else None
+
+
+def log_files(color: Colors, files: List[str], total: int) -> None:
+    lines = [f"\t{file}" for file in files]
+
+    if total > len(files):
+        lines.append(f"\t... and {total - len(files)} more")
+
+    lines.append("")
+    logger.colored_info(color, "\n".join(lines))
+
+
+def log_status(status: GitStatus) -> None:
+    assert status.files is not None
+
+    logger.info(f"Branch: {status.branch or f'(detached at {status.oid})'}")
+
+    if status.upstream and (status.ahead or status.behind):
+        logger.colored_info(
+            Colors.YELLOW,
+            f"Ahead of '{status.upstream}' by {status.ahead} commit(s), "
+            f"behind by {status.behind} commit(s).")
+
+    list_clean = CONFIG.status.always_list_clean
+    counts, files = status.counts, status.files
+
+    if counts["unmerged"]:
+        logger.info(f"Detected {counts['unmerged']} unmerged file(s):")
+        log_files(Colors.BOLD_RED, files["unmerged"], counts["unmerged"])
+
+    if counts["untracked"]:
+        logger.info(f"Detected {counts['untracked']} untracked file(s):")
+        log_files(Colors.RED, files["untracked"], counts["untracked"])
+    elif list_clean:
+        logger.info("No untracked files detected.")
+
+    if counts["unstaged"]:
+        logger.info(
+            f"Detected {counts['unstaged']} file(s) "
+            "with changes not staged for commit:")
+        log_files(Colors.YELLOW, files["unstaged"], counts["unstaged"])
+    elif list_clean:
+        logger.info("No untracked changes detected.")
+
+    if counts["staged"]:
+        logger.info(
+            f"Detected {counts['staged']} file(s) staged for commit:")
+        log_files(Colors.GREEN, files["staged"], counts["staged"])
+    elif list_clean:
+        logger.info("No staged changes detected.")
+
+    if status.clean:
+        logger.colored_info(Colors.GREEN, "Status: Clean")
+    else:
+        logger.colored_info(Colors.YELLOW, "Status: Actions Suggested")
+
+
+def collect_repository_status(
+        repository: Tuple[str, dict[str, Any]],
+        collect_files: bool = False) -> dict[str, Any]:
+    name, info = repository
+    start = time.perf_counter()
+    file_limit = CONFIG.status.file_limit if collect_files else None
+    profile = get_status_profile(name, info["path"])
+
+    try:
+        with BREAKER.guard(info["path"]):
+            status = read_git_status(
+                info["path"], collect_files, file_limit or None, profile,
+                CONFIG.status.timeout or None)
+    except subprocess.TimeoutExpired as error:
+        raise TimeoutError(f"timed out after {error.timeout:g}s") from None
+
+    elapsed = time.perf_counter() - start
+    STATUS_SECONDS.observe(elapsed)
+    STATUS_LAST_SECONDS.set(elapsed, repository=name)
+
+    return make_status_record(name, info["path"], status)
+
+
+def iter_status_records(
+        repositories: dict[str, dict[str, Any]],
+        workers: int = 0,
+        collect_files: bool = False,
+        schedule: Optional[Schedule] = None) -> Iterator[dict[str, Any]]:
+    """
+    Yield a status record for every repository as soon as it completes.
+    Repositories that fail produce a record with 'error' set. Repositories
+    are started longest expected first.
+    """
+    schedule = schedule or Schedule("status", repositories, workers)
+    collect = schedule.timed(
+        partial(collect_repository_status, collect_files=collect_files),
+        lambda record: record["error"] is None)
+
+    for result in imap_unordered(collect, schedule.entries, workers):
+        if result.error is None:
+            assert result.value is not None
+            yield result.value
+        else:
+            name, info = result.item
+            yield make_error_record(name, info["path"], result.error)
+
+
+def status_category(record: dict[str, Any]) -> str:
+    if record.get("quarantined"):
+        return "quarantined"
+
+    if record["error"] is not None:
+        return "failed"
+
+    return "clean" if record["clean"] else "changed"
+
+
+def describe_problem(record: dict[str, Any]) -> str:
+    if record.get("quarantined"):
+        # e.g. 'Quarantined after 3 timeouts, retrying in 25m'
+        return record["error"][:1].upper() + record["error"][1:]
+
+    return f"Failed ({record['error']})"
+
+
+def make_status_record(
+        name: str, path: str, status: GitStatus) -> dict[str, Any]:
+    record: dict[str, Any] = {
+        "name": name,
+        "path": path,
+        "branch": status.branch,
+        "upstream": status.upstream,
+        "ahead": status.ahead,
+        "behind": status.behind,
+        "clean": status.clean,
+    }
+    record.update({category: status.counts[category]
+                   for category in RECORD_CATEGORIES})
+    record["error"] = None
+    record["changes"] = status.kinds
 
-        for name, info in repositories.items():
-            repository_status_tokens[name] = parse_git_status(info["path"])
+    if status.files is not None:
+        record["files"] = {category: status.files[category]
+                           for category in RECORD_CATEGORIES}
 
-        # TODO: Add tabulate.
-        if not options.compact_all:
-            for name, info in repositories.items():
-                logger.info(f"{name} - Author {info['author']}")
+    return record
 
 
-def parse_git_status(command_dir: str = os.getcwd()) -> dict[str, Any]:
-    status = read_command("git status --porcelain --branch", command_dir)
-    tokens: dict[str, Any] = {
-        "on-branch": None,
-        "untracked-changes": [],
-        "untracked-files": [],
-        "tracked-changes": [],
+def make_error_record(
+        name: str, path: str, error: BaseException) -> dict[str, Any]:
+    record: dict[str, Any] = {
+        "name": name,
+        "path": path,
+        "branch": None,
+        "upstream": None,
+        "ahead": 0,
+        "behind": 0,
+        "clean": False,
     }
+    record.update(dict.fromkeys(RECORD_CATEGORIES, 0))
+    record["error"] = str(error) or type(error).__name__
+    record["quarantined"] = isinstance(error, Quarantined)
 
-    for line in status:
-        if line.startswith("##"):
-            tokens["on-branch"] = line.split("...")[0][3:]
-        elif line.startswith(" M"):
-            tokens["untracked-changes"].append(line[3:].strip())
-        elif line.startswith("M ") or line.startswith("A "):
-            tokens["tracked-changes"].append(line[3:].strip())
-        elif line.startswith("??"):
-            tokens["untracked-files"].append(line[3:].strip())
-
-    return tokens
+    return record
@@ -0,0 +1,234 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Fetch, check and fast-forward all repositories tracked by pygpm.
+"""
+
+import subprocess
+import sys
+import time
+
+from dataclasses import dataclass
+from functools import partial
+from optparse import Values
+from typing import Any, Iterator, List, Optional, Tuple
+
+from pygpm.breaker import BREAKER, Quarantined
+from pygpm.command import Command
+from pygpm.config import CONFIG
+from pygpm.fetch import HostLimiter, fetch_repository, summarize_git_error
+from pygpm.git_status import read_git_status
+from pygpm.logging import Colors, ProgressLine, get_logger
+from pygpm.output import format_table
+from pygpm.parallel import imap_unordered, interleave
+from pygpm.parser import FILTER_GROUP
+from pygpm.profiles import get_status_profile
+from pygpm.registry import Registry, get_remote_host
+from pygpm.util import run_command
+
+logger = get_logger(__name__)
+
+OUTCOME_COLORS = {
+    "fast-forwarded": Colors.GREEN,
+    "would fast-forward": Colors.GREEN,
+    "up to date": Colors.GREEN,
+    "skipped": Colors.YELLOW,
+    "failed": Colors.RED,
+}
+
+
+@dataclass
+class SyncResult:
+    name: str
+    path: str
+    outcome: str = "up to date"
+    detail: str = ""
+    elapsed: float = 0.0
+
+
+def sync_entry(
+        entry: Tuple[str, dict[str, Any]],
+        limiter: HostLimiter,
+        prune: bool = False,
+        timeout: Optional[float] = None,
+        dry_run: bool = False) -> SyncResult:
+    """
+    Run the fetch, status and fast-forward stages for a single repository.
+    Each repository moves through its stages independently, so one
+    repository can be fetching while another is being fast-forwarded.
+    """
+    name, info = entry
+    path = info["path"]
+    result = SyncResult(name, path)
+    start = time.perf_counter()
+
+    try:
+        # Checked before taking a slot from the host limiter.
+        with BREAKER.guard(path):
+            # Only the network stage is limited per host.
+            with limiter.get(get_remote_host(info.get("url"))):
+                fetch_repository(path, prune, timeout)
+
+            status = read_git_status(path, profile=get_status_profile(name, path))
+
+            if status.detached:
+                result.outcome, result.detail = "skipped", "detached HEAD"
+            elif status.upstream is None:
+                result.outcome, result.detail = "skipped", "no upstream"
+            elif not status.clean:
+                result.outcome, result.detail = "skipped", "working tree not clean"
+            elif status.ahead and status.behind:
+                result.outcome = "skipped"
+                result.detail = f"diverged (+{status.ahead}/-{status.behind})"
+            elif status.ahead:
+                result.outcome, result.detail = "skipped", f"ahead by {status.ahead}"
+            elif status.behind:
+                result.outcome = "would fast-forward" if dry_run else "fast-forwarded"
+                result.detail = f"{status.behind} commit(s) from {status.upstream}"
+
+                if not dry_run:
+                    run_command(["git", "merge", "--ff-only", "--quiet", "@{u}"],
+                                path, timeout=timeout)
+    except Quarantined as error:
+        result.outcome, result.detail = "skipped", str(error)
+    except subprocess.TimeoutExpired:
+        result.outcome, result.detail = "failed", f"timed out after {timeout}s"
+    except subprocess.CalledProcessError as error:
+        result.outcome, result.detail = "failed", summarize_git_error(error)
+    except OSError as error:
+        result.outcome, result.detail = "failed", str(error)
+
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def sync_all(
+        repositories: dict[str, dict[str, Any]],
+        workers: int = 0,
+        per_host: int = 4,
+        prune: bool = False,
+        timeout: Optional[float] = None,
+        dry_run: bool = False) -> Iterator[SyncResult]:
+    limiter = HostLimiter(per_host)
+    entries = interleave(repositories.items(),
+                         lambda entry: get_remote_host(entry[1].get("url")))
+    sync = partial(sync_entry, limiter=limiter, prune=prune,
+                   timeout=timeout, dry_run=dry_run)
+
+    for task in imap_unordered(sync, entries, workers):
+        assert task.value is not None
+        yield task.value
+
+
+class SyncCommand(Command):
+    """
+    Fetch every repository tracked by pygpm and fast-forward the ones that
+    are clean and strictly behind their upstream. Everything else is left
+    untouched.
+    """
+
+    usage = """
+      %prog [options]"""
+
+    def add_options(self) -> None:
+        self.cmd_options.add_option(
+            "-j",
+            "--jobs",
+            type="int",
+            dest="jobs",
+            default=CONFIG.fetch.workers,
+            metavar="n",
+            help="Number of repositories to sync in parallel."
+        )
+
+        self.cmd_options.add_option(
+            "--per-host",
+            type="int",
+            dest="per_host",
+            default=CONFIG.fetch.per_host,
+            metavar="n",
+            help="Maximum concurrent fetches against a single remote host."
+        )
+
+        self.cmd_options.add_option(
+            "--timeout",
+            type="float",
+            dest="timeout",
+            default=CONFIG.fetch.timeout,
+            metavar="seconds",
+            help="Abort a repository's git commands after the given number "
+                 "of seconds."
+        )
+
+        self.cmd_options.add_option(
+            "-p",
+            "--prune",
+            action="store_true",
+            dest="prune",
+            default=False,
+            help="Remove remote-tracking refs that no longer exist on the remote."
+        )
+
+        self.cmd_options.add_option(
+            "-n",
+            "--dry-run",
+            action="store_true",
+            dest="dry_run",
+            default=False,
+            help="Fetch and report, but do not fast-forward anything."
+        )
+
+        for option in FILTER_GROUP:
+            self.cmd_options.add_option(option())
+
+    def run(self, options: Values, args: list[str]) -> None:
+        registry = Registry.load()
+
+        if registry is None:
+            logger.colored_critical(
+                Colors.BOLD_RED,
+                "pygpm found no tracked repositories.")
+            sys.exit(1)
+
+        repositories = registry.query(options)
+        start = time.perf_counter()
+        progress = ProgressLine(self.verbosity >= 0)
+        results: List[SyncResult] = []
+
+        for result in sync_all(
+                repositories, options.jobs, options.per_host, options.prune,
+                options.timeout or None, options.dry_run):
+            results.append(result)
+            progress.update(
+                f"Synced {len(results)}/{len(repositories)} repositories")
+
+        progress.clear()
+
+        if not options.sort:
+            results.sort(key=lambda result: result.name)
+        else:
+            order = {name: i for i, name in enumerate(repositories)}
+            results.sort(key=lambda result: order[result.name])
+
+        rows = [[result.name, result.outcome, result.detail,
+                 f"{result.elapsed:.2f}s"] for result in results]
+        table = format_table(["Repository", "Outcome", "Detail", "Time"], rows)
+        logger.info(table[0])
+
+        for result, line in zip(results, table[1:]):
+            logger.colored_info(OUTCOME_COLORS[result.outcome], line)
+
+        counts = {outcome: 0 for outcome in OUTCOME_COLORS}
+
+        for result in results:
+            counts[result.outcome] += 1
+
+        summary = ", ".join(
+            f"{count} {outcome}" for outcome, count in counts.items() if count)
+        logger.info(
+            f"Synced {len(results)} repositories in "
+            f"{time.perf_counter() - start:.3f}s: {summary or 'nothing to do'}.")
+
+        if counts["failed"]:
+            sys.exit(1)
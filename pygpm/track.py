@@ -6,7 +6,6 @@ Add new git repositories for pygpm to track.
 """
 
 import sys
-import configparser
 import os
 
 from optparse import Values
@@ -14,7 +13,8 @@ from typing import Any
 
 from pygpm.command import Command
 from pygpm.logging import Colors, get_logger
-from pygpm.util import is_git_repository, cache_repo_data
+from pygpm.refs import find_repository_root, get_git_dir, get_remote_url
+from pygpm.util import cache_repo_data
 
 logger = get_logger(__name__)
 
@@ -46,9 +46,13 @@ class TrackCommand(Command):
         if options.add_all:
             for arg in args:
                 for dir in os.listdir(arg):
-                    if os.path.isdir(dir) and is_git_repository(dir):
-                        logger.debug(f"Caching {os.path.abspath(dir)}...")
-                        make_and_cache_data(dir)
+                    dir = os.path.abspath(os.path.join(arg, dir))
+
+                    # Only children that are repositories themselves, not
+                    # subdirectories of a repository containing 'arg'.
+                    if os.path.isdir(dir) and find_repository_root(dir) == dir:
+                        logger.debug(f"Caching {dir}...")
+                        self.track_repository(dir)
         else:
             for arg in args:
                 arg = os.path.abspath(arg)
@@ -57,29 +61,50 @@ class TrackCommand(Command):
                     logger.colored_critical(
                         Colors.BOLD_RED, f"{arg} is not a valid directory.")
                     sys.exit(1)
-                elif not is_git_repository(arg):
+
+                root = find_repository_root(arg)
+
+                if root is None:
                     logger.colored_critical(
                         Colors.BOLD_RED, f"{arg} is not a valid git repository.")
                     sys.exit(1)
 
-                make_and_cache_data(arg)
+                self.track_repository(root)
+
+    def track_repository(self, dir: str) -> None:
+        try:
+            make_and_cache_data(dir)
+        except ValueError as error:
+            logger.colored_critical(Colors.BOLD_RED, str(error))
+            sys.exit(1)
 
 
-def make_and_cache_data(dir: str) -> None:
+def make_and_cache_data(dir: str) -> dict[str, Any]:
     repo_dir = os.path.abspath(dir)
     data = extract_repository_data(repo_dir)
     cache_repo_data(**data)
 
+    return data
+
 
 def extract_repository_data(repo_dir: str) -> dict[str, Any]:
-    git_config = configparser.ConfigParser()
-    git_config.read(f"{repo_dir}/.git/config")
-    url = git_config.get('remote "origin"', "url")
+    # Read through the resolved git dir so worktrees and submodules, whose
+    # '.git' is a file, work too.
+    git_dir = get_git_dir(repo_dir)
+    url = get_remote_url(git_dir) if git_dir is not None else None
+
+    if url is None:
+        raise ValueError(f"{repo_dir} has no 'origin' remote.")
+
     data = {
         "name": repo_dir.split("/")[-1],
-        "author": url.split(":")[-1].split("/")[0],
+        "author": get_url_author(url),
         "url": url,
         "path": repo_dir
     }
 
     return data
+
+
+def get_url_author(url: str) -> str:
+    return url.split(":")[-1].split("/")[0]
@@ -6,14 +6,22 @@ Miscellaneous utility functions and classes for pygpm.
 """
 
 import os
+import select
+import shutil
+import signal
 import sys
 import subprocess
+import tempfile
+import threading
 import time
 import json
 
-from typing import Any, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
+from pygpm.config import CONFIG
 from pygpm.core import CACHE_DIR, OS, __version__
+from pygpm.metrics import GIT_SUBPROCESSES, GIT_SUBPROCESS_SECONDS
+from pygpm.refs import find_repository_root
 
 
 class Timer:
@@ -38,42 +46,310 @@ def read_file_json(input_file: str) -> dict[str, dict[str, Any]]:
     try:
         with open(input_file, "r", encoding="utf-8") as file:
             return json.load(file)
-    except json.decoder.JSONDecodeError:
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
         return {}
 
 
 def write_file_json(output_file: str, data: dict) -> None:
-    with open(output_file, "w", encoding="utf-8") as file:
+    # Write to a temporary file first so readers never see a partial file.
+    temp_file = f"{output_file}.{os.getpid()}.tmp"
+
+    with open(temp_file, "w", encoding="utf-8") as file:
         json.dump(data, file, indent=4)
 
+    os.replace(temp_file, output_file)
+
 
 def create_dir(directory: str) -> None:
     os.makedirs(directory, exist_ok=True)
 
 
 def copy_file(input_file: str, output_file: str) -> None:
-    if OS == "Windows":
-        os.system(f"copy {input_file} {output_file}")
-    else:
-        os.system(f"cp {input_file} {output_file}")
+    shutil.copyfile(input_file, output_file)
+
+
+def get_subcommand(args: List[str]) -> str:
+    # Also finds the git command behind wrappers like 'nice -n 10 git ...'.
+    if "git" not in args:
+        return args[0]
+
+    i = args.index("git") + 1
+
+    # Skip over 'git -c key=value' style global options.
+    while i < len(args) and args[i].startswith("-"):
+        i += 2 if args[i] in ("-c", "-C") else 1
+
+    return args[i] if i < len(args) else args[0]
+
+
+# Seconds to wait for a killed command to exit. A process stuck in
+# uninterruptible I/O, e.g. on a dead NFS mount, cannot die until the I/O
+# returns, so it is left behind rather than waited on forever.
+KILL_GRACE = 5.0
+
+
+class CommandGroup:
+    """
+    Commands started on behalf of one operation, e.g. a single grep, so it
+    can stop its own commands without touching any others still running in
+    the process.
+    """
+
+    def __init__(self) -> None:
+        self.killed = False
+
+    def kill(self) -> None:
+        """
+        Kill the group's running commands, and any started later.
+        """
+        with RUNNING_LOCK:
+            self.killed = True
+            processes = [process for process, group in RUNNING.items()
+                         if group is self]
 
+        for process in processes:
+            kill_process_group(process)
 
-def read_command(command: str, command_dir: str = os.getcwd()) -> List[str]:
-    return subprocess.check_output(
-        command.split(" "),
-        cwd=command_dir).decode("utf-8").splitlines()
 
+# Commands run in their own process group so a timeout can kill everything
+# git started (remote helpers, ssh, hooks) and not just git itself. Every
+# running command maps to the group it was started in, if any.
+RUNNING: Dict[subprocess.Popen, Optional[CommandGroup]] = {}
+RUNNING_LOCK = threading.Lock()
 
-def is_git_repository(directory: str = os.getcwd()) -> bool:
-    # TODO: Potential problem with checking the status of a repository not
-    # on drive c on windows.
-    while directory != ("C:\\" if OS == "Windows" else "/"):
-        if ".git" in os.listdir(directory):
-            return True
 
-        directory = os.path.dirname(directory)
+def start_command(command: List[str], command_dir: str,
+                  group: Optional[CommandGroup] = None,
+                  **kwargs: Any) -> subprocess.Popen:
+    process = subprocess.Popen(
+        command, cwd=command_dir, start_new_session=OS != "Windows", **kwargs)
 
-    return False
+    with RUNNING_LOCK:
+        RUNNING[process] = group
+        killed = group is not None and group.killed
+
+    if killed:
+        kill_process_group(process)
+
+    return process
+
+
+def finish_command(process: subprocess.Popen) -> None:
+    with RUNNING_LOCK:
+        RUNNING.pop(process, None)
+
+
+def kill_process_group(process: subprocess.Popen) -> None:
+    try:
+        if OS == "Windows":
+            process.kill()
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        # Already gone.
+        pass
+
+    try:
+        process.wait(KILL_GRACE)
+    except subprocess.TimeoutExpired:
+        pass
+
+    for stream in (process.stdin, process.stdout, process.stderr):
+        if stream is not None:
+            stream.close()
+
+    finish_command(process)
+
+
+def kill_running_commands() -> None:
+    """
+    Kill every command still running, e.g. when pygpm is interrupted. Their
+    own process groups do not get the terminal's Ctrl-C.
+    """
+    with RUNNING_LOCK:
+        processes = list(RUNNING)
+
+    for process in processes:
+        kill_process_group(process)
+
+
+def read_command(
+        command: str | List[str],
+        command_dir: str = os.getcwd(),
+        timeout: Optional[float] = None) -> List[str]:
+    args = command.split(" ") if isinstance(command, str) else command
+    return run_command(args, command_dir, timeout).stdout.splitlines()
+
+
+def run_command(
+        command: List[str],
+        command_dir: str = os.getcwd(),
+        timeout: Optional[float] = None,
+        env: Optional[dict[str, str]] = None) -> subprocess.CompletedProcess:
+    """
+    Run 'command' capturing both stdout and stderr. Raises CalledProcessError
+    on a non-zero exit. Once 'timeout' seconds pass, the configured
+    git.timeout by default, the command's whole process group is killed and
+    TimeoutExpired is raised.
+    """
+    if timeout is None:
+        timeout = CONFIG.git.timeout or None
+
+    subcommand = get_subcommand(command)
+    GIT_SUBPROCESSES.inc(subcommand=subcommand)
+
+    with GIT_SUBPROCESS_SECONDS.time(subcommand=subcommand):
+        process = start_command(
+            command, command_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+            env={**os.environ, **env} if env else None)
+
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except BaseException:
+            # Includes TimeoutExpired and KeyboardInterrupt.
+            kill_process_group(process)
+            raise
+
+        finish_command(process)
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode, command, stdout, stderr)
+
+    return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+
+def stream_command(
+        command: List[str],
+        command_dir: str = os.getcwd(),
+        separator: bytes = b"\n",
+        chunk_size: int = 64 * 1024,
+        timeout: Optional[float] = None) -> Iterator[bytes]:
+    """
+    Yield 'separator' delimited records from the output of 'command' as they
+    are read from the pipe, without buffering the whole output. Once
+    'timeout' seconds pass, the configured git.timeout by default, the
+    command's process group is killed and TimeoutExpired is raised.
+    """
+    batches = stream_command_batches(
+        command, command_dir, separator, chunk_size, timeout)
+
+    try:
+        for batch in batches:
+            yield from batch
+    finally:
+        batches.close()
+
+
+def stream_command_batches(
+        command: List[str],
+        command_dir: str = os.getcwd(),
+        separator: bytes = b"\n",
+        chunk_size: int = 64 * 1024,
+        timeout: Optional[float] = None,
+        group: Optional[CommandGroup] = None) -> Iterator[List[bytes]]:
+    """
+    Like stream_command(), but yield the records of every read from the
+    pipe together, for consumers that pay a cost per item they hand on.
+    The command is started in 'group', if given.
+    """
+    if timeout is None:
+        timeout = CONFIG.git.timeout or None
+
+    # Pipes cannot be waited on with a timeout on Windows.
+    deadline = time.monotonic() + timeout if timeout and OS != "Windows" else None
+    subcommand = get_subcommand(command)
+    GIT_SUBPROCESSES.inc(subcommand=subcommand)
+
+    # stderr goes to a file, a pipe nobody reads until the end could fill
+    # up and stall the command while its stdout is being streamed.
+    with GIT_SUBPROCESS_SECONDS.time(subcommand=subcommand), \
+            tempfile.TemporaryFile() as stderr_file:
+        process = start_command(command, command_dir, group,
+                                stdout=subprocess.PIPE,
+                                stderr=stderr_file)
+        assert process.stdout is not None
+        remainder = b""
+        stdout = process.stdout.fileno()
+
+        try:
+            while True:
+                # Never block on a read past the deadline, the command may
+                # be stuck in I/O that no signal can interrupt.
+                if deadline is not None and not select.select(
+                        [stdout], [], [], max(0.0, deadline - time.monotonic()))[0]:
+                    raise subprocess.TimeoutExpired(command, timeout)
+
+                chunk = os.read(stdout, chunk_size)
+
+                if not chunk:
+                    break
+
+                records = (remainder + chunk).split(separator)
+                remainder = records.pop()
+
+                if records:
+                    yield records
+
+            return_code = process.wait()
+        except BaseException:
+            # Timed out, interrupted or closed early by the consumer.
+            kill_process_group(process)
+            raise
+
+        finish_command(process)
+        process.stdout.close()
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+
+        if remainder:
+            yield [remainder]
+
+        if return_code != 0:
+            raise subprocess.CalledProcessError(
+                return_code, command, stderr=stderr)
+
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_duration(value: str) -> float:
+    """
+    Seconds in a duration like '90s', '45m', '12h', '30d' or '2w'. A plain
+    number is taken as seconds.
+    """
+    value = value.strip().lower()
+    unit = DURATION_UNITS.get(value[-1:]) if value else None
+
+    try:
+        seconds = float(value[:-1]) * unit if unit else float(value)
+    except ValueError:
+        raise ValueError(f"Invalid duration '{value}', expected e.g. 30d, "
+                         "12h, 45m or 90s.") from None
+
+    if seconds < 0:
+        raise ValueError(f"Duration '{value}' is negative.")
+
+    return seconds
+
+
+def format_duration(seconds: float) -> str:
+    """
+    'seconds' in the largest whole unit, e.g. '3d', '12h', '25m' or '40s'.
+    """
+    for unit in ("w", "d", "h", "m"):
+        if seconds >= DURATION_UNITS[unit]:
+            return f"{int(seconds // DURATION_UNITS[unit])}{unit}"
+
+    return f"{int(seconds)}s"
+
+
+def is_git_repository(directory: Optional[str] = None) -> bool:
+    return find_repository_root(directory) is not None
 
 
 def get_pygpm_version() -> str:
@@ -89,12 +365,30 @@ def get_python_major_minor_version() -> str:
 
 REPO_CACHE_FILE = f"{CACHE_DIR}/repos.json"
 
+# Parsed registry and the (mtime, size) it was read at, so several commands
+# run in one process (see 'pygpm batch') only parse it again after a write.
+REPO_CACHE: dict[str, Any] = {}
+
 
 def get_repository_cached_data() -> Optional[dict[str, dict[str, Any]]]:
-    data = read_file_json(REPO_CACHE_FILE)
+    try:
+        stat = os.stat(REPO_CACHE_FILE)
+    except OSError:
+        return None
+
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = REPO_CACHE.get("registry")
+
+    # Stored as one tuple so concurrent readers never pair a stamp with
+    # another read's data.
+    if cached is None or cached[0] != stamp:
+        cached = REPO_CACHE["registry"] = (stamp, read_file_json(REPO_CACHE_FILE))
+
+    data = cached[1]
 
     if len(data):
-        return data
+        # Callers may modify the result, hand out copies.
+        return {name: dict(info) for name, info in data.items()}
 
     return None
 
@@ -111,6 +405,14 @@ def cache_repo_data(name: str, author: str, url: str, path: str) -> None:
     write_file_json(REPO_CACHE_FILE, data)
 
 
+def write_repository_cached_data(data: dict[str, dict[str, Any]]) -> None:
+    """
+    Replace the whole registry in a single write.
+    """
+    create_dir(CACHE_DIR)
+    write_file_json(REPO_CACHE_FILE, data)
+
+
 def clean_cached_data() -> None:
     if os.path.isfile(REPO_CACHE_FILE):
         with open(REPO_CACHE_FILE, "w", encoding="utf-8") as file:
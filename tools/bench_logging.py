@@ -0,0 +1,100 @@
+# Copyright (c) Brandon Pacewic
+# SPDX-License-Identifier: MIT
+
+"""
+Micro-benchmark for the pygpm logging hot path.
+
+Emits a large number of plain and colored records through the same logging
+setup pygpm commands use and reports records/sec. Output is written to
+os.devnull so the numbers include formatting, handler and flush overhead but
+not terminal rendering.
+
+Each run is measured twice: with pygpm's BufferedStreamHandler, and with
+the plain logging.StreamHandler it replaced, which flushes after every
+record. Both use the same formatter, so the difference is the handler's.
+
+    python tools/bench_logging.py [--records N] [--no-color] [--show-time]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pygpm.logging import Colors, get_logger, setup_logging  # noqa: E402
+
+
+def use_unbuffered_handler() -> None:
+    # The handler pygpm used before BufferedStreamHandler.
+    root = logging.getLogger()
+
+    for handler in list(root.handlers):
+        unbuffered = logging.StreamHandler(handler.stream)
+        unbuffered.setLevel(handler.level)
+        unbuffered.setFormatter(handler.formatter)
+        root.removeHandler(handler)
+        handler.close()
+        root.addHandler(unbuffered)
+
+
+def run(logger, records: int, colored: bool) -> float:
+    start = time.perf_counter()
+
+    if colored:
+        for i in range(records):
+            logger.colored_info(Colors.GREEN, f"repository-{i}: /src/repository-{i}")
+    else:
+        for i in range(records):
+            logger.info(f"repository-{i}: /src/repository-{i}")
+
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+
+    return records / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--no-color", action="store_true")
+    parser.add_argument("--show-time", action="store_true")
+    options = parser.parse_args()
+
+    results = {}
+
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+
+        try:
+            for handler in ("unbuffered", "buffered"):
+                setup_logging(no_color=options.no_color,
+                              add_timestamp=options.show_time)
+
+                if handler == "unbuffered":
+                    use_unbuffered_handler()
+
+                logger = get_logger("bench")
+                results[handler] = (
+                    run(logger, options.records, colored=False),
+                    run(logger, options.records, colored=True))
+
+            logging.shutdown()
+        finally:
+            sys.stdout = stdout
+
+    print(f"{'':10} {'unbuffered':>12} {'buffered':>12} {'speedup':>8}")
+
+    for i, kind in enumerate(("plain", "colored")):
+        before, after = results["unbuffered"][i], results["buffered"][i]
+        print(f"{kind + ':':10} {before:>12,.0f} {after:>12,.0f} "
+              f"{after / before:>7.2f}x")
+
+    print("(records/sec)")
+
+
+if __name__ == "__main__":
+    main()